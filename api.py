@@ -1,22 +1,383 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
-from supabase import create_client, Client
-from dotenv import load_dotenv
 import os
 from datetime import datetime
 import json
+import base64
+import hashlib
+import hmac
+import math
+import atexit
+import secrets
+import time
 from functools import wraps
+from auth_tokens import TokenVerifier
+from cache import TTLCache, RedisCache, SingleFlight, RedisSingleFlight
+from parallel import ParallelExecutor, QueryTimeout
+from resilience import ResilientStorage, RetryBudget, StorageUnavailable
+from screening import QuestionScreen, QuestionRejected, load_blocklist
+from ratelimit import ConcurrencyLimiter, MemoryBucketStore, RedisBucketStore, TokenBucketLimiter, parse_rate
+from storage import create_storage, QuestionNotFound, NotQuestionOwner, QUESTION_COLUMNS
+from schemas import QUESTION_FIELDS, dump_question, dump_questions, dump_public_user
+from json_provider import FastJSONProvider
+from compression import Compressor
+from write_behind import WriteBehindBuffer, BufferFull, BufferClosed
+from events import EventBroker, RedisEventBroker
+import metrics
 
-# Load environment variables
-load_dotenv()
+# Load environment variables from .env when running locally; Vercel provides them directly
+if not os.getenv("VERCEL"):
+    from dotenv import load_dotenv
+    load_dotenv()
+
+# JSON encoding time shows up as "serialize" in the Server-Timing header
+class TimedJSONProvider(FastJSONProvider):
+    def encode(self, obj):
+        with metrics.timer('serialize'):
+            return super().encode(obj)
 
 app = Flask(__name__)
+app.json = TimedJSONProvider(app)
 CORS(app)
 
+# Request and storage call metrics, exposed on /metrics
+request_metrics = metrics.Metrics()
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_MS", 1000)) / 1000
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# gzip/brotli for responses of at least COMPRESS_MIN_SIZE bytes
+compressor = Compressor(
+    min_size=int(os.getenv("COMPRESS_MIN_SIZE", 1024)),
+    gzip_level=int(os.getenv("COMPRESS_GZIP_LEVEL", 6)),
+    brotli_quality=int(os.getenv("COMPRESS_BROTLI_QUALITY", 5)),
+)
+
 # Supabase configuration
 url: str = os.getenv("PUBLIC_SUPABASE_URL")
 key: str = os.getenv("PUBLIC_SUPABASE_ANON_KEY")
-supabase: Client = create_client(url, key)
+
+# HTTP connection pool to Supabase, per worker process
+supabase_pool = {
+    'max_connections': int(os.getenv("SUPABASE_POOL_SIZE", 100)),
+    'max_keepalive': int(os.getenv("SUPABASE_POOL_KEEPALIVE", 20)),
+    'keepalive_expiry': float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", 5)),
+    'http2': os.getenv("SUPABASE_HTTP2", "").lower() in ("1", "true", "yes"),
+    'timeout': float(os.getenv("QUERY_TIMEOUT", 10)),
+}
+
+# Storage backend: "supabase" in production, "sqlite" to run offline (tests, benchmarks).
+# Every call gets a deadline, reads are retried within a budget, and a circuit
+# breaker fails calls fast (503) while Supabase is down.
+resilient_storage = ResilientStorage(
+    create_storage(
+        os.getenv("STORAGE_BACKEND", "supabase"),
+        supabase_url=url,
+        supabase_key=key,
+        sqlite_path=os.getenv("SQLITE_PATH", ":memory:"),
+        jwt_secret=os.getenv("SUPABASE_JWT_SECRET"),
+        supabase_pool=supabase_pool,
+    ),
+    deadlines={
+        'read': float(os.getenv("STORAGE_READ_TIMEOUT", 3)),
+        'write': float(os.getenv("STORAGE_WRITE_TIMEOUT", 5)),
+        'auth': float(os.getenv("STORAGE_AUTH_TIMEOUT", 5)),
+    },
+    retries=int(os.getenv("STORAGE_RETRIES", 1)),
+    backoff=float(os.getenv("STORAGE_RETRY_BACKOFF_MS", 50)) / 1000,
+    budget=RetryBudget(ratio=float(os.getenv("STORAGE_RETRY_BUDGET", 0.1))),
+    failure_threshold=int(os.getenv("BREAKER_FAILURES", 5)),
+    reset_timeout=float(os.getenv("BREAKER_RESET_SECONDS", 10)),
+    max_workers=int(os.getenv("STORAGE_THREADS", 64)),
+)
+storage = metrics.InstrumentedStorage(resilient_storage, request_metrics)
+
+# Access tokens are verified locally (JWT secret or JWKS); set AUTH_VERIFY_MODE=remote
+# to ask Supabase Auth about every token instead
+token_verifier = TokenVerifier(
+    supabase_url=url,
+    jwt_secret=os.getenv("SUPABASE_JWT_SECRET") or getattr(storage, 'jwt_secret', None),
+    mode=os.getenv("AUTH_VERIFY_MODE", "local"),
+    remote_verify=storage.auth.get_user,
+    cache_size=int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 10000)),
+    cache_ttl=int(os.getenv("AUTH_TOKEN_CACHE_TTL", 300)),
+)
+
+# Shared pool for running a request's independent queries at the same time
+query_executor = ParallelExecutor(
+    max_workers=int(os.getenv("QUERY_POOL_SIZE", 32)),
+    timeout=float(os.getenv("QUERY_TIMEOUT", 10)),
+)
+# Background re-renders of stale profile pages. They gather on query_executor,
+# so they need threads of their own: queued in that pool, they would wait on
+# subqueries queued behind them.
+refresh_executor = ParallelExecutor(max_workers=int(os.getenv("PROFILE_REFRESH_THREADS", 4)))
+
+# Profile rows keyed by user id, used by every ownership check.
+# Set CACHE_REDIS_URL to share the cache across workers.
+profile_cache_ttl = int(os.getenv("PROFILE_CACHE_TTL", 300))
+if os.getenv("CACHE_REDIS_URL"):
+    profile_cache = RedisCache(os.getenv("CACHE_REDIS_URL"), prefix="askme:profile:", ttl=profile_cache_ttl)
+else:
+    profile_cache = TTLCache(maxsize=int(os.getenv("PROFILE_CACHE_SIZE", 10000)), ttl=profile_cache_ttl)
+
+def get_profile_by_id(user_id):
+    profile = profile_cache.get(user_id)
+    if profile is None:
+        profile = storage.profiles.get_by_id(user_id)
+        if profile is None:
+            return None
+        profile_cache.set(user_id, profile)
+    return profile
+
+# Usernames tried in order when an OAuth login creates a profile; the last one cannot collide
+def username_candidates(base, user_id):
+    compact_id = user_id.replace('-', '')
+    return [
+        base,
+        f"{base}_{compact_id[:8]}",
+        f"{base}_{compact_id[:12]}",
+        f"{base}_{secrets.token_hex(4)}",
+        f"user_{compact_id}",
+    ]
+
+def provision_profile(user, usernames):
+    """Return the user's profile, creating it with the first free name in ``usernames``.
+
+    Takes at most one storage call, for new and returning users alike.
+    Returns None when every name is taken.
+    """
+    profile = profile_cache.get(user.id)
+    if profile is None:
+        profile = storage.profiles.provision(user.id, user.email, usernames)
+        if profile is None:
+            return None
+        profile_cache.set(user.id, profile)
+        known_receivers.set(profile['username'], True)
+    return profile
+
+# Whether a username exists, for validating question receivers without a query.
+# Misses are cached briefly so a user who signs up on another worker is found soon.
+known_receivers = TTLCache(
+    maxsize=int(os.getenv("RECEIVER_CACHE_SIZE", 50000)),
+    ttl=int(os.getenv("RECEIVER_CACHE_TTL", 300)),
+)
+RECEIVER_MISS_TTL = int(os.getenv("RECEIVER_MISS_TTL", 5))
+
+def receiver_exists(username):
+    exists = known_receivers.get(username)
+    if exists is None:
+        exists = storage.profiles.exists(username)
+        known_receivers.set(username, exists, ttl=None if exists else RECEIVER_MISS_TTL)
+    return exists
+
+# Screening of submitted questions, before the receiver lookup and the insert.
+# SPAM_BLOCKLIST_FILE lists blocked words and phrases, one per line.
+question_screen = QuestionScreen(
+    blocklist=load_blocklist(os.getenv("SPAM_BLOCKLIST_FILE")) if os.getenv("SPAM_BLOCKLIST_FILE") else (),
+    max_length=int(os.getenv("QUESTION_MAX_LENGTH", 1000)),
+    max_links=int(os.getenv("QUESTION_MAX_LINKS", 2)),
+    max_repeat=int(os.getenv("QUESTION_MAX_REPEAT", 20)),
+    similarity=float(os.getenv("SPAM_DUPLICATE_SIMILARITY", 0.8)),
+    duplicate_window=int(os.getenv("SPAM_DUPLICATE_WINDOW", 20)),
+    duplicate_ttl=float(os.getenv("SPAM_DUPLICATE_TTL", 600)),
+    maxsize=int(os.getenv("SPAM_RECEIVER_CACHE_SIZE", 100000)),
+)
+
+def question_rejected(error):
+    return jsonify({'error': str(error)}), error.status
+
+# Live inbox events for GET /events, published by the write handlers.
+# With several workers, set EVENTS_REDIS_URL (or CACHE_REDIS_URL) so every stream sees every write.
+EVENT_HISTORY = int(os.getenv("EVENT_HISTORY", 100))
+EVENT_CHANNELS = int(os.getenv("EVENT_CHANNELS", 10000))
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", 15))
+SSE_MAX_SECONDS = float(os.getenv("SSE_MAX_SECONDS", 300))
+SSE_RETRY_MS = int(os.getenv("SSE_RETRY_MS", 3000))
+# Each open stream holds a worker thread, so a worker serves at most SSE_MAX_STREAMS at once (503 above that)
+SSE_MAX_STREAMS = int(os.getenv("SSE_MAX_STREAMS", 100))
+event_streams = ConcurrencyLimiter(SSE_MAX_STREAMS)
+# Worker processes serving the app; serve.py passes gunicorn's count to after_fork()
+worker_processes = int(os.getenv("WEB_CONCURRENCY", 1))
+def create_event_broker():
+    events_redis_url = os.getenv("EVENTS_REDIS_URL") or os.getenv("CACHE_REDIS_URL")
+    if events_redis_url:
+        return RedisEventBroker(events_redis_url, history=EVENT_HISTORY, max_channels=EVENT_CHANNELS)
+    return EventBroker(history=EVENT_HISTORY, max_channels=EVENT_CHANNELS)
+
+event_broker = create_event_broker()
+
+def publish_questions(event_type, rows):
+    # Events are best effort: a failed publish never fails the write
+    try:
+        for row in rows:
+            event_broker.publish(row['receiver'], event_type, dump_question(row))
+    except Exception as e:
+        app.logger.warning('Could not publish %s events: %s', event_type, e)
+    return rows
+
+# Optional write-behind mode for POST /questions (SUBMIT_BUFFER=1): submissions are
+# acknowledged with 202 and written in multi-row batches by a background thread
+def create_submit_buffer():
+    buffer = WriteBehindBuffer(
+        write_many=lambda rows: publish_questions('question', storage.questions.create_many(rows)),
+        write_one=lambda row: publish_questions('question', [storage.questions.create(row)]),
+        max_batch=int(os.getenv("SUBMIT_BATCH_SIZE", 100)),
+        max_delay=float(os.getenv("SUBMIT_FLUSH_MS", 50)) / 1000,
+        max_pending=int(os.getenv("SUBMIT_QUEUE_SIZE", 10000)),
+    )
+    atexit.register(buffer.close)
+    return buffer
+
+submit_buffer = None
+if os.getenv("SUBMIT_BUFFER", "").lower() in ("1", "true", "yes"):
+    submit_buffer = create_submit_buffer()
+
+def after_fork(workers=None):
+    """Give a newly forked worker its own connections and background threads (see serve.py)"""
+    global event_broker, submit_buffer, worker_processes
+    if workers is not None:
+        worker_processes = workers
+    storage.after_fork()
+    query_executor.after_fork()
+    refresh_executor.after_fork()
+    # The parent's Redis listener thread does not exist here; its sockets are left to the parent
+    event_broker = create_event_broker()
+    if submit_buffer is not None:
+        submit_buffer = create_submit_buffer()
+
+# Rendered GET /user/<username> responses, keyed by (username, page). Each page
+# records the user's generation when it was rendered, and stops being served once
+# the user's answered questions change and the generation moves on. A page is fresh for
+# PROFILE_RESPONSE_CACHE_TTL seconds; for PROFILE_STALE_TTL seconds after that it
+# is still served while one background refresh re-renders it. While storage is
+# unavailable, pages up to PROFILE_OUTAGE_TTL seconds old are served instead of a 503.
+PROFILE_RESPONSE_TTL = int(os.getenv("PROFILE_RESPONSE_CACHE_TTL", 60))
+PROFILE_STALE_TTL = int(os.getenv("PROFILE_STALE_TTL", 30))
+PROFILE_OUTAGE_TTL = int(os.getenv("PROFILE_OUTAGE_TTL", 3600))
+profile_response_cache = TTLCache(
+    maxsize=int(os.getenv("PROFILE_RESPONSE_CACHE_SIZE", 5000)),
+    ttl=max(PROFILE_RESPONSE_TTL + PROFILE_STALE_TTL, PROFILE_OUTAGE_TTL),
+)
+# Concurrent cache misses for the same page share one backend fetch. With
+# CACHE_REDIS_URL set, misses in other workers wait for that fetch too.
+if os.getenv("CACHE_REDIS_URL"):
+    profile_flights = RedisSingleFlight(
+        os.getenv("CACHE_REDIS_URL"),
+        prefix="askme:flight:profile:",
+        result_ttl=float(os.getenv("PROFILE_FLIGHT_RESULT_TTL", 1)),
+    )
+else:
+    profile_flights = SingleFlight()
+# Bumped on every invalidation so fetches that started earlier are neither shared nor cached,
+# and pages rendered earlier are no longer served. Outliving their fresh and stale window is enough.
+# With CACHE_REDIS_URL set they live in Redis, so an answer handled by one worker
+# drops the pages every other worker holds.
+if os.getenv("CACHE_REDIS_URL"):
+    profile_generations = RedisCache(
+        os.getenv("CACHE_REDIS_URL"),
+        prefix="askme:generation:",
+        ttl=PROFILE_RESPONSE_TTL + PROFILE_STALE_TTL,
+    )
+else:
+    profile_generations = TTLCache(maxsize=int(os.getenv("PROFILE_RESPONSE_CACHE_SIZE", 5000)), ttl=PROFILE_RESPONSE_TTL + PROFILE_STALE_TTL)
+# Lets Vercel's edge serve repeat views for a few seconds; browsers always revalidate with the ETag
+PROFILE_CACHE_CONTROL = (
+    f"public, max-age=0, s-maxage={int(os.getenv('PROFILE_EDGE_TTL', 10))}, "
+    f"stale-while-revalidate={int(os.getenv('PROFILE_EDGE_STALE_TTL', 30))}"
+)
+
+def invalidate_profile_responses(username):
+    # The user's cached pages are left for the LRU to evict
+    # Wall clock rather than monotonic, so values from different workers cannot collide
+    profile_generations.set(username, time.time_ns())
+
+def cached_json_response(entry, cache_control):
+    # entry holds the rendered body, its ETag and compressed copies made on demand
+    encoding = compressor.choose_encoding(request, len(entry['body']))
+    etag = f"{entry['etag']}-{encoding}" if encoding else entry['etag']
+    if request.if_none_match.contains(etag) or request.if_none_match.contains(entry['etag']):
+        response = app.response_class(status=304)
+    elif encoding:
+        if encoding not in entry['encoded']:
+            with metrics.timer('compress'):
+                entry['encoded'][encoding] = compressor.compress(entry['body'], encoding)
+        response = app.response_class(entry['encoded'][encoding], mimetype='application/json')
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = app.response_class(entry['body'], mimetype='application/json')
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+def storage_unavailable(error):
+    # Storage is down or too slow: fail fast and tell the client when to come back
+    response = jsonify({'error': 'Service temporarily unavailable, please retry shortly'})
+    response.headers['Retry-After'] = str(math.ceil(error.retry_after))
+    return response, 503
+
+# Keyset pagination over (sort_column, id), newest first
+DEFAULT_PAGE_SIZE = int(os.getenv("PAGE_SIZE", 20))
+MAX_PAGE_SIZE = 100
+
+class InvalidParameter(Exception):
+    pass
+
+class InvalidCursor(InvalidParameter):
+    pass
+
+def encode_cursor(key):
+    if key is None:
+        return None
+    raw = json.dumps(list(key)).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        value, row_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        # Cursors are client input: only a timestamp, re-serialized, reaches the storage filter
+        return datetime.fromisoformat(value).isoformat(timespec='microseconds'), int(row_id)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+
+def get_page_args():
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    cursor = request.args.get('cursor')
+    return limit, decode_cursor(cursor) if cursor else None
+
+# Delta sync watermarks are opaque like cursors; tombstones are kept SYNC_RETENTION_DAYS
+SYNC_RETENTION_SECONDS = float(os.getenv("SYNC_RETENTION_DAYS", 30)) * 86400
+
+class WatermarkExpired(Exception):
+    pass
+
+def get_since_arg():
+    since = request.args.get('since')
+    if not since:
+        return None
+    try:
+        since = decode_cursor(since)
+    except InvalidCursor:
+        raise InvalidParameter('Invalid watermark')
+    try:
+        changed_at = datetime.fromisoformat(since[0])
+    except ValueError:
+        raise InvalidParameter('Invalid watermark')
+    if time.time() - changed_at.timestamp() > SYNC_RETENTION_SECONDS:
+        raise WatermarkExpired()
+    return since
+
+# Optional ?fields=id,question,answer projection for question lists
+def get_fields_arg():
+    fields = request.args.get('fields')
+    if not fields:
+        return None
+    fields = {field.strip() for field in fields.split(',') if field.strip()}
+    unknown = fields - QUESTION_FIELDS
+    if unknown:
+        raise InvalidParameter(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return fields
 
 # Auth decorator
 def require_auth(f):
@@ -29,19 +390,149 @@ def require_auth(f):
         try:
             # Extract token from "Bearer <token>"
             token = auth_header.split(' ')[1]
-            # Verify token with Supabase
-            user = supabase.auth.get_user(token)
+            # Verify token signature, expiry and audience
+            with metrics.timer('auth'):
+                user = token_verifier.verify(token)
             if not user:
                 return jsonify({'error': 'Invalid token'}), 401
             
             # Add user to request context
-            request.current_user = user.user
+            request.current_user = user
             return f(*args, **kwargs)
+        except StorageUnavailable as e:
+            return storage_unavailable(e)
         except Exception as e:
             return jsonify({'error': 'Invalid token', 'details': str(e)}), 401
     
     return decorated_function
 
+# Request timing: latency histograms, Server-Timing header and slow request log
+@app.before_request
+def start_request_timer():
+    metrics.start_request()
+
+@app.after_request
+def record_request_timing(response):
+    timings = metrics.current_timings()
+    if timings is None:
+        return response
+    
+    total = time.perf_counter() - timings.started
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    request_metrics.observe_request(request.method, route, response.status_code, total, timings.duration('db'))
+    response.headers['Server-Timing'] = timings.server_timing(total)
+    
+    if total >= SLOW_REQUEST_SECONDS:
+        app.logger.warning(
+            'Slow request: %s %s -> %s in %.0f ms (%s)',
+            request.method, request.path, response.status_code, total * 1000, response.headers['Server-Timing']
+        )
+    return response
+
+# Registered after record_request_timing so it runs first and its time is included
+@app.after_request
+def compress_response(response):
+    if 'Content-Encoding' in response.headers:
+        return response
+    with metrics.timer('compress'):
+        return compressor.compress_response(request, response)
+
+# Admission control for the anonymous endpoints, checked before any backend work:
+# per-route concurrency caps (503) and token buckets per client IP and per receiver (429).
+# RATE_LIMIT_REDIS_URL (or CACHE_REDIS_URL) shares the buckets across workers;
+# RATE_LIMIT=0 turns the rate limits off, e.g. for load tests.
+RATE_LIMITS_ENABLED = os.getenv("RATE_LIMIT", "1").lower() not in ("0", "false", "no")
+TRUSTED_PROXIES = int(os.getenv("TRUSTED_PROXIES", 0))
+rate_limit_redis_url = os.getenv("RATE_LIMIT_REDIS_URL") or os.getenv("CACHE_REDIS_URL")
+if rate_limit_redis_url:
+    rate_limit_store = RedisBucketStore(rate_limit_redis_url)
+else:
+    rate_limit_store = MemoryBucketStore(maxsize=int(os.getenv("RATE_LIMIT_STORE_SIZE", 100000)))
+
+def rate_limiter(name, default):
+    # Configured as "<requests>/<seconds>", e.g. RATE_LIMIT_SUBMIT_IP=30/60
+    rate, burst = parse_rate(os.getenv(f"RATE_LIMIT_{name.upper()}", default))
+    return TokenBucketLimiter(name, rate, burst, rate_limit_store)
+
+def client_ip():
+    # Behind TRUSTED_PROXIES proxies, the client is the address the outermost one appended
+    forwarded = [address.strip() for address in request.headers.get('X-Forwarded-For', '').split(',') if address.strip()]
+    if TRUSTED_PROXIES and len(forwarded) >= TRUSTED_PROXIES:
+        return forwarded[-TRUSTED_PROXIES]
+    return request.remote_addr
+
+def submitted_receiver():
+    data = request.get_json(silent=True)
+    receiver = data.get('receiver') if isinstance(data, dict) else None
+    # Anything but a username is rejected by the view; it must not become a bucket key
+    return receiver if isinstance(receiver, str) else None
+
+# endpoint -> (concurrency cap, [(rate limiter, key function)])
+ADMISSION_RULES = {
+    'submit_question': (
+        ConcurrencyLimiter(int(os.getenv("CONCURRENCY_SUBMIT", 64))),
+        [(rate_limiter('submit_ip', '30/60'), client_ip), (rate_limiter('submit_receiver', '300/60'), submitted_receiver)],
+    ),
+    'signup': (
+        ConcurrencyLimiter(int(os.getenv("CONCURRENCY_SIGNUP", 16))),
+        [(rate_limiter('signup_ip', '10/3600'), client_ip)],
+    ),
+    'login': (
+        ConcurrencyLimiter(int(os.getenv("CONCURRENCY_LOGIN", 32))),
+        [(rate_limiter('login_ip', '20/60'), client_ip)],
+    ),
+}
+
+def rate_limit_response():
+    """Hit the current request's rate limiters; return a 429 response, or None if it is admitted"""
+    rule = ADMISSION_RULES.get(request.endpoint)
+    if rule is None or request.method == 'OPTIONS' or not RATE_LIMITS_ENABLED:
+        return None
+    for limiter, key in rule[1]:
+        value = key()
+        if value is None:
+            continue
+        wait = limiter.hit(value)
+        if wait:
+            response = jsonify({'error': 'Too many requests, please slow down'})
+            response.headers['Retry-After'] = str(math.ceil(wait))
+            return response, 429
+    return None
+
+@app.before_request
+def admit_request():
+    rule = ADMISSION_RULES.get(request.endpoint)
+    if rule is None or request.method == 'OPTIONS':
+        return None
+    slots, _ = rule
+    
+    if not slots.acquire():
+        response = jsonify({'error': 'Server busy, please retry shortly'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    g.admission_slots = slots
+    
+    # The ASGI app checks the rate limits off its event loop before this hook runs
+    if 'rate_limit_response' in g:
+        return g.pop('rate_limit_response')
+    return rate_limit_response()
+
+@app.teardown_request
+def release_admission_slot(exc):
+    slots = g.pop('admission_slots', None)
+    if slots is not None:
+        slots.release()
+
+# Prometheus metrics endpoint; set METRICS_TOKEN to require "Authorization: Bearer <token>"
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    if METRICS_TOKEN:
+        expected = f'Bearer {METRICS_TOKEN}'
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), expected):
+            return jsonify({'error': 'Unauthorized'}), 401
+    body = request_metrics.render() + resilient_storage.render() + question_screen.render()
+    return app.response_class(body, mimetype='text/plain; version=0.0.4')
+
 # Health check endpoint
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -60,44 +551,35 @@ def signup():
             return jsonify({'error': 'Email, password, and username are required'}), 400
         
         # Check if username already exists
-        existing_user = supabase.table('profiles').select('*').eq('username', username).execute()
-        if existing_user.data:
+        if storage.profiles.exists(username):
             return jsonify({'error': 'Username already exists'}), 409
         
         # Sign up with Supabase Auth
-        response = supabase.auth.sign_up({
-            'email': email,
-            'password': password
-        })
+        response = storage.auth.sign_up(email, password)
         
         if response.user:
-            # Create profile in profiles table using admin client
-            profile_data = {
-                'id': response.user.id,
-                'username': username,
-                'email': email,
-                'created_at': datetime.now().isoformat()
-            }
-            
+            # Create the profile; the unique constraint catches a concurrent signup for the same name
             try:
-                # Create profile in profiles table
-                supabase.table('profiles').insert(profile_data).execute()
+                profile = provision_profile(response.user, [username])
             except Exception as profile_error:
-                # If profile creation fails, we should clean up the auth user
                 print(f"Profile creation failed: {profile_error}")
                 return jsonify({'error': f'Profile creation failed: {str(profile_error)}'}), 500
+            if not profile:
+                return jsonify({'error': 'Username already exists'}), 409
             
             return jsonify({
                 'message': 'User created successfully',
                 'user': {
                     'id': response.user.id,
                     'email': response.user.email,
-                    'username': username
+                    'username': profile['username']
                 }
             }), 201
         else:
             return jsonify({'error': 'Failed to create user', 'details': 'No user returned from Supabase'}), 400
             
+    except StorageUnavailable as e:
+        return storage_unavailable(e)
     except Exception as e:
         # More detailed error handling
         error_msg = str(e)
@@ -119,21 +601,18 @@ def login():
             return jsonify({'error': 'Email and password are required'}), 400
         
         # Sign in with Supabase Auth
-        response = supabase.auth.sign_in_with_password({
-            'email': email,
-            'password': password
-        })
+        response = storage.auth.sign_in_with_password(email, password)
         
         if response.user and response.session:
             # Get user profile
-            profile = supabase.table('profiles').select('*').eq('id', response.user.id).execute()
+            profile = get_profile_by_id(response.user.id)
             
             return jsonify({
                 'message': 'Login successful',
                 'user': {
                     'id': response.user.id,
                     'email': response.user.email,
-                    'username': profile.data[0]['username'] if profile.data else None
+                    'username': profile['username'] if profile else None
                 },
                 'session': {
                     'access_token': response.session.access_token,
@@ -143,6 +622,8 @@ def login():
         else:
             return jsonify({'error': 'Invalid credentials'}), 401
             
+    except StorageUnavailable as e:
+        return storage_unavailable(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -150,8 +631,13 @@ def login():
 @require_auth
 def logout():
     try:
-        supabase.auth.sign_out()
+        token = request.headers['Authorization'].split(' ')[1]
+        # Otherwise the verified-token cache would keep accepting it
+        token_verifier.invalidate(token)
+        storage.auth.sign_out(token)
         return jsonify({'message': 'Logged out successfully'}), 200
+    except StorageUnavailable as e:
+        return storage_unavailable(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -165,41 +651,20 @@ def google_auth():
             return jsonify({'error': 'Google ID token is required'}), 400
         
         # Sign in with Google using Supabase
-        response = supabase.auth.sign_in_with_id_token({
-            'provider': 'google',
-            'token': id_token
-        })
+        response = storage.auth.sign_in_with_id_token('google', id_token)
         
         if response.user and response.session:
-            # Check if profile exists, if not create it
-            profile = supabase.table('profiles').select('*').eq('id', response.user.id).execute()
+            # Get the profile, creating it on first login (one query either way)
+            email = response.user.email
+            username = email.split('@')[0] if email else f"user_{response.user.id[:8]}"
             
-            if not profile.data:
-                # Extract username from email (fallback) or use display name
-                email = response.user.email
-                username = email.split('@')[0] if email else f"user_{response.user.id[:8]}"
-                
-                # Check if username exists and make it unique if needed
-                existing_username = supabase.table('profiles').select('*').eq('username', username).execute()
-                if existing_username.data:
-                    username = f"{username}_{response.user.id[:8]}"
-                
-                # Create profile
-                profile_data = {
-                    'id': response.user.id,
-                    'username': username,
-                    'email': response.user.email,
-                    'created_at': datetime.now().isoformat()
-                }
-                
-                try:
-                    supabase.table('profiles').insert(profile_data).execute()
-                    created_profile = profile_data
-                except Exception as profile_error:
-                    print(f"Profile creation failed: {profile_error}")
-                    return jsonify({'error': f'Profile creation failed: {str(profile_error)}'}), 500
-            else:
-                created_profile = profile.data[0]
+            try:
+                created_profile = provision_profile(response.user, username_candidates(username, response.user.id))
+            except Exception as profile_error:
+                print(f"Profile creation failed: {profile_error}")
+                return jsonify({'error': f'Profile creation failed: {str(profile_error)}'}), 500
+            if not created_profile:
+                return jsonify({'error': 'Could not allocate a username'}), 409
             
             return jsonify({
                 'message': 'Google authentication successful',
@@ -216,6 +681,8 @@ def google_auth():
         else:
             return jsonify({'error': 'Google authentication failed'}), 401
             
+    except StorageUnavailable as e:
+        return storage_unavailable(e)
     except Exception as e:
         print(f"Google auth error: {e}")
         return jsonify({'error': f'Google authentication failed: {str(e)}'}), 500
@@ -231,44 +698,25 @@ def oauth_callback():
             return jsonify({'error': 'OAuth code is required'}), 400
         
         # Exchange code for session using Supabase
-        response = supabase.auth.exchange_code_for_session(code)
+        response = storage.auth.exchange_code_for_session(code)
         
         if response.user and response.session:
-            # Check if profile exists, if not create it
-            profile = supabase.table('profiles').select('*').eq('id', response.user.id).execute()
+            # Try to get username from metadata or email
+            email = response.user.email
+            user_metadata = response.user.user_metadata or {}
+            username = user_metadata.get('preferred_username') or user_metadata.get('name') or (email.split('@')[0] if email else f"user_{response.user.id[:8]}")
             
-            if not profile.data:
-                # Extract username from email or user metadata
-                email = response.user.email
-                user_metadata = response.user.user_metadata or {}
-                
-                # Try to get username from metadata or email
-                username = user_metadata.get('preferred_username') or user_metadata.get('name') or email.split('@')[0] if email else f"user_{response.user.id[:8]}"
-                
-                # Clean username (remove spaces, special chars)
-                username = ''.join(c for c in username if c.isalnum() or c in '_-').lower()
-                
-                # Check if username exists and make it unique if needed
-                existing_username = supabase.table('profiles').select('*').eq('username', username).execute()
-                if existing_username.data:
-                    username = f"{username}_{response.user.id[:8]}"
-                
-                # Create profile
-                profile_data = {
-                    'id': response.user.id,
-                    'username': username,
-                    'email': response.user.email,
-                    'created_at': datetime.now().isoformat()
-                }
-                
-                try:
-                    supabase.table('profiles').insert(profile_data).execute()
-                    created_profile = profile_data
-                except Exception as profile_error:
-                    print(f"Profile creation failed: {profile_error}")
-                    return jsonify({'error': f'Profile creation failed: {str(profile_error)}'}), 500
-            else:
-                created_profile = profile.data[0]
+            # Clean username (remove spaces, special chars)
+            username = ''.join(c for c in username if c.isalnum() or c in '_-').lower() or f"user_{response.user.id[:8]}"
+            
+            # Get the profile, creating it on first login (one query either way)
+            try:
+                created_profile = provision_profile(response.user, username_candidates(username, response.user.id))
+            except Exception as profile_error:
+                print(f"Profile creation failed: {profile_error}")
+                return jsonify({'error': f'Profile creation failed: {str(profile_error)}'}), 500
+            if not created_profile:
+                return jsonify({'error': 'Could not allocate a username'}), 409
             
             return jsonify({
                 'message': 'OAuth authentication successful',
@@ -285,34 +733,121 @@ def oauth_callback():
         else:
             return jsonify({'error': 'OAuth authentication failed'}), 401
             
+    except StorageUnavailable as e:
+        return storage_unavailable(e)
     except Exception as e:
         print(f"OAuth callback error: {e}")
         return jsonify({'error': f'OAuth authentication failed: {str(e)}'}), 500
 
-# User profile endpoints
+# User profile endpoints. The helpers are shared with the async view in asgi.py.
+def get_profile_page_args():
+    limit, cursor = get_page_args()
+    fields = get_fields_arg()
+    page_key = f"{limit}:{request.args.get('cursor', '')}:{','.join(sorted(fields or ()))}"
+    return limit, cursor, fields, page_key
+
+def build_profile_page(user_data, answered_questions, next_key, fields):
+    """Render one page of a public profile, or return None if the user does not exist"""
+    if not user_data:
+        return None
+    
+    body = app.json.dumps({
+        'user': dump_public_user(user_data),
+        'answered_questions': dump_questions(answered_questions, fields),
+        'next_cursor': encode_cursor(next_key)
+    }) + '\n'
+    # Plain JSON so the result can be shared with other workers through Redis
+    return {'body': body, 'etag': hashlib.sha256(body.encode()).hexdigest()[:32]}
+
+def render_profile_page(username, limit, cursor, fields):
+    columns = tuple(fields) if fields else QUESTION_COLUMNS
+    # Get user profile and a page of answered questions for this user
+    user_data, (answered_questions, next_key) = query_executor.gather(
+        lambda: storage.profiles.get_by_username(username),
+        lambda: storage.questions.list_by_receiver(username, True, limit, cursor, columns),
+    )
+    return build_profile_page(user_data, answered_questions, next_key, fields)
+
+def cached_profile_page(username, page_key, outage=False):
+    """Return ``(entry, refresh)``: the cached page, if any, and whether the caller should re-render it.
+
+    With ``outage`` any cached copy is returned, however old or outdated.
+    """
+    entry = profile_response_cache.get((username, page_key))
+    if entry is None or outage:
+        return entry, False
+    if entry['generation'] != profile_generations.get(username):
+        return None, False
+    now = time.monotonic()
+    if now >= entry['fresh_until'] + PROFILE_STALE_TTL:
+        return None, False
+    if now >= entry['fresh_until'] and not entry.get('refreshing'):
+        # Stale: it is served anyway and only one request re-renders it in the background
+        entry['refreshing'] = True
+        return entry, True
+    return entry, False
+
+def store_profile_page(username, page_key, generation, page):
+    """Cache a rendered page, unless the user's pages were invalidated since ``generation``"""
+    entry = {
+        'body': page['body'].encode(),
+        'etag': page['etag'],
+        'encoded': {},
+        'fresh_until': time.monotonic() + PROFILE_RESPONSE_TTL,
+        'generation': generation,
+    }
+    if profile_generations.get(username) == generation:
+        profile_response_cache.set((username, page_key), entry)
+    return entry
+
+def load_profile_page(username, page_key, limit, cursor, fields):
+    """Render a page through the single-flight group and cache it"""
+    generation = profile_generations.get(username)
+    page = profile_flights.do(
+        f"{username}:{page_key}:{generation}",
+        lambda: render_profile_page(username, limit, cursor, fields),
+    )
+    if page is None:
+        return None
+    return store_profile_page(username, page_key, generation, page)
+
+def refresh_profile_page(entry, username, page_key, limit, cursor, fields):
+    try:
+        with app.app_context():
+            if load_profile_page(username, page_key, limit, cursor, fields) is None:
+                invalidate_profile_responses(username)
+    except Exception:
+        # Keep serving the stale copy; the next request after it expires fetches again
+        entry['refreshing'] = False
+
 @app.route('/user/<username>', methods=['GET'])
 def get_user_profile(username):
     try:
-        # Get user profile
-        profile = supabase.table('profiles').select('*').eq('username', username).execute()
+        limit, cursor, fields, page_key = get_profile_page_args()
         
-        if not profile.data:
+        # Serve from the response cache when this page was rendered recently
+        entry, refresh = cached_profile_page(username, page_key)
+        if refresh:
+            refresh_executor.submit(
+                lambda: refresh_profile_page(entry, username, page_key, limit, cursor, fields)
+            )
+        if entry is None:
+            entry = load_profile_page(username, page_key, limit, cursor, fields)
+        if entry is None:
             return jsonify({'error': 'User not found'}), 404
         
-        user_data = profile.data[0]
-        
-        # Get answered questions for this user
-        answered_questions = supabase.table('questions').select('*').eq('receiver', username).eq('answered', True).order('answered_at', desc=True).execute()
-        
-        return jsonify({
-            'user': {
-                'id': user_data['id'],
-                'username': user_data['username'],
-                'created_at': user_data['created_at']
-            },
-            'answered_questions': answered_questions.data
-        }), 200
+        return cached_json_response(entry, PROFILE_CACHE_CONTROL)
         
+    except InvalidParameter as e:
+        return jsonify({'error': str(e)}), 400
+    except QueryTimeout as e:
+        return jsonify({'error': str(e)}), 504
+    except StorageUnavailable as e:
+        # Storage is down: an old copy of the page is better than an error
+        entry, _ = cached_profile_page(username, page_key, outage=True)
+        if entry is not None:
+            return cached_json_response(entry, PROFILE_CACHE_CONTROL)
+        return storage_unavailable(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -321,25 +856,91 @@ def get_user_profile(username):
 def get_user_questions(username):
     try:
         # Verify user can only access their own questions
-        current_user_profile = supabase.table('profiles').select('*').eq('id', request.current_user.id).execute()
-        if not current_user_profile.data or current_user_profile.data[0]['username'] != username:
+        current_user_profile = get_profile_by_id(request.current_user.id)
+        if not current_user_profile or current_user_profile['username'] != username:
             return jsonify({'error': 'Unauthorized'}), 403
         
-        # Get all questions for this user
-        questions = supabase.table('questions').select('*').eq('receiver', username).order('created_at', desc=True).execute()
+        # Delta sync: ?since=<watermark> (empty for a first sync) returns only what changed
+        if 'since' in request.args:
+            limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+            limit = max(1, min(limit, MAX_PAGE_SIZE))
+            fields = get_fields_arg()
+            changed, deleted, watermark, has_more = storage.questions.changes_since(username, get_since_arg(), limit)
+            return jsonify({
+                'changed': dump_questions(changed, fields),
+                'deleted': deleted,
+                'watermark': encode_cursor(watermark),
+                'has_more': has_more
+            }), 200
+        
+        status = request.args.get('status', 'all')
+        if status not in ('all', 'unanswered', 'answered'):
+            return jsonify({'error': 'Status must be one of: all, unanswered, answered'}), 400
         
-        unanswered = [q for q in questions.data if not q['answered']]
-        answered = [q for q in questions.data if q['answered']]
+        limit, cursor = get_page_args()
+        fields = get_fields_arg()
+        columns = tuple(fields) if fields else QUESTION_COLUMNS
+        if cursor and status == 'all':
+            return jsonify({'error': 'A cursor requires status=unanswered or status=answered'}), 400
         
-        return jsonify({
-            'unanswered_questions': unanswered,
-            'answered_questions': answered
-        }), 200
+        response = {}
+        
+        # Each bucket is its own index-backed query
+        if status in ('all', 'unanswered'):
+            unanswered, next_key = storage.questions.list_by_receiver(username, False, limit, cursor, columns)
+            response['unanswered_questions'] = dump_questions(unanswered, fields)
+            response['unanswered_next_cursor'] = encode_cursor(next_key)
+        
+        if status in ('all', 'answered'):
+            answered, next_key = storage.questions.list_by_receiver(username, True, limit, cursor, columns)
+            response['answered_questions'] = dump_questions(answered, fields)
+            response['answered_next_cursor'] = encode_cursor(next_key)
         
+        return jsonify(response), 200
+        
+    except InvalidParameter as e:
+        return jsonify({'error': str(e)}), 400
+    except WatermarkExpired:
+        return jsonify({'error': 'Watermark expired, sync again without since'}), 410
+    except StorageUnavailable as e:
+        return storage_unavailable(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-# Question endpoints
+# Question endpoints. The helpers are shared with the async view in asgi.py.
+def new_question(receiver, question):
+    return {
+        'receiver': receiver,
+        'question': question,
+        'answered': False,
+        'created_at': datetime.now().isoformat()
+    }
+
+def buffer_question(question_data):
+    """In buffered mode, queue the question and return the response; None means insert it directly"""
+    if submit_buffer is None:
+        return None
+    # A full queue sheds load; a closed buffer falls back to a direct insert
+    try:
+        submit_buffer.add(question_data)
+        return jsonify({
+            'message': 'Question accepted',
+            'question': question_data
+        }), 202
+    except BufferFull:
+        response = jsonify({'error': 'Too many questions right now, please retry shortly'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    except BufferClosed:
+        return None
+
+def question_submitted(result):
+    publish_questions('question', [result])
+    return jsonify({
+        'message': 'Question submitted successfully',
+        'question': dump_question(result)
+    }), 201
+
 @app.route('/questions', methods=['POST'])
 def submit_question():
     try:
@@ -349,27 +950,30 @@ def submit_question():
         
         if not receiver or not question:
             return jsonify({'error': 'Receiver and question are required'}), 400
+        if not isinstance(receiver, str):
+            return jsonify({'error': 'Receiver must be a username'}), 400
+        
+        # Spam screening runs in-process, so rejected questions cost no round trip
+        fingerprint = question_screen.check(receiver, question)
         
         # Verify receiver exists
-        profile = supabase.table('profiles').select('*').eq('username', receiver).execute()
-        if not profile.data:
+        if not receiver_exists(receiver):
             return jsonify({'error': 'User not found'}), 404
         
         # Insert question
-        question_data = {
-            'receiver': receiver,
-            'question': question,
-            'answered': False,
-            'created_at': datetime.now().isoformat()
-        }
-        
-        result = supabase.table('questions').insert(question_data).execute()
-        
-        return jsonify({
-            'message': 'Question submitted successfully',
-            'question': result.data[0]
-        }), 201
+        question_data = new_question(receiver, question)
+        response = buffer_question(question_data)
+        if response is None:
+            response = question_submitted(storage.questions.create(question_data))
+        # A full submit queue (503) did not take the question, so it may be sent again
+        if response[1] < 300:
+            question_screen.remember(receiver, fingerprint)
+        return response
         
+    except QuestionRejected as e:
+        return question_rejected(e)
+    except StorageUnavailable as e:
+        return storage_unavailable(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -383,30 +987,33 @@ def answer_question(question_id):
         if not answer:
             return jsonify({'error': 'Answer is required'}), 400
         
-        # Get the question
-        question = supabase.table('questions').select('*').eq('id', question_id).execute()
-        if not question.data:
-            return jsonify({'error': 'Question not found'}), 404
-        
-        # Verify user can answer this question
-        current_user_profile = supabase.table('profiles').select('*').eq('id', request.current_user.id).execute()
-        if not current_user_profile.data or current_user_profile.data[0]['username'] != question.data[0]['receiver']:
+        current_user_profile = get_profile_by_id(request.current_user.id)
+        if not current_user_profile:
             return jsonify({'error': 'Unauthorized'}), 403
+        username = current_user_profile['username']
         
-        # Update question with answer
+        # Update question with answer; the ownership check is part of the write
         update_data = {
             'answer': answer,
             'answered': True,
             'answered_at': datetime.now().isoformat()
         }
         
-        result = supabase.table('questions').update(update_data).eq('id', question_id).execute()
+        result = storage.questions.update_for_receiver(question_id, username, update_data)
+        invalidate_profile_responses(username)
+        publish_questions('answered', [result])
         
         return jsonify({
             'message': 'Question answered successfully',
-            'question': result.data[0]
+            'question': dump_question(result)
         }), 200
         
+    except QuestionNotFound:
+        return jsonify({'error': 'Question not found'}), 404
+    except NotQuestionOwner:
+        return jsonify({'error': 'Unauthorized'}), 403
+    except StorageUnavailable as e:
+        return storage_unavailable(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -414,56 +1021,221 @@ def answer_question(question_id):
 @require_auth
 def delete_question(question_id):
     try:
-        # Get the question
-        question = supabase.table('questions').select('*').eq('id', question_id).execute()
-        if not question.data:
-            return jsonify({'error': 'Question not found'}), 404
-        
-        # Verify user can delete this question
-        current_user_profile = supabase.table('profiles').select('*').eq('id', request.current_user.id).execute()
-        if not current_user_profile.data or current_user_profile.data[0]['username'] != question.data[0]['receiver']:
+        current_user_profile = get_profile_by_id(request.current_user.id)
+        if not current_user_profile:
             return jsonify({'error': 'Unauthorized'}), 403
+        username = current_user_profile['username']
         
-        # Delete question
-        supabase.table('questions').delete().eq('id', question_id).execute()
+        # Delete question; the ownership check is part of the write
+        question = storage.questions.delete_for_receiver(question_id, username)
+        if question['answered']:
+            invalidate_profile_responses(username)
         
         return jsonify({'message': 'Question deleted successfully'}), 200
         
+    except QuestionNotFound:
+        return jsonify({'error': 'Question not found'}), 404
+    except NotQuestionOwner:
+        return jsonify({'error': 'Unauthorized'}), 403
+    except StorageUnavailable as e:
+        return storage_unavailable(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Bulk inbox management: one ownership-checked write for the whole list,
+# plus one lookup to explain the ids that were skipped
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", 100))
+
+def get_bulk_ids(values):
+    if not isinstance(values, list) or not values:
+        raise InvalidParameter('A non-empty list is required')
+    if len(values) > BULK_MAX_ITEMS:
+        raise InvalidParameter(f'At most {BULK_MAX_ITEMS} questions per request')
+    if not all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+        raise InvalidParameter('Question ids must be integers')
+    return list(dict.fromkeys(values))
+
+def bulk_results(question_ids, rows, ok_status):
+    # Per-item results in request order; skipped ids are either missing (404) or someone else's (403)
+    by_id = {row['id']: row for row in rows}
+    missing = [question_id for question_id in question_ids if question_id not in by_id]
+    existing = storage.questions.existing_ids(missing) if missing else set()
+    results = []
+    for question_id in question_ids:
+        if question_id in by_id:
+            results.append({'id': question_id, 'status': ok_status, 'question': dump_question(by_id[question_id])})
+        elif question_id in existing:
+            results.append({'id': question_id, 'status': 403, 'error': 'Unauthorized'})
+        else:
+            results.append({'id': question_id, 'status': 404, 'error': 'Question not found'})
+    return {'results': results, 'succeeded': len(by_id), 'failed': len(missing)}
+
+@app.route('/questions/bulk/answer', methods=['POST'])
+@require_auth
+def bulk_answer_questions():
+    try:
+        data = request.get_json()
+        items = data.get('answers')
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            return jsonify({'error': 'Answers must be a list of {"id": ..., "answer": ...} objects'}), 400
+        if not all(item.get('answer') for item in items):
+            return jsonify({'error': 'Answer is required'}), 400
+        question_ids = get_bulk_ids([item.get('id') for item in items])
+        answers = {item['id']: item['answer'] for item in items}
+        
+        current_user_profile = get_profile_by_id(request.current_user.id)
+        if not current_user_profile:
+            return jsonify({'error': 'Unauthorized'}), 403
+        username = current_user_profile['username']
+        
+        rows = storage.questions.answer_many_for_receiver(answers, username, datetime.now().isoformat())
+        if rows:
+            invalidate_profile_responses(username)
+            publish_questions('answered', rows)
+        
+        return jsonify(bulk_results(question_ids, rows, 200)), 200
+        
+    except InvalidParameter as e:
+        return jsonify({'error': str(e)}), 400
+    except StorageUnavailable as e:
+        return storage_unavailable(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/questions/bulk/delete', methods=['POST'])
+@require_auth
+def bulk_delete_questions():
+    try:
+        data = request.get_json()
+        question_ids = get_bulk_ids(data.get('ids'))
+        
+        current_user_profile = get_profile_by_id(request.current_user.id)
+        if not current_user_profile:
+            return jsonify({'error': 'Unauthorized'}), 403
+        username = current_user_profile['username']
+        
+        rows = storage.questions.delete_many_for_receiver(question_ids, username)
+        if any(row['answered'] for row in rows):
+            invalidate_profile_responses(username)
+        
+        return jsonify(bulk_results(question_ids, rows, 200)), 200
+        
+    except InvalidParameter as e:
+        return jsonify({'error': str(e)}), 400
+    except StorageUnavailable as e:
+        return storage_unavailable(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Live inbox updates over Server-Sent Events: "question" when a question arrives,
+# "answered" when one is answered. Reconnecting clients send Last-Event-ID to get
+# what they missed, or a "reset" event when that is no longer available.
+def events_unavailable_reason():
+    # Vercel functions buffer the whole response, and without Redis a stream only
+    # sees the writes handled by its own worker
+    if os.getenv("VERCEL"):
+        return 'Live events are not available on this deployment, poll /dashboard instead'
+    if worker_processes > 1 and not isinstance(event_broker, RedisEventBroker):
+        return 'Live events need EVENTS_REDIS_URL with several workers, poll /dashboard instead'
+    return None
+
+def event_stream(subscription):
+    yield f'retry: {SSE_RETRY_MS}\n\n'
+    if not subscription.complete:
+        yield 'event: reset\ndata: {}\n\n'
+    for event in subscription.missed:
+        yield event.format(app.json.dumps)
+    # Streams end after SSE_MAX_SECONDS so workers are not held forever;
+    # the client reconnects with Last-Event-ID and misses nothing
+    deadline = time.monotonic() + SSE_MAX_SECONDS
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        event = subscription.get(timeout=min(SSE_HEARTBEAT_SECONDS, remaining))
+        yield event.format(app.json.dumps) if event else ': heartbeat\n\n'
+
+@app.route('/events', methods=['GET'])
+@require_auth
+def stream_events():
+    reason = events_unavailable_reason()
+    if reason:
+        return jsonify({'error': reason}), 501
+    
+    try:
+        profile = get_profile_by_id(request.current_user.id)
+        if not profile:
+            return jsonify({'error': 'User profile not found'}), 404
+        
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        try:
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            return jsonify({'error': 'Invalid Last-Event-ID'}), 400
+    except StorageUnavailable as e:
+        return storage_unavailable(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    if not event_streams.acquire():
+        response = jsonify({'error': 'Too many open event streams, please retry shortly'})
+        response.headers['Retry-After'] = str(math.ceil(SSE_RETRY_MS / 1000))
+        return response, 503
+    try:
+        subscription = event_broker.subscribe(profile['username'], last_event_id)
+    except Exception as e:
+        event_streams.release()
+        return jsonify({'error': str(e)}), 500
+    
+    def release():
+        subscription.close()
+        event_streams.release()
+    
+    response = app.response_class(event_stream(subscription), mimetype='text/event-stream')
+    # Runs when the server closes the response, even if the stream was never started
+    response.call_on_close(release)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 # Dashboard endpoint
 @app.route('/dashboard', methods=['GET'])
 @require_auth
 def get_dashboard():
     try:
         # Get current user profile
-        profile = supabase.table('profiles').select('*').eq('id', request.current_user.id).execute()
-        if not profile.data:
+        profile = get_profile_by_id(request.current_user.id)
+        if not profile:
             return jsonify({'error': 'User profile not found'}), 404
         
-        username = profile.data[0]['username']
-        
-        # Get recent unanswered questions
-        unanswered = supabase.table('questions').select('*').eq('receiver', username).eq('answered', False).order('created_at', desc=True).limit(10).execute()
+        username = profile['username']
         
-        # Get recent answered questions
-        answered = supabase.table('questions').select('*').eq('receiver', username).eq('answered', True).order('answered_at', desc=True).limit(10).execute()
+        # Recent unanswered questions, recent answers and exact totals (maintained
+        # by triggers on the questions table) are independent, so fetch them together
+        (unanswered, _), (answered, _), counts = query_executor.gather(
+            lambda: storage.questions.list_by_receiver(username, False, 10),
+            lambda: storage.questions.list_by_receiver(username, True, 10),
+            lambda: storage.questions.counts(username),
+        )
         
         return jsonify({
             'user': {
                 'username': username,
                 'profile_url': f'/user/{username}'
             },
-            'unanswered_questions': unanswered.data,
-            'recent_answers': answered.data,
+            'unanswered_questions': dump_questions(unanswered),
+            'recent_answers': dump_questions(answered),
             'stats': {
-                'total_questions': len(unanswered.data) + len(answered.data),
-                'unanswered_count': len(unanswered.data),
-                'answered_count': len(answered.data)
+                'total_questions': counts['total_count'],
+                'unanswered_count': counts['unanswered_count'],
+                'answered_count': counts['answered_count']
             }
         }), 200
         
+    except QueryTimeout as e:
+        return jsonify({'error': str(e)}), 504
+    except StorageUnavailable as e:
+        return storage_unavailable(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -477,7 +1249,7 @@ def refresh_token():
             return jsonify({'error': 'Refresh token is required'}), 400
         
         # Refresh the session using Supabase
-        response = supabase.auth.refresh_session(refresh_token)
+        response = storage.auth.refresh_session(refresh_token)
         
         if response.session:
             return jsonify({
@@ -490,6 +1262,8 @@ def refresh_token():
         else:
             return jsonify({'error': 'Token refresh failed'}), 401
             
+    except StorageUnavailable as e:
+        return storage_unavailable(e)
     except Exception as e:
         print(f"Token refresh error: {e}")
         return jsonify({'error': f'Token refresh failed: {str(e)}'}), 500
@@ -0,0 +1,348 @@
+"""ASGI serving mode: ``uvicorn asgi:app`` (requires ``pip install uvicorn``).
+
+The hot public routes run as coroutines on the event loop:
+``GET /user/<username>`` and ``POST /questions``. Their storage calls go
+through async_storage.py, so one process can keep thousands of them waiting
+on Supabase at once. They reuse the helpers, caches and response building in
+api.py, so they return the same responses as the sync views.
+
+Every other request is handed to the Flask app on a thread pool of
+``ASGI_WSGI_THREADS`` threads. Routes and response shapes are therefore the
+same in both modes. Streaming responses (``GET /events``) hold one of those
+threads while they are open.
+
+In this mode concurrent profile misses are coalesced per process only; the
+Redis single-flight group of api.py is not used.
+
+Flask's ``before_request`` hooks run on the event loop for the async views,
+so rate limits kept in Redis are checked in a thread just before them.
+"""
+import asyncio
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from flask import g, jsonify, request
+from werkzeug.exceptions import HTTPException
+
+import api
+import metrics
+from async_storage import create_async_storage
+from cache import AsyncSingleFlight, RedisCache
+from events import RedisEventBroker
+from parallel import QueryTimeout
+from ratelimit import RedisBucketStore
+from resilience import StorageUnavailable
+from screening import QuestionRejected
+from storage import QUESTION_COLUMNS
+
+# Shared connection pool to Supabase for the async routes. The sync storage
+# underneath api.storage is reused (in threads) for the other backends.
+# Calls get the same deadlines, retries and circuit breakers as the sync routes.
+async_storage = create_async_storage(
+    os.getenv("STORAGE_BACKEND", "supabase"),
+    api.resilient_storage.inner,
+    supabase_url=api.url,
+    supabase_key=api.key,
+    **api.supabase_pool,
+)
+storage = metrics.InstrumentedStorage(api.resilient_storage.share(async_storage), api.request_metrics)
+QUERY_TIMEOUT = api.query_executor.timeout
+
+profile_flights = AsyncSingleFlight()
+# Strong references to background refreshes until they finish
+background_tasks = set()
+
+def run_in_background(coroutine):
+    task = asyncio.ensure_future(coroutine)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+async def receiver_exists(username):
+    exists = api.known_receivers.get(username)
+    if exists is None:
+        exists = await storage.profiles.exists(username)
+        api.known_receivers.set(username, exists, ttl=None if exists else api.RECEIVER_MISS_TTL)
+    return exists
+
+async def render_profile_page(username, limit, cursor, fields):
+    columns = tuple(fields) if fields else QUESTION_COLUMNS
+    try:
+        user_data, (answered_questions, next_key) = await asyncio.wait_for(asyncio.gather(
+            storage.profiles.get_by_username(username),
+            storage.questions.list_by_receiver(username, True, limit, cursor, columns),
+        ), QUERY_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise QueryTimeout(f'Queries did not finish within {QUERY_TIMEOUT}s')
+    return api.build_profile_page(user_data, answered_questions, next_key, fields)
+
+# With CACHE_REDIS_URL the profile generations are in Redis; those round trips go to a thread
+shared_generations = isinstance(api.profile_generations, RedisCache)
+
+async def off_loop_if_shared(fn, *args, **kwargs):
+    if shared_generations:
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    return fn(*args, **kwargs)
+
+async def load_profile_page(username, page_key, limit, cursor, fields):
+    generation = await off_loop_if_shared(api.profile_generations.get, username)
+    page = await profile_flights.do(
+        f"{username}:{page_key}:{generation}",
+        lambda: render_profile_page(username, limit, cursor, fields),
+    )
+    if page is None:
+        return None
+    return await off_loop_if_shared(api.store_profile_page, username, page_key, generation, page)
+
+async def refresh_profile_page(entry, username, page_key, limit, cursor, fields):
+    try:
+        with api.app.app_context():
+            if await load_profile_page(username, page_key, limit, cursor, fields) is None:
+                await off_loop_if_shared(api.invalidate_profile_responses, username)
+    except Exception:
+        entry['refreshing'] = False
+
+async def get_user_profile(username):
+    try:
+        limit, cursor, fields, page_key = api.get_profile_page_args()
+
+        entry, refresh = await off_loop_if_shared(api.cached_profile_page, username, page_key)
+        if refresh:
+            run_in_background(refresh_profile_page(entry, username, page_key, limit, cursor, fields))
+        if entry is None:
+            entry = await load_profile_page(username, page_key, limit, cursor, fields)
+        if entry is None:
+            return jsonify({'error': 'User not found'}), 404
+
+        return api.cached_json_response(entry, api.PROFILE_CACHE_CONTROL)
+
+    except api.InvalidParameter as e:
+        return jsonify({'error': str(e)}), 400
+    except QueryTimeout as e:
+        return jsonify({'error': str(e)}), 504
+    except StorageUnavailable as e:
+        entry, _ = api.cached_profile_page(username, page_key, outage=True)
+        if entry is not None:
+            return api.cached_json_response(entry, api.PROFILE_CACHE_CONTROL)
+        return api.storage_unavailable(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+async def submit_question():
+    try:
+        data = request.get_json()
+        receiver = data.get('receiver')
+        question = data.get('question')
+
+        if not receiver or not question:
+            return jsonify({'error': 'Receiver and question are required'}), 400
+        if not isinstance(receiver, str):
+            return jsonify({'error': 'Receiver must be a username'}), 400
+
+        fingerprint = api.question_screen.check(receiver, question)
+
+        if not await receiver_exists(receiver):
+            return jsonify({'error': 'User not found'}), 404
+
+        question_data = api.new_question(receiver, question)
+        response = None
+        if api.submit_buffer is not None:
+            # Waits up to the buffer's put timeout for room in a full queue
+            response = await asyncio.to_thread(api.buffer_question, question_data)
+        if response is None:
+            result = await storage.questions.create(question_data)
+            if isinstance(api.event_broker, RedisEventBroker):
+                # Publishing is a round trip to Redis
+                response = await asyncio.to_thread(api.question_submitted, result)
+            else:
+                response = api.question_submitted(result)
+        if response[1] < 300:
+            api.question_screen.remember(receiver, fingerprint)
+        return response
+
+    except QuestionRejected as e:
+        return api.question_rejected(e)
+    except StorageUnavailable as e:
+        return api.storage_unavailable(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+async def check_rate_limits():
+    # With a Redis store each limiter is a round trip; api.admit_request picks up the result
+    if isinstance(api.rate_limit_store, RedisBucketStore):
+        g.rate_limit_response = await asyncio.to_thread(api.rate_limit_response)
+
+# (method, Flask endpoint) -> async view; everything else goes to the Flask app
+ASYNC_VIEWS = {
+    ('GET', 'get_user_profile'): get_user_profile,
+    ('POST', 'submit_question'): submit_question,
+}
+
+
+def build_environ(scope, body):
+    """Translate an ASGI HTTP scope into a WSGI environ"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin-1'),
+        'PATH_INFO': scope['path'].encode().decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_LENGTH':
+            continue
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+            continue
+        key = f'HTTP_{name}'
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+def _asgi_headers(headers):
+    return [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+
+async def _read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+class AsyncApp:
+    """ASGI application serving ``views`` natively and the rest through ``flask_app``.
+
+    ``before_view`` is awaited in the request context before Flask's
+    ``before_request`` hooks, for work those hooks would otherwise block on.
+    """
+
+    def __init__(self, flask_app, views, threads=32, on_shutdown=None, before_view=None):
+        self.flask_app = flask_app
+        self.views = views
+        self.before_view = before_view
+        self.on_shutdown = on_shutdown
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise RuntimeError(f"Unsupported ASGI scope type: {scope['type']}")
+
+        body = await _read_body(receive)
+        if body is None:
+            return
+        environ = build_environ(scope, body)
+        view, view_args = self._match(environ)
+        if view is None:
+            return await self._call_wsgi(environ, receive, send)
+
+        response = await self._call_view(view, view_args, environ)
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': _asgi_headers(response.headers.items()),
+        })
+        await send({'type': 'http.response.body', 'body': response.get_data()})
+
+    def _match(self, environ):
+        try:
+            endpoint, view_args = self.flask_app.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            return None, None  # 404/405 and redirects are left to Flask
+        return self.views.get((environ['REQUEST_METHOD'], endpoint)), view_args
+
+    async def _call_view(self, view, view_args, environ):
+        # Same steps as Flask.full_dispatch_request, with the view awaited
+        flask_app = self.flask_app
+        with flask_app.request_context(environ):
+            try:
+                try:
+                    if self.before_view is not None:
+                        await self.before_view()
+                    rv = flask_app.preprocess_request()
+                    if rv is None:
+                        rv = await view(**view_args)
+                except Exception as e:
+                    rv = flask_app.handle_user_exception(e)
+                return flask_app.finalize_request(rv)
+            except Exception as e:
+                return flask_app.handle_exception(e)
+
+    async def _call_wsgi(self, environ, receive, send):
+        loop = asyncio.get_running_loop()
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = headers
+
+        result = await loop.run_in_executor(self._pool, self.flask_app, environ, start_response)
+        chunks = iter(result)
+        end = object()
+        disconnect = asyncio.ensure_future(_wait_for_disconnect(receive))
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': started['status'],
+                'headers': _asgi_headers(started['headers']),
+            })
+            # Chunks are pulled one at a time so streamed responses reach the client as they are produced
+            while not disconnect.done():
+                chunk = await loop.run_in_executor(self._pool, next, chunks, end)
+                if chunk is end:
+                    break
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            disconnect.cancel()
+            if hasattr(result, 'close'):
+                await loop.run_in_executor(self._pool, result.close)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.on_shutdown is not None:
+                    await self.on_shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+app = AsyncApp(
+    api.app,
+    ASYNC_VIEWS,
+    threads=int(os.getenv("ASGI_WSGI_THREADS", 32)),
+    on_shutdown=async_storage.aclose,
+    before_view=check_rate_limits,
+)
@@ -0,0 +1,115 @@
+"""Async storage for the ASGI serving mode (see asgi.py).
+
+Only the calls made by the natively async routes are covered: looking up a
+profile, listing a receiver's questions and inserting a question. Their
+signatures and return values match the sync repositories in storage.py, but
+they are coroutines.
+
+``SupabaseAsyncStorage`` talks to PostgREST with postgrest-py's async client
+over one pooled ``httpx.AsyncClient``. Thousands of requests can then wait on
+the database at once without holding a thread each. ``ThreadedAsyncStorage``
+runs a sync backend (such as SQLite) in worker threads so the ASGI mode also
+works offline.
+"""
+import asyncio
+
+from storage import PROFILE_COLUMNS, QUESTION_COLUMNS, Storage, SupabaseQuestionRepository
+
+
+class SupabaseAsyncProfileRepository:
+    def __init__(self, client):
+        self.client = client
+
+    async def get_by_username(self, username):
+        result = await self.client.table('profiles').select(','.join(PROFILE_COLUMNS)).eq('username', username).execute()
+        return result.data[0] if result.data else None
+
+    async def exists(self, username):
+        result = await self.client.table('profiles').select('username').eq('username', username).execute()
+        return bool(result.data)
+
+
+class SupabaseAsyncQuestionRepository:
+    def __init__(self, client):
+        self.client = client
+
+    async def list_by_receiver(self, receiver, answered, limit, cursor=None, columns=QUESTION_COLUMNS):
+        query = SupabaseQuestionRepository._list_query(self.client, receiver, answered, limit, cursor, columns)
+        result = await query.execute()
+        return SupabaseQuestionRepository._page(result.data, answered, limit)
+
+    async def create(self, question):
+        result = await self.client.table('questions').insert(question).execute()
+        return result.data[0]
+
+
+class SupabaseAsyncStorage(Storage):
+    def __init__(self, url, key, max_connections=100, max_keepalive=20, keepalive_expiry=5.0, http2=False, timeout=10.0):
+        import httpx
+        from postgrest import AsyncPostgrestClient
+
+        if not url or not key:
+            raise ValueError('A Supabase URL and key are required')
+        headers = {
+            'apikey': key,
+            'Authorization': f'Bearer {key}',
+            'Accept': 'application/json',
+            'Content-Type': 'application/json',
+        }
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+
+        class PooledPostgrestClient(AsyncPostgrestClient):
+            # Built with the pooled session from the start, so no default session is opened and left behind
+            def create_session(self, base_url, headers, timeout):
+                return httpx.AsyncClient(base_url=base_url, headers=headers, timeout=timeout, http2=http2, limits=limits)
+
+        # One connection pool for every request in this process, kept alive between requests
+        self.client = PooledPostgrestClient(f"{url.rstrip('/')}/rest/v1", headers=headers, timeout=timeout)
+        super().__init__(
+            profiles=SupabaseAsyncProfileRepository(self.client),
+            questions=SupabaseAsyncQuestionRepository(self.client),
+            auth=None,
+        )
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+class _ThreadedRepository:
+    def __init__(self, target):
+        self._target = target
+
+    def __getattr__(self, attr):
+        value = getattr(self._target, attr)
+
+        async def call(*args, **kwargs):
+            # to_thread copies the context, so metrics still see the current request
+            return await asyncio.to_thread(value, *args, **kwargs)
+
+        return call
+
+
+class ThreadedAsyncStorage(Storage):
+    """Async facade over a sync storage backend."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        super().__init__(
+            profiles=_ThreadedRepository(inner.profiles),
+            questions=_ThreadedRepository(inner.questions),
+            auth=None,
+        )
+
+    async def aclose(self):
+        pass
+
+
+def create_async_storage(backend, sync_storage, supabase_url=None, supabase_key=None, **pool):
+    """Pick the async storage for ``backend``; other backends reuse ``sync_storage`` in threads."""
+    if backend == 'supabase':
+        return SupabaseAsyncStorage(supabase_url, supabase_key, **pool)
+    return ThreadedAsyncStorage(sync_storage)
@@ -0,0 +1,125 @@
+"""Access token verification for ``require_auth``.
+
+Supabase access tokens are JWTs, so they can be checked locally instead of
+asking the auth server about every request:
+
+- HS256 tokens are verified with the project JWT secret (``SUPABASE_JWT_SECRET``).
+- Asymmetrically signed tokens are verified against the project's JWKS,
+  which is fetched once and cached.
+
+Signature, expiry and audience are always checked. Successfully verified
+tokens are kept in a bounded TTL cache until shortly before they expire.
+
+``mode="remote"`` keeps the old behaviour of calling
+``supabase.auth.get_user`` for every token. In ``mode="local"`` the network is
+only used as a fallback when no key material is available for a token (no
+secret configured for an HS256 token, or its key id is unknown to the JWKS).
+
+PyJWT (and the cryptography backend it loads) is imported on the first
+verification rather than at import time, so public endpoints never pay for it.
+"""
+import time
+
+from cache import TTLCache
+
+
+class TokenUser:
+    """The subset of the Supabase user object the handlers rely on, built from token claims."""
+
+    def __init__(self, claims):
+        self.id = claims['sub']
+        self.email = claims.get('email')
+        self.role = claims.get('role')
+        self.aud = claims.get('aud')
+        self.user_metadata = claims.get('user_metadata') or {}
+        self.app_metadata = claims.get('app_metadata') or {}
+
+
+class MissingKeyError(Exception):
+    """No local key material can verify this token."""
+
+
+class TokenVerifier:
+    def __init__(self, supabase_url, jwt_secret=None, mode='local', audience='authenticated',
+                 remote_verify=None, cache_size=10000, cache_ttl=300, leeway=0):
+        if mode not in ('local', 'remote'):
+            raise ValueError(f"Unknown token verification mode: {mode}")
+        self.mode = mode
+        self.jwt_secret = jwt_secret
+        self.audience = audience
+        self.leeway = leeway
+        self.remote_verify = remote_verify
+        self.cache_ttl = cache_ttl
+        self._cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._jwks_url = f"{supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json" if supabase_url else None
+        self._jwks_client = None
+
+    def verify(self, token):
+        user = self._cache.get(token)
+        if user is not None:
+            return user
+
+        if self.mode == 'local':
+            try:
+                claims = self._decode(token)
+            except MissingKeyError:
+                return self._verify_remote(token)
+            user = TokenUser(claims)
+            ttl = min(self.cache_ttl, claims['exp'] - time.time())
+        else:
+            return self._verify_remote(token)
+
+        self._cache.set(token, user, ttl=ttl)
+        return user
+
+    def invalidate(self, token):
+        self._cache.delete(token)
+
+    def _decode(self, token):
+        import jwt
+
+        header = jwt.get_unverified_header(token)
+        algorithm = header.get('alg', '')
+
+        if algorithm.startswith('HS'):
+            if not self.jwt_secret:
+                raise MissingKeyError('No JWT secret configured')
+            key = self.jwt_secret
+        else:
+            key = self._signing_key(token)
+
+        return jwt.decode(
+            token,
+            key,
+            algorithms=[algorithm],
+            audience=self.audience,
+            leeway=self.leeway,
+            options={'require': ['exp', 'sub']},
+        )
+
+    def _signing_key(self, token):
+        import jwt
+
+        if not self._jwks_url:
+            raise MissingKeyError('No JWKS endpoint configured')
+        if self._jwks_client is None:
+            # PyJWKClient caches the key set and refetches it when it sees an unknown key id
+            self._jwks_client = jwt.PyJWKClient(self._jwks_url, cache_keys=True, lifespan=3600)
+        try:
+            return self._jwks_client.get_signing_key_from_jwt(token).key
+        except jwt.PyJWKClientError as e:
+            raise MissingKeyError(str(e))
+
+    def _verify_remote(self, token):
+        import jwt
+
+        if self.remote_verify is None:
+            raise jwt.InvalidTokenError('Token cannot be verified locally')
+        user = self.remote_verify(token)
+        if not user:
+            raise jwt.InvalidTokenError('Invalid token')
+        # The auth server has no expiry to hand back here, so use the token's own claim
+        claims = jwt.decode(token, options={'verify_signature': False})
+        ttl = min(self.cache_ttl, claims.get('exp', 0) - time.time())
+        self._cache.set(token, user, ttl=ttl)
+        return user
@@ -0,0 +1,301 @@
+"""Load-test harness for the AskMe API.
+
+Drives the Flask app in-process (default) or a running server (``--url``)
+with a configurable number of concurrent clients and a weighted mix of
+request types, then prints a JSON report with requests per second,
+p50/p95/p99 latency and error counts, overall and per endpoint.
+
+In-process runs use the SQLite storage backend wrapped in
+``LatencyStorage``, which sleeps for ``--latency-ms`` on every storage call
+to stand in for Supabase round trips. It also counts calls per endpoint,
+so the report shows how many backend calls each request type costs.
+
+Examples:
+    python bench.py --duration 10 --concurrency 16 --latency-ms 20
+    python bench.py --mix profile=80,submit=15,dashboard=5 --output bench_output.txt
+    STORAGE_BACKEND=sqlite RATE_LIMIT=0 python api.py & python bench.py --url http://localhost:5000
+"""
+import argparse
+import contextvars
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from storage import Storage
+
+# The per-request call counter; set by the worker thread before each request
+_call_counter = contextvars.ContextVar('bench_call_counter', default=None)
+
+
+class _InstrumentedRepository:
+    def __init__(self, target, name, latency, jitter):
+        self._target = target
+        self._name = name
+        self._latency = latency
+        self._jitter = jitter
+
+    def __getattr__(self, attr):
+        value = getattr(self._target, attr)
+        if not callable(value):
+            return value
+
+        def call(*args, **kwargs):
+            counter = _call_counter.get()
+            if counter is not None:
+                counter[f'{self._name}.{attr}'] += 1
+            if self._latency:
+                time.sleep(self._latency * random.uniform(1 - self._jitter, 1 + self._jitter))
+            return value(*args, **kwargs)
+
+        return call
+
+
+class LatencyStorage(Storage):
+    """Wraps another storage backend, adding a simulated round-trip delay to every call and counting calls."""
+
+    def __init__(self, inner, latency=0.0, jitter=0.2):
+        self.inner = inner
+        self.jwt_secret = getattr(inner, 'jwt_secret', None)
+        super().__init__(
+            profiles=_InstrumentedRepository(inner.profiles, 'profiles', latency, jitter),
+            questions=_InstrumentedRepository(inner.questions, 'questions', latency, jitter),
+            auth=_InstrumentedRepository(inner.auth, 'auth', latency, jitter),
+        )
+
+
+class InProcessClient:
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def request(self, method, path, json=None, headers=None):
+        response = self._client.open(path, method=method, json=json, headers=headers)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        import requests
+
+        self._base_url = base_url.rstrip('/')
+        self._session = requests.Session()
+
+    def request(self, method, path, json=None, headers=None):
+        response = self._session.request(method, self._base_url + path, json=json, headers=headers)
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        return response.status_code, body
+
+
+def seed(client, users, questions_per_user, answered_ratio):
+    """Create users with questions through the API and return ``[(username, access_token), ...]``."""
+    run_id = f'{int(time.time())}{random.randint(0, 999)}'
+    accounts = []
+    for i in range(users):
+        username = f'bench{run_id}_{i}'
+        email = f'{username}@bench.askme.test'
+        client.request('POST', '/auth/signup', json={'email': email, 'password': 'bench-password', 'username': username})
+        status, body = client.request('POST', '/auth/login', json={'email': email, 'password': 'bench-password'})
+        if status != 200:
+            raise RuntimeError(f'Could not log in seeded user {username}: {status} {body}')
+        token = body['session']['access_token']
+        headers = {'Authorization': f'Bearer {token}'}
+        for j in range(questions_per_user):
+            status, body = client.request('POST', '/questions', json={'receiver': username, 'question': f'Seed question {j}?'})
+            if status == 201 and random.random() < answered_ratio:
+                client.request('POST', f"/questions/{body['question']['id']}/answer", json={'answer': f'Seed answer {j}'}, headers=headers)
+        accounts.append((username, token))
+    return accounts
+
+
+def _scenarios(accounts):
+    def profile():
+        username, _ = random.choice(accounts)
+        return 'GET', f'/user/{username}', None, None
+
+    def submit():
+        username, _ = random.choice(accounts)
+        return 'POST', '/questions', {'receiver': username, 'question': f'Benchmark question {random.random()}?'}, None
+
+    def dashboard():
+        _, token = random.choice(accounts)
+        return 'GET', '/dashboard', None, {'Authorization': f'Bearer {token}'}
+
+    def inbox():
+        username, token = random.choice(accounts)
+        return 'GET', f'/user/{username}/questions', None, {'Authorization': f'Bearer {token}'}
+
+    return {'profile': profile, 'submit': submit, 'dashboard': dashboard, 'inbox': inbox}
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, weight = part.split('=')
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': _ms(percentile(latencies, 50)),
+        'p95_ms': _ms(percentile(latencies, 95)),
+        'p99_ms': _ms(percentile(latencies, 99)),
+        'max_ms': _ms(latencies[-1] if latencies else None),
+    }
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+def run(make_client, accounts, mix, concurrency, duration, warmup=1.0, count_calls=True):
+    scenarios = _scenarios(accounts)
+    unknown = set(mix) - set(scenarios)
+    if unknown:
+        raise ValueError(f"Unknown request types in mix: {', '.join(sorted(unknown))}")
+    names = list(mix)
+    weights = [mix[name] for name in names]
+
+    lock = threading.Lock()
+    latencies = defaultdict(list)
+    errors = Counter()
+    statuses = defaultdict(Counter)
+    calls = defaultdict(Counter)
+    start = time.perf_counter()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+
+    def worker():
+        client = make_client()
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at:
+                return
+            name = random.choices(names, weights)[0]
+            method, path, body, headers = scenarios[name]()
+            counter = Counter()
+            token = _call_counter.set(counter)
+            began = time.perf_counter()
+            try:
+                status, _ = client.request(method, path, json=body, headers=headers)
+            except Exception:
+                status = 'exception'
+            finally:
+                _call_counter.reset(token)
+            took = time.perf_counter() - began
+            if began < measure_from:
+                continue
+            with lock:
+                latencies[name].append(took)
+                statuses[name][str(status)] += 1
+                calls[name].update(counter)
+                if status == 'exception' or status >= 500:
+                    errors[name] += 1
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    report = {
+        'total': summarize(
+            [t for values in latencies.values() for t in values], sum(errors.values()), duration
+        ),
+        'endpoints': {},
+    }
+    for name in names:
+        stats = summarize(latencies[name], errors[name], duration)
+        stats['statuses'] = dict(statuses[name])
+        if count_calls:
+            stats['db_calls_per_request'] = round(sum(calls[name].values()) / max(1, len(latencies[name])), 2)
+            stats['db_calls'] = dict(calls[name])
+        report['endpoints'][name] = stats
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load-test the AskMe API.')
+    parser.add_argument('--url', help='benchmark a running server instead of the in-process app')
+    parser.add_argument('--duration', type=float, default=10.0, help='measured seconds (default: 10)')
+    parser.add_argument('--warmup', type=float, default=1.0, help='unmeasured seconds before measuring (default: 1)')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent clients (default: 8)')
+    parser.add_argument('--mix', type=parse_mix, default='profile=60,submit=25,dashboard=10,inbox=5',
+                        help='weighted request mix, e.g. profile=60,submit=25,dashboard=10,inbox=5')
+    parser.add_argument('--latency-ms', type=float, default=20.0,
+                        help='simulated backend latency per storage call, in-process only (default: 20)')
+    parser.add_argument('--users', type=int, default=20, help='seeded users (default: 20)')
+    parser.add_argument('--questions', type=int, default=30, help='seeded questions per user (default: 30)')
+    parser.add_argument('--answered-ratio', type=float, default=0.5, help='share of seeded questions answered')
+    parser.add_argument('--seed', type=int, help='random seed for a repeatable request sequence')
+    parser.add_argument('--output', help='write the JSON report to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    if args.url:
+        def make_client():
+            return HttpClient(args.url)
+        accounts = seed(make_client(), args.users, args.questions, args.answered_ratio)
+    else:
+        os.environ.setdefault('STORAGE_BACKEND', 'sqlite')
+        # Every simulated client shares one address, so per-IP limits would throttle the run
+        os.environ.setdefault('RATE_LIMIT', '0')
+        import api
+
+        from metrics import InstrumentedStorage
+
+        # Seed without simulated latency, then benchmark with it. The latency goes
+        # under the app's own instrumentation so /metrics and Server-Timing include it.
+        backend = api.storage.inner
+        api.storage = InstrumentedStorage(LatencyStorage(backend, latency=0.0), api.request_metrics)
+        accounts = seed(InProcessClient(api.app), args.users, args.questions, args.answered_ratio)
+        api.storage = InstrumentedStorage(
+            LatencyStorage(backend, latency=args.latency_ms / 1000), api.request_metrics
+        )
+
+        def make_client():
+            return InProcessClient(api.app)
+
+    report = run(make_client, accounts, args.mix, args.concurrency, args.duration, args.warmup,
+                 count_calls=not args.url)
+    report['config'] = {
+        'mode': 'http' if args.url else 'in-process',
+        'url': args.url,
+        'duration_s': args.duration,
+        'concurrency': args.concurrency,
+        'mix': args.mix,
+        'latency_ms': None if args.url else args.latency_ms,
+        'users': args.users,
+        'questions_per_user': args.questions,
+    }
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
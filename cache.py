@@ -0,0 +1,219 @@
+"""Small in-process caches shared by the API handlers, and request coalescing."""
+import asyncio
+import json
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a time-to-live.
+
+    ``maxsize`` bounds memory: once full, the least recently used entry is
+    evicted. ``ttl`` is the default lifetime in seconds and can be shortened
+    per entry with ``set(key, value, ttl=...)``.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class RedisCache:
+    """Drop-in replacement for :class:`TTLCache` backed by Redis.
+
+    Entries are shared by every worker and instance pointing at the same
+    Redis. Values are stored as JSON, so only plain dicts/lists/scalars can
+    be cached. Requires the optional ``redis`` package.
+    """
+
+    def __init__(self, url, prefix='askme:', ttl=60.0):
+        import redis
+
+        self.prefix = prefix
+        self.ttl = ttl
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, key, default=None):
+        raw = self._redis.get(self.prefix + str(key))
+        if raw is None:
+            return default
+        return json.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        self._redis.set(self.prefix + str(key), json.dumps(value), px=int(ttl * 1000))
+
+    def delete(self, key):
+        self._redis.delete(self.prefix + str(key))
+
+    def clear(self):
+        for key in self._redis.scan_iter(match=self.prefix + '*'):
+            self._redis.delete(key)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one.
+
+    The first caller for a key runs ``fn``; callers arriving while it is in
+    flight wait for it and get the same result (or exception). Nothing is
+    kept once the call finishes, so this is not a cache. A waiter that gives
+    up after ``timeout`` seconds runs ``fn`` itself.
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            if not flight.done.wait(self.timeout):
+                return fn()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = self._run(key, fn)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def _run(self, key, fn):
+        return fn()
+
+
+class RedisSingleFlight(SingleFlight):
+    """:class:`SingleFlight` that also coalesces across workers through Redis.
+
+    Within a worker, calls are coalesced as usual. The worker's leader then
+    takes a short Redis lock for the key. The lock holder runs ``fn`` and
+    publishes the result for ``result_ttl`` seconds. Other workers poll for
+    that result instead of running ``fn`` themselves. Results must be
+    JSON-serializable. If Redis is unavailable or the lock holder fails, the
+    call simply runs locally. Requires the optional ``redis`` package.
+    """
+
+    def __init__(self, url, prefix='askme:flight:', lock_ttl=5.0, result_ttl=1.0, poll_interval=0.02, timeout=None):
+        import redis
+
+        super().__init__(timeout=timeout)
+        self.prefix = prefix
+        self.lock_ttl = lock_ttl
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self._redis = redis.Redis.from_url(url)
+
+    def _run(self, key, fn):
+        lock_key = f'{self.prefix}lock:{key}'
+        result_key = f'{self.prefix}result:{key}'
+        token = secrets.token_hex(8)
+        try:
+            raw = self._redis.get(result_key)
+            if raw is not None:
+                return json.loads(raw)
+            acquired = self._redis.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000))
+        except Exception:
+            return fn()
+
+        if acquired:
+            try:
+                result = fn()
+                self._redis.set(result_key, json.dumps(result), px=int(self.result_ttl * 1000))
+                return result
+            finally:
+                try:
+                    if self._redis.get(lock_key) == token.encode():
+                        self._redis.delete(lock_key)
+                except Exception:
+                    pass
+
+        deadline = time.monotonic() + self.lock_ttl
+        try:
+            while time.monotonic() < deadline:
+                raw = self._redis.get(result_key)
+                if raw is not None:
+                    return json.loads(raw)
+                if not self._redis.exists(lock_key):
+                    break  # the lock holder failed without publishing a result
+                time.sleep(self.poll_interval)
+        except Exception:
+            pass
+        return fn()
+
+
+class AsyncSingleFlight:
+    """:class:`SingleFlight` for coroutines on one event loop.
+
+    ``fn`` returns a coroutine. The shared call runs as its own task, so a
+    caller that is cancelled (say, a client that disconnects) does not cancel
+    it for the others.
+    """
+
+    def __init__(self):
+        self._flights = {}
+
+    async def do(self, key, fn):
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = asyncio.ensure_future(fn())
+            flight.add_done_callback(lambda _: self._flights.pop(key, None))
+        return await asyncio.shield(flight)
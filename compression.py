@@ -0,0 +1,62 @@
+"""Response compression negotiated from ``Accept-Encoding``.
+
+gzip is always available; brotli is used when the optional ``brotli``
+package is installed and the client accepts it. Bodies below ``min_size``
+are sent as-is, since compressing them costs more than it saves.
+"""
+import gzip
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = frozenset({'application/json', 'text/plain', 'text/html', 'text/csv'})
+
+
+class Compressor:
+    def __init__(self, min_size=1024, gzip_level=6, brotli_quality=5):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def choose_encoding(self, request, size):
+        """Return the encoding to use for a body of ``size`` bytes, or None."""
+        if size < self.min_size:
+            return None
+        accepted = request.accept_encodings
+        if brotli is not None and accepted['br']:
+            return 'br'
+        if accepted['gzip']:
+            return 'gzip'
+        return None
+
+    def compress(self, body, encoding):
+        if encoding == 'br':
+            return brotli.compress(body, quality=self.brotli_quality)
+        # mtime=0 keeps the output (and so precompressed cache entries) deterministic
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    def compress_response(self, request, response):
+        """``after_request`` hook: compress eligible responses in place."""
+        if (
+            response.direct_passthrough
+            or response.is_streamed
+            or response.status_code != 200
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        ):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        body = response.get_data()
+        encoding = self.choose_encoding(request, len(body))
+        if encoding is None:
+            return response
+
+        response.set_data(self.compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f'{etag}-{encoding}', weak=weak)
+        return response
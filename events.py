@@ -0,0 +1,149 @@
+"""Publish/subscribe for per-user events, delivered to clients over Server-Sent Events.
+
+``EventBroker`` is an in-process broker: handlers ``publish`` events to a
+channel (the receiver's username) and each open stream ``subscribe``s to its
+own channel. Every channel keeps its last ``history`` events so a client that
+reconnects with ``Last-Event-ID`` gets what it missed. History is kept for the
+``max_channels`` most recently active channels; a client resuming from before
+events that were dropped this way is told its history is incomplete.
+
+``RedisEventBroker`` relays events through Redis pub/sub so a stream connected
+to one worker sees writes handled by any other. Requires the optional
+``redis`` package.
+"""
+import itertools
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+
+
+class Event:
+    def __init__(self, id, channel, type, data):
+        self.id = id
+        self.channel = channel
+        self.type = type
+        self.data = data
+
+    def to_dict(self):
+        return {'id': self.id, 'channel': self.channel, 'type': self.type, 'data': self.data}
+
+    def format(self, dumps=json.dumps):
+        """Render as an SSE message."""
+        return f'id: {self.id}\nevent: {self.type}\ndata: {dumps(self.data)}\n\n'
+
+
+class Subscription:
+    def __init__(self, broker, channel, missed, complete):
+        self.broker = broker
+        self.channel = channel
+        # Events after the client's Last-Event-ID, and whether history went back far enough
+        self.missed = missed
+        self.complete = complete
+        self._queue = queue.Queue(maxsize=broker.queue_size)
+
+    def get(self, timeout):
+        """Return the next event, or None if nothing arrived within ``timeout`` seconds."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker._unsubscribe(self)
+
+    def _deliver(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            pass  # a stalled client misses events; it can resume with Last-Event-ID
+
+
+class EventBroker:
+    def __init__(self, history=100, queue_size=1000, max_channels=10000):
+        self.history = history
+        self.queue_size = queue_size
+        self.max_channels = max_channels
+        # Ids start from the clock so they keep increasing across restarts
+        self._ids = itertools.count(int(time.time() * 1000))
+        # Events with ids above this can be in history; older ones were never seen here
+        self._since = next(self._ids)
+        self._lock = threading.Lock()
+        self._recent = OrderedDict()  # channel -> deque of its last events, least recently active first
+        self._subscribers = defaultdict(set)
+
+    def publish(self, channel, type, data):
+        return self._dispatch(Event(next(self._ids), channel, type, data))
+
+    def subscribe(self, channel, last_event_id=None):
+        with self._lock:
+            recent = list(self._recent.get(channel, ()))
+            missed, complete = [], True
+            if last_event_id is not None:
+                missed = [event for event in recent if event.id > last_event_id]
+                if len(recent) == self.history:
+                    # Older events for this channel may have been dropped
+                    complete = recent[0].id <= last_event_id
+                else:
+                    complete = last_event_id >= self._since
+            subscription = Subscription(self, channel, missed, complete)
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def close(self):
+        pass
+
+    def _dispatch(self, event):
+        with self._lock:
+            recent = self._recent.pop(event.channel, None) or deque(maxlen=self.history)
+            recent.append(event)
+            self._recent[event.channel] = recent
+            if len(self._recent) > self.max_channels:
+                _, dropped = self._recent.popitem(last=False)
+                # Resumes from before the dropped events can no longer be answered from history
+                self._since = max(self._since, dropped[-1].id)
+            subscribers = list(self._subscribers.get(event.channel, ()))
+        for subscription in subscribers:
+            subscription._deliver(event)
+        return event
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+
+class RedisEventBroker(EventBroker):
+    """``EventBroker`` shared by every worker connected to the same Redis."""
+
+    def __init__(self, url, prefix='askme:events', history=100, queue_size=1000, max_channels=10000):
+        import redis
+
+        super().__init__(history=history, queue_size=queue_size, max_channels=max_channels)
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url)
+        self._since = int(self._redis.get(f'{prefix}:id') or 0)
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(**{prefix: self._on_message})
+        self._listener = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def publish(self, channel, type, data):
+        # Ids come from Redis so they increase across workers
+        event = Event(self._redis.incr(f'{self.prefix}:id'), channel, type, data)
+        self._redis.publish(self.prefix, json.dumps(event.to_dict()))
+        return event
+
+    def close(self):
+        self._listener.stop()
+        self._pubsub.close()
+
+    def _on_message(self, message):
+        self._dispatch(Event(**json.loads(message['data'])))
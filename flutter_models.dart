@@ -126,10 +126,12 @@ class AuthSession {
 class ProfileResponse {
   final User user;
   final List<Question> answeredQuestions;
+  final String? nextCursor;
 
   ProfileResponse({
     required this.user,
     required this.answeredQuestions,
+    this.nextCursor,
   });
 
   factory ProfileResponse.fromJson(Map<String, dynamic> json) {
@@ -138,6 +140,7 @@ class ProfileResponse {
       answeredQuestions: (json['answered_questions'] as List)
           .map((q) => Question.fromJson(q))
           .toList(),
+      nextCursor: json['next_cursor'],
     );
   }
 }
@@ -146,20 +149,27 @@ class ProfileResponse {
 class QuestionsResponse {
   final List<Question> unansweredQuestions;
   final List<Question> answeredQuestions;
+  final String? unansweredNextCursor;
+  final String? answeredNextCursor;
 
   QuestionsResponse({
     required this.unansweredQuestions,
     required this.answeredQuestions,
+    this.unansweredNextCursor,
+    this.answeredNextCursor,
   });
 
+  // Buckets that were not requested (see the status parameter) come back empty
   factory QuestionsResponse.fromJson(Map<String, dynamic> json) {
     return QuestionsResponse(
-      unansweredQuestions: (json['unanswered_questions'] as List)
+      unansweredQuestions: ((json['unanswered_questions'] ?? []) as List)
           .map((q) => Question.fromJson(q))
           .toList(),
-      answeredQuestions: (json['answered_questions'] as List)
+      answeredQuestions: ((json['answered_questions'] ?? []) as List)
           .map((q) => Question.fromJson(q))
           .toList(),
+      unansweredNextCursor: json['unanswered_next_cursor'],
+      answeredNextCursor: json['answered_next_cursor'],
     );
   }
 }
@@ -231,6 +241,28 @@ class DashboardStats {
   }
 }
 
+// Live inbox event from GET /events (Server-Sent Events)
+class InboxEvent {
+  final String id;
+  final String type; // "question", "answered" or "reset"
+  final Question? question;
+
+  InboxEvent({
+    required this.id,
+    required this.type,
+    this.question,
+  });
+
+  // A "reset" event carries no question: reload the dashboard instead
+  factory InboxEvent.fromSse(String id, String type, Map<String, dynamic> data) {
+    return InboxEvent(
+      id: id,
+      type: type,
+      question: data.containsKey('id') ? Question.fromJson(data) : null,
+    );
+  }
+}
+
 // API Error model
 class ApiError {
   final String error;
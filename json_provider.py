@@ -0,0 +1,41 @@
+"""Fast JSON encoding for Flask: orjson when it is installed, the stdlib otherwise."""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Drop-in replacement for Flask's default provider.
+
+    ``encode`` is the single place objects are turned into bytes, so
+    subclasses can wrap it (e.g. for timing). Calls that pass stdlib
+    ``json`` options fall back to the default provider.
+    """
+
+    def encode(self, obj):
+        if orjson is None:
+            return super().dumps(obj, separators=(',', ':')).encode()
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.encode(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Pretty-printed output (debug mode) keeps the stdlib path
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.encode(obj) + b'\n', mimetype=self.mimetype)
@@ -0,0 +1,461 @@
+"""SQLite implementation of the storage layer.
+
+Models the schema from setup_database.sql (profiles, questions,
+question_counts and its triggers) plus a minimal stand-in for Supabase Auth
+that issues HS256 access tokens signed with the configured JWT secret, so
+``require_auth`` verifies them exactly like real Supabase tokens.
+
+Meant for tests, benchmarks and local development. Uses an in-memory
+database unless a file path is given.
+"""
+import hashlib
+import json
+import secrets
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+import jwt
+
+from storage import (
+    EMPTY_COUNTS,
+    PROFILE_COLUMNS,
+    QUESTION_COLUMNS,
+    AuthRepository,
+    ProfileRepository,
+    QuestionRepository,
+    Storage,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    email TEXT UNIQUE,
+    password_hash TEXT,
+    user_metadata TEXT NOT NULL DEFAULT '{}',
+    created_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS refresh_tokens (
+    token TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS revoked_sessions (
+    session_id TEXT PRIMARY KEY
+);
+
+CREATE TABLE IF NOT EXISTS profiles (
+    id TEXT PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    username TEXT UNIQUE NOT NULL,
+    email TEXT NOT NULL,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f000+00:00', 'now')),
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f000+00:00', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f000+00:00', 'now')),
+    sender TEXT,
+    receiver TEXT NOT NULL REFERENCES profiles(username) ON DELETE CASCADE,
+    answered BOOLEAN DEFAULT FALSE,
+    question TEXT NOT NULL,
+    answer TEXT,
+    answered_at TEXT,
+    updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f000+00:00', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS question_tombstones (
+    id INTEGER PRIMARY KEY,
+    receiver TEXT NOT NULL,
+    deleted_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f000+00:00', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS question_counts (
+    receiver TEXT PRIMARY KEY REFERENCES profiles(username) ON DELETE CASCADE,
+    total_count INTEGER NOT NULL DEFAULT 0,
+    answered_count INTEGER NOT NULL DEFAULT 0,
+    unanswered_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_questions_receiver_unanswered_created_id
+    ON questions(receiver, created_at DESC, id DESC) WHERE answered = FALSE;
+CREATE INDEX IF NOT EXISTS idx_questions_receiver_answered_at_id
+    ON questions(receiver, answered_at DESC, id DESC) WHERE answered = TRUE;
+
+CREATE INDEX IF NOT EXISTS idx_questions_receiver_updated_id ON questions(receiver, updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_question_tombstones_receiver_deleted_id
+    ON question_tombstones(receiver, deleted_at, id);
+
+-- Timestamps are compared as text, so they are all written with six fractional digits,
+-- the form cursors and watermarks are re-serialized to (see decode_cursor in api.py)
+CREATE TRIGGER IF NOT EXISTS questions_touch AFTER UPDATE ON questions
+WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE questions SET updated_at = strftime('%Y-%m-%dT%H:%M:%f000+00:00', 'now') WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS questions_tombstone AFTER DELETE ON questions
+BEGIN
+    INSERT OR REPLACE INTO question_tombstones (id, receiver) VALUES (OLD.id, OLD.receiver);
+END;
+
+CREATE TRIGGER IF NOT EXISTS questions_count_insert AFTER INSERT ON questions
+BEGIN
+    INSERT INTO question_counts (receiver, total_count, answered_count, unanswered_count)
+    VALUES (NEW.receiver, 1, COALESCE(NEW.answered, 0), 1 - COALESCE(NEW.answered, 0))
+    ON CONFLICT (receiver) DO UPDATE SET
+        total_count = total_count + excluded.total_count,
+        answered_count = answered_count + excluded.answered_count,
+        unanswered_count = unanswered_count + excluded.unanswered_count;
+END;
+
+CREATE TRIGGER IF NOT EXISTS questions_count_delete AFTER DELETE ON questions
+BEGIN
+    UPDATE question_counts SET
+        total_count = total_count - 1,
+        answered_count = answered_count - COALESCE(OLD.answered, 0),
+        unanswered_count = unanswered_count - (1 - COALESCE(OLD.answered, 0))
+    WHERE receiver = OLD.receiver;
+END;
+
+CREATE TRIGGER IF NOT EXISTS questions_count_update AFTER UPDATE OF answered, receiver ON questions
+WHEN OLD.answered IS NOT NEW.answered OR OLD.receiver IS NOT NEW.receiver
+BEGIN
+    UPDATE question_counts SET
+        total_count = total_count - 1,
+        answered_count = answered_count - COALESCE(OLD.answered, 0),
+        unanswered_count = unanswered_count - (1 - COALESCE(OLD.answered, 0))
+    WHERE receiver = OLD.receiver;
+    INSERT INTO question_counts (receiver, total_count, answered_count, unanswered_count)
+    VALUES (NEW.receiver, 1, COALESCE(NEW.answered, 0), 1 - COALESCE(NEW.answered, 0))
+    ON CONFLICT (receiver) DO UPDATE SET
+        total_count = total_count + excluded.total_count,
+        answered_count = answered_count + excluded.answered_count,
+        unanswered_count = unanswered_count + excluded.unanswered_count;
+END;
+"""
+
+QUESTION_BOOLEANS = ('answered',)
+
+
+class Database:
+    """One shared connection guarded by a lock (an in-memory database only exists per connection)."""
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        self.connect()
+
+    def connect(self):
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        self.connection.executescript(SCHEMA)
+
+    def query(self, sql, params=()):
+        with self.lock:
+            return [dict(row) for row in self.connection.execute(sql, params).fetchall()]
+
+    def execute(self, sql, params=()):
+        with self.lock:
+            return self.connection.execute(sql, params)
+
+    def insert(self, table, row):
+        columns = ', '.join(row)
+        placeholders = ', '.join('?' for _ in row)
+        with self.lock:
+            cursor = self.connection.execute(
+                f'INSERT INTO {table} ({columns}) VALUES ({placeholders}) RETURNING *', tuple(row.values())
+            )
+            return dict(cursor.fetchone())
+
+    def insert_many(self, table, rows):
+        # One INSERT with a VALUES tuple per row; all rows must have the same columns
+        if not rows:
+            return []
+        columns = ', '.join(rows[0])
+        placeholders = ', '.join(['(' + ', '.join('?' for _ in rows[0]) + ')'] * len(rows))
+        params = tuple(value for row in rows for value in row.values())
+        with self.lock:
+            cursor = self.connection.execute(
+                f'INSERT INTO {table} ({columns}) VALUES {placeholders} RETURNING *', params
+            )
+            return [dict(row) for row in cursor.fetchall()]
+
+
+def _question(row):
+    if row is not None:
+        for column in QUESTION_BOOLEANS:
+            if column in row:
+                row[column] = bool(row[column])
+    return row
+
+
+class SQLiteProfileRepository(ProfileRepository):
+    def __init__(self, db):
+        self.db = db
+
+    def get_by_id(self, user_id):
+        rows = self.db.query(f"SELECT {', '.join(PROFILE_COLUMNS)} FROM profiles WHERE id = ?", (user_id,))
+        return rows[0] if rows else None
+
+    def get_by_username(self, username):
+        rows = self.db.query(f"SELECT {', '.join(PROFILE_COLUMNS)} FROM profiles WHERE username = ?", (username,))
+        return rows[0] if rows else None
+
+    def exists(self, username):
+        return bool(self.db.query('SELECT 1 FROM profiles WHERE username = ?', (username,)))
+
+    def create(self, profile):
+        return self.db.insert('profiles', profile)
+
+    def provision(self, user_id, email, usernames):
+        with self.db.lock:
+            profile = self.get_by_id(user_id)
+            for username in usernames:
+                if profile is not None:
+                    break
+                self.db.execute(
+                    'INSERT INTO profiles (id, username, email) VALUES (?, ?, ?) ON CONFLICT DO NOTHING',
+                    (user_id, username, email),
+                )
+                profile = self.get_by_id(user_id)
+            return profile
+
+
+class SQLiteQuestionRepository(QuestionRepository):
+    def __init__(self, db):
+        self.db = db
+
+    def get(self, question_id, columns=QUESTION_COLUMNS):
+        rows = self.db.query(f"SELECT {', '.join(columns)} FROM questions WHERE id = ?", (question_id,))
+        return _question(rows[0]) if rows else None
+
+    def list_by_receiver(self, receiver, answered, limit, cursor=None, columns=QUESTION_COLUMNS):
+        sort_column = self.SORT_COLUMNS[answered]
+        sql = f'SELECT {self._select_columns(answered, columns)} FROM questions WHERE receiver = ? AND answered = ?'
+        params = [receiver, answered]
+        if cursor:
+            value, row_id = cursor
+            sql += f' AND ({sort_column} < ? OR ({sort_column} = ? AND id < ?))'
+            params += [value, value, row_id]
+        sql += f' ORDER BY {sort_column} DESC, id DESC LIMIT ?'
+        params.append(limit + 1)
+        rows = [_question(row) for row in self.db.query(sql, params)]
+        return self._page(rows, answered, limit)
+
+    def create(self, question):
+        return _question(self.db.insert('questions', question))
+
+    def create_many(self, questions):
+        return [_question(row) for row in self.db.insert_many('questions', questions)]
+
+    def update_for_receiver(self, question_id, receiver, changes):
+        assignments = ', '.join(f'{column} = ?' for column in changes)
+        rows = self.db.query(
+            f'UPDATE questions SET {assignments} WHERE id = ? AND receiver = ? RETURNING *',
+            (*changes.values(), question_id, receiver),
+        )
+        if not rows:
+            self._no_match(question_id)
+        return _question(rows[0])
+
+    def delete_for_receiver(self, question_id, receiver):
+        rows = self.db.query('DELETE FROM questions WHERE id = ? AND receiver = ? RETURNING *', (question_id, receiver))
+        if not rows:
+            self._no_match(question_id)
+        return _question(rows[0])
+
+    def answer_many_for_receiver(self, answers, receiver, answered_at):
+        if not answers:
+            return []
+        values = ', '.join('(?, ?)' for _ in answers)
+        rows = self.db.query(
+            f'WITH submitted(id, answer) AS (VALUES {values}) '
+            'UPDATE questions SET answer = submitted.answer, answered = 1, answered_at = ? '
+            'FROM submitted WHERE questions.id = submitted.id AND questions.receiver = ? RETURNING *',
+            (*(value for pair in answers.items() for value in pair), answered_at, receiver),
+        )
+        return [_question(row) for row in rows]
+
+    def delete_many_for_receiver(self, question_ids, receiver):
+        if not question_ids:
+            return []
+        placeholders = ', '.join('?' for _ in question_ids)
+        rows = self.db.query(
+            f'DELETE FROM questions WHERE receiver = ? AND id IN ({placeholders}) RETURNING *',
+            (receiver, *question_ids),
+        )
+        return [_question(row) for row in rows]
+
+    def existing_ids(self, question_ids):
+        if not question_ids:
+            return set()
+        placeholders = ', '.join('?' for _ in question_ids)
+        rows = self.db.query(f'SELECT id FROM questions WHERE id IN ({placeholders})', tuple(question_ids))
+        return {row['id'] for row in rows}
+
+    def _fetch_changes(self, receiver, since, limit):
+        since_at, since_id = since or ('', 0)
+        rows = self.db.query(
+            'SELECT * FROM questions WHERE receiver = ? AND (updated_at, id) > (?, ?) ORDER BY updated_at, id LIMIT ?',
+            (receiver, since_at, since_id, limit),
+        )
+        tombstones = []
+        if since is not None:
+            tombstones = self.db.query(
+                'SELECT id, deleted_at FROM question_tombstones WHERE receiver = ? AND (deleted_at, id) > (?, ?) '
+                'ORDER BY deleted_at, id LIMIT ?',
+                (receiver, since_at, since_id, limit),
+            )
+        settled = self.db.query(
+            "SELECT strftime('%Y-%m-%dT%H:%M:%f000+00:00', 'now', ?) AS settled",
+            (f'-{self.CHANGE_SETTLE_SECONDS} seconds',),
+        )[0]['settled']
+        return [_question(row) for row in rows], tombstones, settled
+
+    def counts(self, receiver):
+        rows = self.db.query(
+            'SELECT receiver, total_count, answered_count, unanswered_count FROM question_counts WHERE receiver = ?',
+            (receiver,),
+        )
+        return rows[0] if rows else dict(EMPTY_COUNTS, receiver=receiver)
+
+
+class LocalUser:
+    def __init__(self, row):
+        self.id = row['id']
+        self.email = row['email']
+        self.user_metadata = json.loads(row['user_metadata'])
+        self.app_metadata = {}
+        self.created_at = row['created_at']
+
+
+class LocalSession:
+    def __init__(self, access_token, refresh_token, expires_in, user):
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.expires_in = expires_in
+        self.token_type = 'bearer'
+        self.user = user
+
+
+class LocalAuthResponse:
+    def __init__(self, user, session=None):
+        self.user = user
+        self.session = session
+
+
+class LocalAuthError(Exception):
+    pass
+
+
+def _hash_password(password, salt):
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 100_000).hex()
+
+
+class SQLiteAuthRepository(AuthRepository):
+    """Email/password accounts and HS256 sessions, shaped like Supabase Auth responses."""
+
+    def __init__(self, db, jwt_secret, token_lifetime=3600):
+        self.db = db
+        self.jwt_secret = jwt_secret
+        self.token_lifetime = token_lifetime
+
+    def sign_up(self, email, password):
+        if self.db.query('SELECT 1 FROM users WHERE email = ?', (email,)):
+            raise LocalAuthError('User already registered')
+        salt = secrets.token_hex(8)
+        user = self._create_user(email, f'{salt}${_hash_password(password, salt)}')
+        return LocalAuthResponse(user, self._new_session(user))
+
+    def sign_in_with_password(self, email, password):
+        rows = self.db.query('SELECT * FROM users WHERE email = ?', (email,))
+        if rows and rows[0]['password_hash']:
+            salt, password_hash = rows[0]['password_hash'].split('$')
+            if secrets.compare_digest(_hash_password(password, salt), password_hash):
+                user = LocalUser(rows[0])
+                return LocalAuthResponse(user, self._new_session(user))
+        raise LocalAuthError('Invalid login credentials')
+
+    def sign_in_with_id_token(self, provider, token):
+        # There is no identity provider offline: trust the token's email claim
+        claims = jwt.decode(token, options={'verify_signature': False})
+        email = claims.get('email')
+        if not email:
+            raise LocalAuthError('ID token has no email claim')
+        rows = self.db.query('SELECT * FROM users WHERE email = ?', (email,))
+        user = LocalUser(rows[0]) if rows else self._create_user(email, None, {'name': claims.get('name')})
+        return LocalAuthResponse(user, self._new_session(user))
+
+    def exchange_code_for_session(self, code):
+        raise LocalAuthError('OAuth code exchange is not available with the local storage backend')
+
+    def refresh_session(self, refresh_token):
+        rows = self.db.query(
+            'SELECT users.* FROM refresh_tokens JOIN users ON users.id = refresh_tokens.user_id '
+            'WHERE refresh_tokens.token = ?',
+            (refresh_token,),
+        )
+        if not rows:
+            raise LocalAuthError('Invalid Refresh Token')
+        self.db.execute('DELETE FROM refresh_tokens WHERE token = ?', (refresh_token,))
+        user = LocalUser(rows[0])
+        return LocalAuthResponse(user, self._new_session(user))
+
+    def sign_out(self, access_token):
+        claims = jwt.decode(access_token, self.jwt_secret, algorithms=['HS256'], audience='authenticated')
+        self.db.execute('INSERT OR IGNORE INTO revoked_sessions (session_id) VALUES (?)', (claims.get('session_id'),))
+
+    def get_user(self, access_token):
+        claims = jwt.decode(access_token, self.jwt_secret, algorithms=['HS256'], audience='authenticated')
+        if self.db.query('SELECT 1 FROM revoked_sessions WHERE session_id = ?', (claims.get('session_id'),)):
+            return None
+        rows = self.db.query('SELECT * FROM users WHERE id = ?', (claims['sub'],))
+        return LocalUser(rows[0]) if rows else None
+
+    def _create_user(self, email, password_hash, user_metadata=None):
+        row = self.db.insert('users', {
+            'id': str(uuid.uuid4()),
+            'email': email,
+            'password_hash': password_hash,
+            'user_metadata': json.dumps(user_metadata or {}),
+            'created_at': datetime.now(timezone.utc).isoformat(),
+        })
+        return LocalUser(row)
+
+    def _new_session(self, user):
+        now = int(time.time())
+        access_token = jwt.encode({
+            'sub': user.id,
+            'email': user.email,
+            'aud': 'authenticated',
+            'role': 'authenticated',
+            'iat': now,
+            'exp': now + self.token_lifetime,
+            'session_id': str(uuid.uuid4()),
+            'user_metadata': user.user_metadata,
+        }, self.jwt_secret, algorithm='HS256')
+        refresh_token = secrets.token_urlsafe(24)
+        self.db.insert('refresh_tokens', {'token': refresh_token, 'user_id': user.id})
+        return LocalSession(access_token, refresh_token, self.token_lifetime, user)
+
+
+class SQLiteStorage(Storage):
+    def __init__(self, path=':memory:', jwt_secret=None):
+        self.db = Database(path)
+        # Without a configured secret, tokens are only valid for this process
+        self.jwt_secret = jwt_secret or secrets.token_urlsafe(32)
+        super().__init__(
+            profiles=SQLiteProfileRepository(self.db),
+            questions=SQLiteQuestionRepository(self.db),
+            auth=SQLiteAuthRepository(self.db, self.jwt_secret),
+        )
+
+    def after_fork(self):
+        # A file database is reopened per worker; an in-memory one cannot be shared, each worker keeps its copy
+        if self.db.path != ':memory:':
+            self.db.connect()
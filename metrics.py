@@ -0,0 +1,253 @@
+"""Request and storage metrics.
+
+- ``Metrics`` keeps per-route request latency histograms, request counts by
+  status, and latency histograms and error counts for every storage call.
+  ``Metrics.render()`` produces the Prometheus text exposition format.
+- ``InstrumentedStorage`` wraps a storage backend and times every call.
+- ``timer(category)`` adds to the current request's time breakdown
+  (``auth``, ``db``, ``serialize``, ...). The API turns that breakdown into
+  a ``Server-Timing`` header. A category's time is wall-clock: calls that
+  overlap (queries gathered in parallel) are counted once.
+
+The per-request breakdown lives in a context variable, so calls that run on
+the query pool (see parallel.py) are still attributed to their request.
+"""
+import contextvars
+import inspect
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from storage import Storage
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.counts = defaultdict(int)
+        self._spans = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def add(self, category, seconds, started=None):
+        """Record ``seconds`` spent on ``category``, starting at ``started`` (default: ending now)."""
+        if started is None:
+            started = time.perf_counter() - seconds
+        with self._lock:
+            self._spans[category].append((started, started + seconds))
+            self.counts[category] += 1
+
+    def duration(self, category):
+        """Wall-clock seconds covered by the category's calls, overlaps counted once."""
+        with self._lock:
+            spans = sorted(self._spans.get(category, ()))
+        total = 0.0
+        current_start = current_end = None
+        for start, end in spans:
+            if current_end is None or start > current_end:
+                if current_end is not None:
+                    total += current_end - current_start
+                current_start, current_end = start, end
+            else:
+                current_end = max(current_end, end)
+        if current_end is not None:
+            total += current_end - current_start
+        return total
+
+    @property
+    def durations(self):
+        with self._lock:
+            categories = list(self._spans)
+        return {category: self.duration(category) for category in categories}
+
+    def server_timing(self, total):
+        parts = []
+        for category, seconds in self.durations.items():
+            part = f'{category};dur={seconds * 1000:.1f}'
+            if self.counts[category] > 1:
+                part += f';desc="{self.counts[category]} calls"'
+            parts.append(part)
+        parts.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(parts)
+
+
+def start_request():
+    timings = RequestTimings()
+    _request_timings.set(timings)
+    return timings
+
+
+def current_timings():
+    return _request_timings.get()
+
+
+@contextmanager
+def timer(category):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.add(category, time.perf_counter() - started, started)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+def _labels(**labels):
+    return ','.join(f'{name}="{str(value)}"' for name, value in labels.items())
+
+
+class Metrics:
+    def __init__(self, prefix='askme'):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._request_latency = defaultdict(Histogram)
+        self._requests = defaultdict(int)
+        self._storage_latency = defaultdict(Histogram)
+        self._storage_errors = defaultdict(int)
+        self._request_seconds = 0.0
+        self._wait_seconds = 0.0
+
+    def observe_request(self, method, route, status, seconds, wait_seconds=0.0):
+        """``wait_seconds`` is the part of the request spent waiting on storage."""
+        with self._lock:
+            self._request_latency[(method, route)].observe(seconds)
+            self._requests[(method, route, status)] += 1
+            self._request_seconds += seconds
+            self._wait_seconds += min(wait_seconds, seconds)
+
+    def io_wait_ratio(self):
+        """Fraction of request time spent waiting on storage, or None before any request."""
+        with self._lock:
+            if not self._request_seconds:
+                return None
+            return self._wait_seconds / self._request_seconds
+
+    def observe_storage_call(self, operation, seconds, failed=False):
+        with self._lock:
+            self._storage_latency[operation].observe(seconds)
+            if failed:
+                self._storage_errors[operation] += 1
+
+    def render(self):
+        p = self.prefix
+        lines = []
+        with self._lock:
+            lines.append(f'# HELP {p}_http_request_duration_seconds Request latency by route.')
+            lines.append(f'# TYPE {p}_http_request_duration_seconds histogram')
+            for (method, route), histogram in sorted(self._request_latency.items()):
+                lines += self._histogram_lines(
+                    f'{p}_http_request_duration_seconds', histogram, method=method, route=route
+                )
+
+            lines.append(f'# HELP {p}_http_requests_total Requests by route and status.')
+            lines.append(f'# TYPE {p}_http_requests_total counter')
+            for (method, route, status), count in sorted(self._requests.items()):
+                lines.append(f'{p}_http_requests_total{{{_labels(method=method, route=route, status=status)}}} {count}')
+
+            lines.append(f'# HELP {p}_storage_call_duration_seconds Storage (Supabase) call latency by operation.')
+            lines.append(f'# TYPE {p}_storage_call_duration_seconds histogram')
+            for operation, histogram in sorted(self._storage_latency.items()):
+                lines += self._histogram_lines(f'{p}_storage_call_duration_seconds', histogram, operation=operation)
+
+            lines.append(f'# HELP {p}_storage_call_errors_total Failed storage calls by operation.')
+            lines.append(f'# TYPE {p}_storage_call_errors_total counter')
+            for operation, count in sorted(self._storage_errors.items()):
+                lines.append(f'{p}_storage_call_errors_total{{{_labels(operation=operation)}}} {count}')
+
+            if self._request_seconds:
+                lines.append(f'# HELP {p}_io_wait_ratio Fraction of request time spent waiting on storage.')
+                lines.append(f'# TYPE {p}_io_wait_ratio gauge')
+                lines.append(f'{p}_io_wait_ratio {self._wait_seconds / self._request_seconds}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _histogram_lines(name, histogram, **labels):
+        base = _labels(**labels)
+        lines = []
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            lines.append(f'{name}_bucket{{{base},le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{{base},le="+Inf"}} {histogram.count}')
+        lines.append(f'{name}_sum{{{base}}} {histogram.sum}')
+        lines.append(f'{name}_count{{{base}}} {histogram.count}')
+        return lines
+
+
+class _TimedRepository:
+    def __init__(self, target, name, metrics):
+        self._target = target
+        self._name = name
+        self._metrics = metrics
+
+    def __getattr__(self, attr):
+        value = getattr(self._target, attr)
+        if not callable(value):
+            return value
+        operation = f'{self._name}.{attr}'
+
+        def observe(started, failed):
+            took = time.perf_counter() - started
+            self._metrics.observe_storage_call(operation, took, failed)
+            timings = _request_timings.get()
+            if timings is not None:
+                timings.add('db', took, started)
+
+        if inspect.iscoroutinefunction(value):
+            # Repositories of the async storage (async_storage.py)
+            async def call(*args, **kwargs):
+                started = time.perf_counter()
+                failed = True
+                try:
+                    result = await value(*args, **kwargs)
+                    failed = False
+                    return result
+                finally:
+                    observe(started, failed)
+
+            return call
+
+        def call(*args, **kwargs):
+            started = time.perf_counter()
+            failed = True
+            try:
+                result = value(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                observe(started, failed)
+
+        return call
+
+
+class InstrumentedStorage(Storage):
+    """Times every call on another storage backend and reports it to ``metrics``."""
+
+    def __init__(self, inner, metrics):
+        self.inner = inner
+        self.jwt_secret = getattr(inner, 'jwt_secret', None)
+        super().__init__(
+            profiles=_TimedRepository(inner.profiles, 'profiles', metrics),
+            questions=_TimedRepository(inner.questions, 'questions', metrics),
+            auth=_TimedRepository(inner.auth, 'auth', metrics),
+        )
+
+    def after_fork(self):
+        self.inner.after_fork()
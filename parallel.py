@@ -0,0 +1,64 @@
+"""Run the independent backend queries of one request concurrently."""
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+
+class QueryTimeout(TimeoutError):
+    """A query did not finish within its deadline."""
+
+
+class ParallelExecutor:
+    """A process-wide thread pool shared by all requests.
+
+    ``gather`` submits each call to the pool, waits for all of them and
+    returns their results in call order, so a handler's latency is that of
+    its slowest query instead of the sum. Error semantics match running the
+    calls one after another: results are awaited in call order and the
+    exception of the first failing call (in call order) is re-raised, even if
+    a later call failed sooner. ``timeout`` bounds the whole gather, not each
+    call; ``QueryTimeout`` is raised once it runs out.
+    """
+
+    def __init__(self, max_workers=32, timeout=10.0):
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='query')
+
+    def gather(self, *calls, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        # Each call gets its own copy of the caller's context (contextvars are not inherited by pool threads)
+        futures = [self._pool.submit(contextvars.copy_context().run, call) for call in calls]
+        deadline = time.monotonic() + timeout
+
+        for index, future in enumerate(futures):
+            try:
+                error = future.exception(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeout:
+                unfinished = [other for other in futures[index:] if not other.done()]
+                for other in unfinished:
+                    other.cancel()
+                raise QueryTimeout(f'{len(unfinished)} of {len(futures)} queries did not finish within {timeout}s')
+            if error is not None:
+                for other in futures[index + 1:]:
+                    other.cancel()
+                raise error
+
+        return [future.result() for future in futures]
+
+    def submit(self, call):
+        """Run ``call`` in the background and return its future.
+
+        ``call`` must not ``gather`` on this executor: with every thread busy
+        running such calls, their queries would queue behind them until the
+        timeout.
+        """
+        return self._pool.submit(contextvars.copy_context().run, call)
+
+    def after_fork(self):
+        # Pool threads are not copied into a forked process
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='query')
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,106 @@
+"""Admission control for the anonymous endpoints.
+
+``TokenBucketLimiter`` admits ``burst`` requests per key at once and refills at
+``rate`` per second. Bucket state lives in a store: ``MemoryBucketStore``
+keeps it per process, and ``RedisBucketStore`` shares it between workers with
+an atomic Lua script (requires the optional ``redis`` package). A store
+returns how many seconds the caller has to wait, 0 meaning admitted.
+
+``ConcurrencyLimiter`` caps how many requests of a route run at once. It never
+queues: a request over the cap is turned away immediately.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def parse_rate(spec):
+    """Parse ``"<count>/<seconds>"`` into ``(rate per second, burst)``."""
+    count, seconds = spec.split('/')
+    count, seconds = float(count), float(seconds)
+    return count / seconds, count
+
+
+class MemoryBucketStore:
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # key -> [tokens, updated]
+
+    def take(self, key, rate, burst, cost=1):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            wait = 0.0 if tokens >= cost else (cost - tokens) / rate
+            if not wait:
+                tokens -= cost
+            self._buckets[key] = [tokens, now]
+            # Evicting the least recently used bucket only forgets a client that has been quiet the longest
+            if len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+            return wait
+
+
+class RedisBucketStore:
+    # Uses the server clock so every worker agrees on elapsed time
+    SCRIPT = """
+    local now = redis.call('TIME')
+    now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+    local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(state[1]) or burst
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+    local wait = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+    else
+        wait = (cost - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+    return tostring(wait)
+    """
+
+    def __init__(self, url, prefix='askme:ratelimit:'):
+        import redis
+
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url)
+        self._take = self._redis.register_script(self.SCRIPT)
+
+    def take(self, key, rate, burst, cost=1):
+        try:
+            return float(self._take(keys=[self.prefix + key], args=[rate, burst, cost]))
+        except Exception as e:
+            # Fail open: an unreachable Redis must not take the API down with it
+            logger.warning('Rate limit store unavailable, admitting request: %s', e)
+            return 0.0
+
+
+class TokenBucketLimiter:
+    def __init__(self, name, rate, burst, store):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.store = store
+
+    def hit(self, key, cost=1):
+        """Take ``cost`` tokens for ``key``; return 0 if admitted, else the seconds until it would be."""
+        return self.store.take(f'{self.name}:{key}', self.rate, self.burst, cost)
+
+
+class ConcurrencyLimiter:
+    def __init__(self, limit):
+        self.limit = limit
+        self._slots = threading.BoundedSemaphore(limit)
+
+    def acquire(self):
+        return self._slots.acquire(blocking=False)
+
+    def release(self):
+        self._slots.release()
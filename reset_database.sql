@@ -16,10 +16,209 @@ DROP POLICY IF EXISTS "Anyone can insert questions" ON public.questions;
 DROP POLICY IF EXISTS "Users can update their own questions" ON public.questions;
 DROP POLICY IF EXISTS "Users can delete their own questions" ON public.questions;
 
+DROP POLICY IF EXISTS "Users can view their own question counts" ON public.question_counts;
+DROP POLICY IF EXISTS "Users can view their own question tombstones" ON public.question_tombstones;
+
 -- Clear test data
 DELETE FROM public.questions WHERE receiver = 'testuser';
 DELETE FROM public.profiles WHERE username = 'testuser';
 
+-- Per-user question counters, kept up to date by triggers so the dashboard
+-- can read exact totals without counting rows
+CREATE TABLE IF NOT EXISTS public.question_counts (
+    receiver TEXT PRIMARY KEY REFERENCES public.profiles(username) ON DELETE CASCADE,
+    total_count BIGINT NOT NULL DEFAULT 0,
+    answered_count BIGINT NOT NULL DEFAULT 0,
+    unanswered_count BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION public.update_question_counts()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE public.question_counts SET
+            total_count = total_count - 1,
+            answered_count = answered_count - (CASE WHEN COALESCE(OLD.answered, FALSE) THEN 1 ELSE 0 END),
+            unanswered_count = unanswered_count - (CASE WHEN COALESCE(OLD.answered, FALSE) THEN 0 ELSE 1 END)
+        WHERE receiver = OLD.receiver;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO public.question_counts (receiver, total_count, answered_count, unanswered_count)
+        VALUES (
+            NEW.receiver,
+            1,
+            CASE WHEN COALESCE(NEW.answered, FALSE) THEN 1 ELSE 0 END,
+            CASE WHEN COALESCE(NEW.answered, FALSE) THEN 0 ELSE 1 END
+        )
+        ON CONFLICT (receiver) DO UPDATE SET
+            total_count = question_counts.total_count + EXCLUDED.total_count,
+            answered_count = question_counts.answered_count + EXCLUDED.answered_count,
+            unanswered_count = question_counts.unanswered_count + EXCLUDED.unanswered_count;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+DROP TRIGGER IF EXISTS questions_count_insert_delete ON public.questions;
+CREATE TRIGGER questions_count_insert_delete
+    AFTER INSERT OR DELETE ON public.questions
+    FOR EACH ROW EXECUTE FUNCTION public.update_question_counts();
+
+DROP TRIGGER IF EXISTS questions_count_update ON public.questions;
+CREATE TRIGGER questions_count_update
+    AFTER UPDATE OF answered, receiver ON public.questions
+    FOR EACH ROW
+    WHEN (OLD.answered IS DISTINCT FROM NEW.answered OR OLD.receiver IS DISTINCT FROM NEW.receiver)
+    EXECUTE FUNCTION public.update_question_counts();
+
+-- (Re)build the counters from existing questions
+INSERT INTO public.question_counts (receiver, total_count, answered_count, unanswered_count)
+SELECT
+    receiver,
+    COUNT(*),
+    COUNT(*) FILTER (WHERE COALESCE(answered, FALSE)),
+    COUNT(*) FILTER (WHERE NOT COALESCE(answered, FALSE))
+FROM public.questions
+GROUP BY receiver
+ON CONFLICT (receiver) DO UPDATE SET
+    total_count = EXCLUDED.total_count,
+    answered_count = EXCLUDED.answered_count,
+    unanswered_count = EXCLUDED.unanswered_count;
+
+ALTER TABLE public.question_counts ENABLE ROW LEVEL SECURITY;
+GRANT SELECT ON public.question_counts TO authenticated;
+GRANT SELECT ON public.question_counts TO anon;
+
+-- Creates a user's profile with the first free username in p_usernames, or returns
+-- the existing one. One round trip for both first and repeat logins; the unique
+-- constraint on username decides races. Returns no row when every name is taken.
+CREATE OR REPLACE FUNCTION public.provision_profile(p_id UUID, p_email TEXT, p_usernames TEXT[])
+RETURNS SETOF public.profiles AS $$
+DECLARE
+    candidate TEXT;
+    profile public.profiles;
+BEGIN
+    SELECT * INTO profile FROM public.profiles WHERE id = p_id;
+    IF FOUND THEN
+        RETURN NEXT profile;
+        RETURN;
+    END IF;
+
+    FOREACH candidate IN ARRAY p_usernames LOOP
+        INSERT INTO public.profiles (id, username, email)
+        VALUES (p_id, candidate, p_email)
+        ON CONFLICT DO NOTHING
+        RETURNING * INTO profile;
+
+        -- Either this insert won, or a concurrent login created the profile first
+        IF profile.id IS NULL THEN
+            SELECT * INTO profile FROM public.profiles WHERE id = p_id;
+        END IF;
+        IF profile.id IS NOT NULL THEN
+            RETURN NEXT profile;
+            RETURN;
+        END IF;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+GRANT EXECUTE ON FUNCTION public.provision_profile(UUID, TEXT, TEXT[]) TO authenticated, anon;
+
+-- Answers several questions owned by p_receiver in one statement.
+-- p_answers is a JSON array of {"id": ..., "answer": ...}; returns the updated rows.
+CREATE OR REPLACE FUNCTION public.answer_questions(p_receiver TEXT, p_answers JSONB, p_answered_at TIMESTAMPTZ)
+RETURNS SETOF public.questions AS $$
+    UPDATE public.questions AS q
+    SET answer = submitted.answer, answered = TRUE, answered_at = p_answered_at
+    FROM jsonb_to_recordset(p_answers) AS submitted(id BIGINT, answer TEXT)
+    WHERE q.id = submitted.id AND q.receiver = p_receiver
+    RETURNING q.*;
+$$ LANGUAGE sql;
+
+GRANT EXECUTE ON FUNCTION public.answer_questions(TEXT, JSONB, TIMESTAMPTZ) TO authenticated, anon;
+
+-- Delta sync: updated_at is bumped on every change and deletions leave a
+-- tombstone, so clients can fetch only what changed since their watermark
+ALTER TABLE public.questions ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW();
+
+CREATE TABLE IF NOT EXISTS public.question_tombstones (
+    id BIGINT PRIMARY KEY,
+    receiver TEXT NOT NULL,
+    deleted_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION public.touch_question()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS questions_touch ON public.questions;
+CREATE TRIGGER questions_touch
+    BEFORE UPDATE ON public.questions
+    FOR EACH ROW EXECUTE FUNCTION public.touch_question();
+
+CREATE OR REPLACE FUNCTION public.record_question_tombstone()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO public.question_tombstones (id, receiver)
+    VALUES (OLD.id, OLD.receiver)
+    ON CONFLICT (id) DO UPDATE SET receiver = EXCLUDED.receiver, deleted_at = EXCLUDED.deleted_at;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+DROP TRIGGER IF EXISTS questions_tombstone ON public.questions;
+CREATE TRIGGER questions_tombstone
+    AFTER DELETE ON public.questions
+    FOR EACH ROW EXECUTE FUNCTION public.record_question_tombstone();
+
+CREATE INDEX IF NOT EXISTS idx_questions_receiver_updated_id ON public.questions(receiver, updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_question_tombstones_receiver_deleted_id ON public.question_tombstones(receiver, deleted_at, id);
+
+-- Tombstones only need to outlive the oldest watermark the API accepts
+-- (SYNC_RETENTION_DAYS, 30 by default). Schedule this, e.g. daily with pg_cron:
+-- DELETE FROM public.question_tombstones WHERE deleted_at < NOW() - INTERVAL '30 days';
+
+-- Questions changed and deleted after (p_since_at, p_since_id), oldest first, plus the
+-- database time p_settle_seconds ago. Runs as the caller, so RLS still applies.
+CREATE OR REPLACE FUNCTION public.question_changes(
+    p_receiver TEXT, p_since_at TIMESTAMPTZ, p_since_id BIGINT, p_limit INT, p_settle_seconds INT
+)
+RETURNS JSONB AS $$
+    SELECT jsonb_build_object(
+        'changed', COALESCE((
+            SELECT jsonb_agg(q) FROM (
+                SELECT * FROM public.questions
+                WHERE receiver = p_receiver
+                AND (updated_at, id) > (COALESCE(p_since_at, '-infinity'), p_since_id)
+                ORDER BY updated_at, id
+                LIMIT p_limit
+            ) q
+        ), '[]'::jsonb),
+        'deleted', COALESCE((
+            SELECT jsonb_agg(t) FROM (
+                SELECT id, deleted_at FROM public.question_tombstones
+                WHERE p_since_at IS NOT NULL
+                AND receiver = p_receiver
+                AND (deleted_at, id) > (p_since_at, p_since_id)
+                ORDER BY deleted_at, id
+                LIMIT p_limit
+            ) t
+        ), '[]'::jsonb),
+        'settled', NOW() - make_interval(secs => p_settle_seconds)
+    );
+$$ LANGUAGE sql STABLE;
+
+ALTER TABLE public.question_tombstones ENABLE ROW LEVEL SECURITY;
+GRANT SELECT ON public.question_tombstones TO authenticated;
+GRANT SELECT ON public.question_tombstones TO anon;
+GRANT EXECUTE ON FUNCTION public.question_changes(TEXT, TIMESTAMPTZ, BIGINT, INT, INT) TO authenticated, anon;
+
 -- Recreate policies with more permissive rules for testing
 CREATE POLICY "Anyone can view profiles" ON public.profiles
     FOR SELECT USING (true);
@@ -63,3 +262,21 @@ CREATE POLICY "Users can delete their own questions" ON public.questions
             AND profiles.id = auth.uid()
         ) OR auth.uid() IS NULL
     );
+
+CREATE POLICY "Users can view their own question counts" ON public.question_counts
+    FOR SELECT USING (
+        EXISTS (
+            SELECT 1 FROM public.profiles 
+            WHERE profiles.username = question_counts.receiver 
+            AND profiles.id = auth.uid()
+        ) OR auth.uid() IS NULL
+    );
+
+CREATE POLICY "Users can view their own question tombstones" ON public.question_tombstones
+    FOR SELECT USING (
+        EXISTS (
+            SELECT 1 FROM public.profiles 
+            WHERE profiles.username = question_tombstones.receiver 
+            AND profiles.id = auth.uid()
+        ) OR auth.uid() IS NULL
+    );
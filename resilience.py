@@ -0,0 +1,293 @@
+"""Deadlines, retries and circuit breaking for storage calls.
+
+``ResilientStorage`` wraps a storage backend the way ``InstrumentedStorage``
+does, and guards every repository call:
+
+- Each call gets a deadline (``deadlines`` maps ``'read'``, ``'write'`` and
+  ``'auth'`` to seconds). Sync calls run on a dedicated thread pool so a
+  hung connection cannot hold the request past it. Overrunning raises
+  ``StorageTimeout``.
+- Idempotent reads (``READ_OPERATIONS``) that fail transiently are retried
+  with jittered exponential backoff. Retries are drawn from a shared
+  ``RetryBudget``, so during an outage they add at most a fraction of the
+  normal load instead of multiplying it.
+- Each backend service (``database``, ``auth``) has a ``CircuitBreaker``.
+  After ``failure_threshold`` transient failures in a row it opens. Calls
+  then fail at once with ``CircuitOpen`` until ``reset_timeout`` has passed,
+  and a single trial call decides whether it closes again.
+
+Only transient failures count: timeouts, connection errors and server-side
+errors. Bad requests, missing rows and rejected credentials are the
+backend working normally.
+"""
+import asyncio
+import contextvars
+import inspect
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from storage import Storage
+
+# Calls that can be repeated without side effects
+READ_OPERATIONS = frozenset({
+    'profiles.get_by_id',
+    'profiles.get_by_username',
+    'profiles.exists',
+    'questions.get',
+    'questions.list_by_receiver',
+    'questions.existing_ids',
+    'questions.changes_since',
+    'questions.counts',
+    'auth.get_user',
+})
+
+# Which breaker guards each repository
+SERVICES = {'profiles': 'database', 'questions': 'database', 'auth': 'auth'}
+
+# PostgreSQL error classes for lost connections, exhausted resources and cancelled statements,
+# and PostgREST's own "cannot reach the database" errors
+TRANSIENT_SQLSTATE_PREFIXES = ('08', '53', '57', 'PGRST00')
+
+
+class StorageUnavailable(Exception):
+    """Storage cannot serve the call right now; the client should retry later."""
+
+    retry_after = 1
+
+
+class CircuitOpen(StorageUnavailable):
+    def __init__(self, service, retry_after):
+        super().__init__(f'{service} is unavailable')
+        self.retry_after = retry_after
+
+
+class StorageTimeout(StorageUnavailable, TimeoutError):
+    pass
+
+
+def is_transient(error):
+    if isinstance(error, (StorageTimeout, TimeoutError, ConnectionError, json.JSONDecodeError)):
+        # A body PostgREST cannot parse as JSON is a proxy error page
+        return True
+    if type(error).__module__.split('.')[0] in ('httpx', 'httpcore'):
+        return True
+    if type(error).__name__ == 'AuthRetryableError':
+        return True
+    code = getattr(error, 'code', None)
+    if isinstance(code, int):
+        return code >= 500
+    if isinstance(code, str):
+        return code.startswith(TRANSIENT_SQLSTATE_PREFIXES) or (len(code) == 3 and code.startswith('5'))
+    return False
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=5, reset_timeout=10.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return 'open'
+            return 'half_open'
+
+    def before_call(self):
+        """Raise ``CircuitOpen`` unless a call may go through now."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            waited = time.monotonic() - self._opened_at
+            if waited < self.reset_timeout or self._trial_running:
+                raise CircuitOpen(self.name, max(self.reset_timeout - waited, 1))
+            # Half open: let one trial call through
+            self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def abandon(self):
+        """A call ended without an outcome (it was cancelled): free the trial slot without judging the backend."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class RetryBudget:
+    """Allows retries worth ``ratio`` of all calls, plus ``min_per_second`` so quiet periods can still retry."""
+
+    def __init__(self, ratio=0.1, min_per_second=5.0, max_balance=100.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_balance = max_balance
+        self._lock = threading.Lock()
+        self._balance = max_balance
+        self._updated = time.monotonic()
+
+    def deposit(self):
+        with self._lock:
+            self._balance = min(self._balance + self.ratio, self.max_balance)
+
+    def withdraw(self):
+        with self._lock:
+            now = time.monotonic()
+            self._balance = min(self._balance + (now - self._updated) * self.min_per_second, self.max_balance)
+            self._updated = now
+            if self._balance < 1:
+                return False
+            self._balance -= 1
+            return True
+
+
+class _GuardedRepository:
+    def __init__(self, target, name, storage):
+        self._target = target
+        self._name = name
+        self._storage = storage
+
+    def __getattr__(self, attr):
+        value = getattr(self._target, attr)
+        if not callable(value):
+            return value
+        operation = f'{self._name}.{attr}'
+        storage = self._storage
+        breaker = storage.breakers[SERVICES.get(self._name, self._name)]
+        retries = storage.retries if operation in READ_OPERATIONS else 0
+        category = 'auth' if self._name == 'auth' else 'read' if operation in READ_OPERATIONS else 'write'
+        deadline = storage.deadlines[category]
+
+        if inspect.iscoroutinefunction(value):
+            async def call(*args, **kwargs):
+                storage.budget.deposit()
+                for attempt in range(retries + 1):
+                    breaker.before_call()
+                    try:
+                        result = await asyncio.wait_for(value(*args, **kwargs), deadline)
+                    except asyncio.TimeoutError:
+                        error = StorageTimeout(f'{operation} did not finish within {deadline}s')
+                    except Exception as e:
+                        error = e
+                    except BaseException:
+                        # Cancelled, e.g. by an outer wait_for; a half-open trial must not stay taken
+                        breaker.abandon()
+                        raise
+                    else:
+                        breaker.record_success()
+                        return result
+                    if not storage._failed(breaker, error, attempt, retries):
+                        raise storage._final_error(operation, error)
+                    await asyncio.sleep(storage.backoff_delay(attempt))
+
+            return call
+
+        def call(*args, **kwargs):
+            storage.budget.deposit()
+            for attempt in range(retries + 1):
+                breaker.before_call()
+                try:
+                    future = storage._pool.submit(contextvars.copy_context().run, value, *args, **kwargs)
+                    result = future.result(timeout=deadline)
+                except FutureTimeout:
+                    future.cancel()  # in case it is still queued behind hung calls
+                    error = StorageTimeout(f'{operation} did not finish within {deadline}s')
+                except Exception as e:
+                    error = e
+                except BaseException:
+                    breaker.abandon()
+                    raise
+                else:
+                    breaker.record_success()
+                    return result
+                if not storage._failed(breaker, error, attempt, retries):
+                    raise storage._final_error(operation, error)
+                time.sleep(storage.backoff_delay(attempt))
+
+        return call
+
+
+class ResilientStorage(Storage):
+    def __init__(self, inner, deadlines=None, retries=1, backoff=0.05, budget=None, breakers=None,
+                 failure_threshold=5, reset_timeout=10.0, max_workers=64):
+        self.inner = inner
+        self.jwt_secret = getattr(inner, 'jwt_secret', None)
+        self.deadlines = dict({'read': 3.0, 'write': 5.0, 'auth': 5.0}, **(deadlines or {}))
+        self.retries = retries
+        self.backoff = backoff
+        self.budget = budget or RetryBudget()
+        # Pass the breakers of another ResilientStorage to share its view of the backend
+        self.breakers = breakers or {
+            service: CircuitBreaker(service, failure_threshold, reset_timeout)
+            for service in set(SERVICES.values())
+        }
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='storage')
+        super().__init__(
+            profiles=_GuardedRepository(inner.profiles, 'profiles', self),
+            questions=_GuardedRepository(inner.questions, 'questions', self),
+            auth=_GuardedRepository(inner.auth, 'auth', self),
+        )
+
+    def share(self, inner):
+        """Guard another backend for the same services (such as its async client) with these settings and breakers."""
+        return ResilientStorage(
+            inner, deadlines=self.deadlines, retries=self.retries, backoff=self.backoff,
+            budget=self.budget, breakers=self.breakers, max_workers=self.max_workers,
+        )
+
+    def backoff_delay(self, attempt):
+        # "Full jitter": spreads the retries of many clients instead of synchronising them
+        return random.uniform(0, self.backoff * 2 ** attempt)
+
+    def render(self, prefix='askme'):
+        """Breaker states in the Prometheus text format, for /metrics."""
+        lines = [
+            f'# HELP {prefix}_circuit_breaker_open Whether storage calls to a service are failing fast.',
+            f'# TYPE {prefix}_circuit_breaker_open gauge',
+        ]
+        for service, breaker in sorted(self.breakers.items()):
+            lines.append(f'{prefix}_circuit_breaker_open{{service="{service}"}} {int(breaker.state == "open")}')
+        return '\n'.join(lines) + '\n'
+
+    def after_fork(self):
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='storage')
+        self.inner.after_fork()
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+    @staticmethod
+    def _final_error(operation, error):
+        # Transient failures surface as StorageUnavailable (503); anything else is the caller's to handle
+        if isinstance(error, StorageUnavailable) or not is_transient(error):
+            return error
+        unavailable = StorageUnavailable(f'{operation} failed: {error}')
+        unavailable.__cause__ = error
+        return unavailable
+
+    def _failed(self, breaker, error, attempt, retries):
+        """Record a failed attempt and return whether to retry it."""
+        if not is_transient(error):
+            breaker.record_success()  # the backend answered; the request itself was bad
+            return False
+        breaker.record_failure()
+        return attempt < retries and self.budget.withdraw()
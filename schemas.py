@@ -0,0 +1,49 @@
+"""Response schemas.
+
+Only the fields declared on these models are sent to clients, whatever the
+storage backend returned. List endpoints can narrow that further with a
+``fields=`` parameter (see ``dump_questions``).
+"""
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict, TypeAdapter
+
+
+class Question(BaseModel):
+    model_config = ConfigDict(extra='ignore')
+
+    id: int
+    receiver: Optional[str] = None
+    question: Optional[str] = None
+    answer: Optional[str] = None
+    answered: Optional[bool] = None
+    created_at: Optional[str] = None
+    answered_at: Optional[str] = None
+
+
+class PublicUser(BaseModel):
+    model_config = ConfigDict(extra='ignore')
+
+    id: str
+    username: str
+    created_at: Optional[str] = None
+
+
+QUESTION_FIELDS = frozenset(Question.model_fields)
+
+_question_list = TypeAdapter(List[Question])
+
+
+def dump_question(row):
+    return Question.model_validate(row).model_dump(mode='json')
+
+
+def dump_questions(rows, fields=None):
+    """Serialize question rows, keeping only ``fields`` when given."""
+    questions = _question_list.validate_python(rows)
+    include = {'__all__': set(fields)} if fields else None
+    return _question_list.dump_python(questions, mode='json', include=include)
+
+
+def dump_public_user(row):
+    return PublicUser.model_validate(row).model_dump(mode='json')
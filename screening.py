@@ -0,0 +1,203 @@
+"""Spam and abuse screening for submitted questions, run before any storage call.
+
+``QuestionScreen.check`` raises ``QuestionRejected`` for a question that
+should not be stored. The checks run in order of cost:
+
+- Content rules: length limits, control characters, too many links and long
+  runs of one character.
+- A blocklist of words and phrases, compiled into one ``PhraseMatcher``
+  (Aho-Corasick) so a question is scanned once however long the list is.
+  Text is normalised first (case, Unicode compatibility forms, common digit
+  for letter swaps, invisible characters), and phrases only match whole
+  words, so "class" does not trip on "ass".
+- Near-duplicates: each question is reduced to a small sketch (the lowest
+  hashes of its word pairs). A question whose sketch overlaps one of the
+  receiver's recent questions by ``similarity`` or more is rejected, which
+  catches a flood of the same text with small edits. Recent questions are
+  remembered per process, for ``duplicate_ttl`` seconds.
+"""
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, defaultdict, deque
+
+# Characters that render as nothing and are used to split words past filters
+INVISIBLE = dict.fromkeys(map(ord, '\u00ad\u200b\u200c\u200d\u2060\ufeff'))
+LOOKALIKES = str.maketrans('013457@$', 'oieastas')
+CONTROL_CHARACTERS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]')
+LINKS = re.compile(r'https?://|www\.', re.IGNORECASE)
+WHITESPACE = re.compile(r'\s+')
+NON_WORD = re.compile(r'[\W_]+')
+
+
+def normalize(text):
+    """Fold ``text`` to the form the blocklist and duplicate checks compare."""
+    text = unicodedata.normalize('NFKC', text).translate(INVISIBLE).casefold()
+    return WHITESPACE.sub(' ', text.translate(LOOKALIKES)).strip()
+
+
+class QuestionRejected(Exception):
+    def __init__(self, reason, message, status=400):
+        super().__init__(message)
+        self.reason = reason
+        self.status = status
+
+
+class PhraseMatcher:
+    """Aho-Corasick automaton over normalised phrases, matching whole words only."""
+
+    def __init__(self, phrases):
+        self._goto = [{}]
+        self._fail = [0]
+        self._found = [()]  # lengths of the phrases ending at each state
+        for phrase in phrases:
+            phrase = normalize(phrase)
+            if phrase:
+                self._add(phrase)
+        self._link()
+
+    def _add(self, phrase):
+        state = 0
+        for char in phrase:
+            if char not in self._goto[state]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._found.append(())
+                self._goto[state][char] = len(self._goto) - 1
+            state = self._goto[state][char]
+        self._found[state] += (len(phrase),)
+
+    def _link(self):
+        # Breadth first, so the fallback of every shorter suffix is known first
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._found[child] += self._found[self._fail[child]]
+
+    def search(self, text):
+        """Return the first blocked phrase in normalised ``text``, or None."""
+        goto, fail, found = self._goto, self._fail, self._found
+        if not goto[0]:
+            return None
+        state = 0
+        for end, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length in found[state]:
+                start = end - length + 1
+                if (start == 0 or not text[start - 1].isalnum()) and (end + 1 == len(text) or not text[end + 1].isalnum()):
+                    return text[start:end + 1]
+        return None
+
+
+def sketch(text, shingle=2, size=32):
+    """The ``size`` smallest hashes of the runs of ``shingle`` words in normalised ``text``."""
+    words = NON_WORD.sub(' ', text).split()
+    hashes = set(map(hash, zip(*(words[i:] for i in range(shingle))))) or {hash(tuple(words))}
+    return frozenset(heapq.nsmallest(size, hashes))
+
+
+def resemblance(a, b, size=32):
+    """Estimate the Jaccard similarity of the texts behind two sketches."""
+    if not a & b:
+        return 0.0  # the usual case, without sorting
+    union = heapq.nsmallest(size, a | b)
+    return sum(1 for h in union if h in a and h in b) / len(union)
+
+
+class QuestionScreen:
+    def __init__(self, blocklist=(), min_length=1, max_length=1000, max_links=2, max_repeat=20,
+                 similarity=0.8, duplicate_window=20, duplicate_ttl=600.0, maxsize=100000):
+        self.matcher = PhraseMatcher(blocklist)
+        self.min_length = min_length
+        self.max_length = max_length
+        self.max_links = max_links
+        self.repeated = re.compile(r'(.)\1{%d,}' % (max_repeat - 1), re.DOTALL) if max_repeat else None
+        self.similarity = similarity
+        self.duplicate_window = duplicate_window
+        self.duplicate_ttl = duplicate_ttl
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._recent = OrderedDict()  # receiver -> deque of (sketch, expires_at)
+        self.rejections = defaultdict(int)
+
+    def check(self, receiver, text):
+        """Raise ``QuestionRejected`` unless ``text`` may be sent to ``receiver``; returns its sketch."""
+        try:
+            return self._check(receiver, text)
+        except QuestionRejected as e:
+            with self._lock:
+                self.rejections[e.reason] += 1
+            raise
+
+    def _check(self, receiver, text):
+        if not isinstance(text, str):
+            raise QuestionRejected('invalid', 'Question must be text')
+        length = len(text.strip())
+        if length < self.min_length:
+            raise QuestionRejected('too_short', 'Question is too short')
+        if length > self.max_length:
+            raise QuestionRejected('too_long', f'Question must be at most {self.max_length} characters')
+        if CONTROL_CHARACTERS.search(text):
+            raise QuestionRejected('invalid', 'Question contains invalid characters')
+        if self.max_links is not None and len(LINKS.findall(text)) > self.max_links:
+            raise QuestionRejected('links', 'Question contains too many links')
+        if self.repeated is not None and self.repeated.search(text):
+            raise QuestionRejected('repetitive', 'Question contains too much repeated text')
+
+        normalized = normalize(text)
+        if self.matcher.search(normalized) is not None:
+            raise QuestionRejected('blocked', 'Question contains blocked content')
+
+        fingerprint = sketch(normalized)
+        if self.duplicate_window and self._is_duplicate(receiver, fingerprint):
+            raise QuestionRejected('duplicate', 'A very similar question was sent recently', status=409)
+        return fingerprint
+
+    def _is_duplicate(self, receiver, fingerprint):
+        now = time.monotonic()
+        with self._lock:
+            recent = self._recent.get(receiver)
+            if not recent:
+                return False
+            while recent and recent[0][1] <= now:
+                recent.popleft()
+            return any(resemblance(fingerprint, other) >= self.similarity for other, _ in recent)
+
+    def remember(self, receiver, fingerprint):
+        """Record a question that was accepted, for the near-duplicate check."""
+        if not self.duplicate_window:
+            return
+        with self._lock:
+            recent = self._recent.pop(receiver, None) or deque(maxlen=self.duplicate_window)
+            recent.append((fingerprint, time.monotonic() + self.duplicate_ttl))
+            self._recent[receiver] = recent
+            # Evicting the least recently asked receiver only forgets its oldest questions
+            if len(self._recent) > self.maxsize:
+                self._recent.popitem(last=False)
+
+    def render(self, prefix='askme'):
+        """Rejection counts in the Prometheus text format, for /metrics."""
+        lines = [
+            f'# HELP {prefix}_questions_rejected_total Submitted questions rejected by screening.',
+            f'# TYPE {prefix}_questions_rejected_total counter',
+        ]
+        with self._lock:
+            for reason, count in sorted(self.rejections.items()):
+                lines.append(f'{prefix}_questions_rejected_total{{reason="{reason}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def load_blocklist(path):
+    """Phrases from a text file, one per line; blank lines and ``#`` comments are skipped."""
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
@@ -0,0 +1,122 @@
+"""Production server: ``python serve.py`` runs api.py under gunicorn (in requirements.txt).
+
+The app is imported once in the master (``preload_app``) and forked into the
+workers. Each worker then calls ``api.after_fork()``, so it builds its own
+Supabase client and connection pool, query threads and background threads
+rather than sharing the parent's sockets.
+
+Workers are sized from the CPU count and the fraction of request time spent
+waiting on Supabase. A CPU can keep ``1 / (1 - io_wait)`` requests in flight,
+and each worker contributes ``WEB_THREADS`` of them. ``io_wait`` comes from
+``WEB_IO_WAIT``, or from the ``askme_io_wait_ratio`` gauge of a running
+instance when ``WEB_IO_WAIT_FROM`` points at its ``/metrics`` URL.
+
+``python serve.py --print-config`` shows the settings without starting.
+"""
+import json
+import math
+import os
+import sys
+import urllib.request
+
+# Used until there is an observation: requests to Supabase dominate most handlers
+DEFAULT_IO_WAIT = 0.8
+
+def observed_io_wait(metrics_url, token=None):
+    """Read askme_io_wait_ratio from a running instance's /metrics, or None if unavailable"""
+    request = urllib.request.Request(metrics_url)
+    if token:
+        request.add_header('Authorization', f'Bearer {token}')
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            for line in response.read().decode().splitlines():
+                if line.startswith('askme_io_wait_ratio '):
+                    return float(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+def io_wait():
+    if os.getenv("WEB_IO_WAIT"):
+        return float(os.getenv("WEB_IO_WAIT"))
+    if os.getenv("WEB_IO_WAIT_FROM"):
+        observed = observed_io_wait(os.getenv("WEB_IO_WAIT_FROM"), os.getenv("METRICS_TOKEN"))
+        if observed is not None:
+            return observed
+    return DEFAULT_IO_WAIT
+
+def worker_count(cpus, io_wait, threads=1, max_workers=None):
+    """Workers needed to keep ``cpus`` busy when requests spend ``io_wait`` of their time waiting"""
+    io_wait = min(max(io_wait, 0.0), 0.95)
+    in_flight = cpus / (1 - io_wait)
+    workers = max(1, math.ceil(in_flight / threads))
+    return min(workers, max_workers) if max_workers else workers
+
+def gunicorn_options():
+    cpus = os.cpu_count() or 1
+    worker_class = os.getenv("WEB_WORKER_CLASS", "gthread")
+    threads = int(os.getenv("WEB_THREADS", 8)) if worker_class == "gthread" else 1
+    wait = io_wait()
+
+    if os.getenv("WEB_WORKERS"):
+        workers = int(os.getenv("WEB_WORKERS"))
+    elif worker_class == "gevent":
+        # Greenlets overlap the waiting; one worker per CPU is enough
+        workers = cpus
+    else:
+        workers = worker_count(cpus, wait, threads, int(os.getenv("WEB_MAX_WORKERS", 4 * cpus)))
+
+    # An in-memory SQLite database exists once per process, so every request must reach the same one
+    if os.getenv("STORAGE_BACKEND") == "sqlite" and os.getenv("SQLITE_PATH", ":memory:") == ":memory:":
+        workers = 1
+
+    options = {
+        'bind': os.getenv("WEB_BIND", f"0.0.0.0:{os.getenv('PORT', 5000)}"),
+        'workers': workers,
+        'worker_class': worker_class,
+        'threads': threads,
+        'preload_app': True,
+        'keepalive': int(os.getenv("WEB_KEEPALIVE", 5)),
+        'timeout': int(os.getenv("WEB_TIMEOUT", 30)),
+        'graceful_timeout': int(os.getenv("WEB_GRACEFUL_TIMEOUT", 30)),
+        # Recycling workers bounds the growth of per-worker caches
+        'max_requests': int(os.getenv("WEB_MAX_REQUESTS", 10000)),
+        'max_requests_jitter': int(os.getenv("WEB_MAX_REQUESTS_JITTER", 1000)),
+        'worker_connections': int(os.getenv("WEB_WORKER_CONNECTIONS", 1000)),
+        'accesslog': os.getenv("WEB_ACCESS_LOG") or None,
+        'post_fork': post_fork,
+    }
+    if os.getenv("WEB_HTTP2", "").lower() in ("1", "true", "yes"):
+        # Needs TLS (WEB_CERTFILE/WEB_KEYFILE) for browsers, and the h2 package
+        options['http_protocols'] = 'h2,h1'
+    if os.getenv("WEB_CERTFILE"):
+        options['certfile'] = os.getenv("WEB_CERTFILE")
+        options['keyfile'] = os.getenv("WEB_KEYFILE")
+    return options, wait
+
+def post_fork(server, worker):
+    import api
+    api.after_fork(workers=server.cfg.workers)
+
+def run(options):
+    from gunicorn.app.base import BaseApplication
+
+    class Server(BaseApplication):
+        def load_config(self):
+            for name, value in options.items():
+                if value is not None:
+                    self.cfg.set(name, value)
+
+        def load(self):
+            from api import app
+            return app
+
+    Server().run()
+
+if __name__ == "__main__":
+    options, wait = gunicorn_options()
+    if "--print-config" in sys.argv:
+        shown = {name: value for name, value in options.items() if not callable(value)}
+        print(json.dumps(dict(shown, io_wait=wait, cpus=os.cpu_count()), indent=2))
+    else:
+        run(options)
@@ -0,0 +1,467 @@
+"""Storage layer used by the API handlers.
+
+Handlers never talk to a database client directly. They go through a
+``Storage`` object with three repositories:
+
+- ``storage.profiles`` - rows of the ``profiles`` table
+- ``storage.questions`` - rows of the ``questions`` and ``question_counts`` tables
+- ``storage.auth`` - sign-up, sign-in and session handling
+
+``SupabaseStorage`` is the production implementation. ``local_storage.SQLiteStorage``
+models the same schema in SQLite (in memory by default) so the app, its tests
+and load tests can run without a Supabase project. ``create_storage`` picks one
+from configuration.
+
+Rows are plain dicts shaped like the PostgREST responses. Auth methods return
+objects with ``.user`` and ``.session`` attributes like the Supabase client.
+"""
+import threading
+from datetime import datetime
+
+
+# Columns fetched by default: what the handlers and clients actually use
+PROFILE_COLUMNS = ('id', 'username', 'created_at')
+QUESTION_COLUMNS = ('id', 'receiver', 'question', 'answer', 'answered', 'created_at', 'answered_at')
+
+
+class QuestionNotFound(Exception):
+    pass
+
+
+class NotQuestionOwner(Exception):
+    """The question exists but belongs to another receiver."""
+
+
+class ProfileRepository:
+    def get_by_id(self, user_id):
+        """Return the profile row for ``user_id``, or None."""
+        raise NotImplementedError
+
+    def get_by_username(self, username):
+        """Return the profile row for ``username``, or None."""
+        raise NotImplementedError
+
+    def exists(self, username):
+        """Return whether a profile with ``username`` exists."""
+        raise NotImplementedError
+
+    def create(self, profile):
+        """Insert a profile row and return it."""
+        raise NotImplementedError
+
+    def provision(self, user_id, email, usernames):
+        """Return the profile for ``user_id``, creating it with the first free name in ``usernames``.
+
+        Runs as a single database call; the unique constraint on ``username``
+        decides which candidate wins. Returns None when every candidate is taken.
+        """
+        raise NotImplementedError
+
+
+class QuestionRepository:
+    # Listings are ordered newest first on (sort column, id)
+    SORT_COLUMNS = {False: 'created_at', True: 'answered_at'}
+    # Changes stamped within this many seconds may still be committing, so
+    # sync watermarks never move past that point
+    CHANGE_SETTLE_SECONDS = 5
+
+    def get(self, question_id, columns=QUESTION_COLUMNS):
+        """Return the question row with ``question_id``, or None."""
+        raise NotImplementedError
+
+    def list_by_receiver(self, receiver, answered, limit, cursor=None, columns=QUESTION_COLUMNS):
+        """Return ``(rows, next_key)`` for one page of a receiver's questions.
+
+        Unanswered questions are ordered by ``created_at``, answered ones by
+        ``answered_at``, newest first with ``id`` as tie-breaker. ``cursor`` and
+        ``next_key`` are ``(sort value, id)`` tuples; ``next_key`` is None on
+        the last page. Only ``columns`` (plus the sort keys) are fetched.
+        """
+        raise NotImplementedError
+
+    def create(self, question):
+        """Insert a question row and return it."""
+        raise NotImplementedError
+
+    def create_many(self, questions):
+        """Insert question rows with a single multi-row insert and return them."""
+        raise NotImplementedError
+
+    def update_for_receiver(self, question_id, receiver, changes):
+        """Apply ``changes`` to a question owned by ``receiver`` and return the updated row.
+
+        The ownership check is part of the write itself. Raises
+        ``QuestionNotFound`` or ``NotQuestionOwner`` when no row matched.
+        """
+        raise NotImplementedError
+
+    def delete_for_receiver(self, question_id, receiver):
+        """Delete a question owned by ``receiver`` and return the deleted row.
+
+        Raises ``QuestionNotFound`` or ``NotQuestionOwner`` when no row matched.
+        """
+        raise NotImplementedError
+
+    def answer_many_for_receiver(self, answers, receiver, answered_at):
+        """Answer several questions owned by ``receiver`` at once and return the updated rows.
+
+        ``answers`` maps question id to answer text. Questions that do not exist
+        or belong to someone else are skipped; compare the ids of the returned
+        rows with the request and use ``existing_ids`` to tell the two apart.
+        """
+        raise NotImplementedError
+
+    def delete_many_for_receiver(self, question_ids, receiver):
+        """Delete the given questions owned by ``receiver`` and return the deleted rows.
+
+        Other ids are skipped, as in ``answer_many_for_receiver``.
+        """
+        raise NotImplementedError
+
+    def existing_ids(self, question_ids):
+        """Return the subset of ``question_ids`` that exist."""
+        raise NotImplementedError
+
+    def counts(self, receiver):
+        """Return the receiver's ``question_counts`` row (all zeros if there is none)."""
+        raise NotImplementedError
+
+    def changes_since(self, receiver, since, limit):
+        """Return ``(changed, deleted_ids, watermark, has_more)`` for a receiver's questions.
+
+        ``since`` and ``watermark`` are ``(timestamp, id)`` keys over
+        ``updated_at`` and tombstone ``deleted_at`` (None means from the
+        start, in which case deletions are not reported). ``changed`` holds
+        the rows created or updated after ``since``, oldest change first. The
+        watermark stays ``CHANGE_SETTLE_SECONDS`` behind the database clock,
+        so recent changes can be sent twice but late commits are never skipped.
+        """
+        changed, tombstones, settled = self._fetch_changes(receiver, since, limit + 1)
+        entries = [((row['updated_at'], row['id']), row) for row in changed]
+        entries += [((row['deleted_at'], row['id']), None) for row in tombstones]
+        entries.sort(key=lambda entry: _change_key(entry[0]))
+        page = entries[:limit]
+        has_more = len(entries) > limit
+
+        settled_key = (settled, 0)
+        if has_more and _change_key(page[-1][0]) <= _change_key(settled_key):
+            watermark = page[-1][0]
+        else:
+            # Caught up, or the rest is too recent to step past; the next sync picks it up
+            watermark, has_more = settled_key, False
+        if since is not None and _change_key(watermark) < _change_key(since):
+            watermark = since
+
+        rows = [row for _, row in page if row is not None]
+        deleted = [key[1] for key, row in page if row is None]
+        return rows, deleted, watermark, has_more
+
+    def _fetch_changes(self, receiver, since, limit):
+        """Return ``(rows, tombstones, settled)``: up to ``limit`` question rows and
+        ``(id, deleted_at)`` tombstones after ``since``, oldest first, and the database
+        time ``CHANGE_SETTLE_SECONDS`` ago."""
+        raise NotImplementedError
+
+    def _no_match(self, question_id):
+        # Only reached when a conditional write matched nothing: tell 404 from 403
+        if self.get(question_id, columns=('id',)) is None:
+            raise QuestionNotFound(question_id)
+        raise NotQuestionOwner(question_id)
+
+    @classmethod
+    def _select_columns(cls, answered, columns):
+        # The sort keys are always needed to build the next cursor
+        sort_column = cls.SORT_COLUMNS[answered]
+        return ','.join(dict.fromkeys(('id', sort_column, *columns)))
+
+    @classmethod
+    def _page(cls, rows, answered, limit):
+        # Listing queries fetch limit + 1 rows to find out whether there is a next page
+        page = rows[:limit]
+        if len(rows) <= limit:
+            return page, None
+        sort_column = cls.SORT_COLUMNS[answered]
+        return page, (page[-1][sort_column], page[-1]['id'])
+
+
+def _change_key(key):
+    # Timestamps come back from the database as ISO strings with varying precision
+    timestamp, row_id = key
+    return datetime.fromisoformat(timestamp), row_id
+
+
+class AuthRepository:
+    def sign_up(self, email, password):
+        raise NotImplementedError
+
+    def sign_in_with_password(self, email, password):
+        raise NotImplementedError
+
+    def sign_in_with_id_token(self, provider, token):
+        raise NotImplementedError
+
+    def exchange_code_for_session(self, code):
+        raise NotImplementedError
+
+    def refresh_session(self, refresh_token):
+        raise NotImplementedError
+
+    def sign_out(self, access_token):
+        """End the session an access token belongs to."""
+        raise NotImplementedError
+
+    def get_user(self, access_token):
+        """Return the user an access token belongs to, or None."""
+        raise NotImplementedError
+
+
+class Storage:
+    def __init__(self, profiles, questions, auth):
+        self.profiles = profiles
+        self.questions = questions
+        self.auth = auth
+
+    def after_fork(self):
+        """Drop connections inherited from the parent process; called in each new worker."""
+
+
+EMPTY_COUNTS = {'total_count': 0, 'answered_count': 0, 'unanswered_count': 0}
+
+
+class SupabaseProfileRepository(ProfileRepository):
+    def __init__(self, client):
+        self.client = client
+
+    def get_by_id(self, user_id):
+        result = self.client.table('profiles').select(','.join(PROFILE_COLUMNS)).eq('id', user_id).execute()
+        return result.data[0] if result.data else None
+
+    def get_by_username(self, username):
+        result = self.client.table('profiles').select(','.join(PROFILE_COLUMNS)).eq('username', username).execute()
+        return result.data[0] if result.data else None
+
+    def exists(self, username):
+        result = self.client.table('profiles').select('username').eq('username', username).execute()
+        return bool(result.data)
+
+    def create(self, profile):
+        result = self.client.table('profiles').insert(profile).execute()
+        return result.data[0] if result.data else profile
+
+    def provision(self, user_id, email, usernames):
+        # See provision_profile() in setup_database.sql
+        result = self.client.rpc(
+            'provision_profile', {'p_id': user_id, 'p_email': email, 'p_usernames': list(usernames)}
+        ).execute()
+        if not result.data:
+            return None
+        return {column: result.data[0].get(column) for column in PROFILE_COLUMNS}
+
+
+class SupabaseQuestionRepository(QuestionRepository):
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, question_id, columns=QUESTION_COLUMNS):
+        result = self.client.table('questions').select(','.join(columns)).eq('id', question_id).execute()
+        return result.data[0] if result.data else None
+
+    def list_by_receiver(self, receiver, answered, limit, cursor=None, columns=QUESTION_COLUMNS):
+        result = self._list_query(self.client, receiver, answered, limit, cursor, columns).execute()
+        return self._page(result.data, answered, limit)
+
+    def create(self, question):
+        result = self.client.table('questions').insert(question).execute()
+        return result.data[0]
+
+    def create_many(self, questions):
+        return self.client.table('questions').insert(list(questions)).execute().data
+
+    def update_for_receiver(self, question_id, receiver, changes):
+        result = self.client.table('questions').update(changes).eq('id', question_id).eq('receiver', receiver).execute()
+        if not result.data:
+            self._no_match(question_id)
+        return result.data[0]
+
+    def delete_for_receiver(self, question_id, receiver):
+        result = self.client.table('questions').delete().eq('id', question_id).eq('receiver', receiver).execute()
+        if not result.data:
+            self._no_match(question_id)
+        return result.data[0]
+
+    def answer_many_for_receiver(self, answers, receiver, answered_at):
+        # Each question gets its own answer text, so this goes through answer_questions()
+        # (setup_database.sql): one UPDATE ... FROM over the submitted pairs
+        result = self.client.rpc('answer_questions', {
+            'p_receiver': receiver,
+            'p_answers': [{'id': question_id, 'answer': answer} for question_id, answer in answers.items()],
+            'p_answered_at': answered_at,
+        }).execute()
+        return result.data or []
+
+    def delete_many_for_receiver(self, question_ids, receiver):
+        result = (
+            self.client.table('questions')
+            .delete()
+            .in_('id', list(question_ids))
+            .eq('receiver', receiver)
+            .execute()
+        )
+        return result.data
+
+    def existing_ids(self, question_ids):
+        result = self.client.table('questions').select('id').in_('id', list(question_ids)).execute()
+        return {row['id'] for row in result.data}
+
+    def _fetch_changes(self, receiver, since, limit):
+        # One round trip for both tables, see question_changes() in setup_database.sql
+        since_at, since_id = since or (None, 0)
+        result = self.client.rpc('question_changes', {
+            'p_receiver': receiver,
+            'p_since_at': since_at,
+            'p_since_id': since_id,
+            'p_limit': limit,
+            'p_settle_seconds': self.CHANGE_SETTLE_SECONDS,
+        }).execute()
+        return result.data['changed'], result.data['deleted'], result.data['settled']
+
+    def counts(self, receiver):
+        result = (
+            self.client.table('question_counts')
+            .select('receiver,total_count,answered_count,unanswered_count')
+            .eq('receiver', receiver)
+            .execute()
+        )
+        return result.data[0] if result.data else dict(EMPTY_COUNTS, receiver=receiver)
+
+    @classmethod
+    def _list_query(cls, client, receiver, answered, limit, cursor, columns):
+        # Shared with the async repository in async_storage.py; both clients build queries the same way
+        sort_column = cls.SORT_COLUMNS[answered]
+        query = (
+            client.table('questions')
+            .select(cls._select_columns(answered, columns))
+            .eq('receiver', receiver)
+            .eq('answered', answered)
+        )
+        if cursor:
+            value, row_id = cursor
+            # postgrest-py has no or_() filter yet, so add the PostgREST "or" parameter directly
+            query.params = query.params.add(
+                'or', f'({sort_column}.lt."{value}",and({sort_column}.eq."{value}",id.lt.{row_id}))'
+            )
+        # Both sort keys have to go into a single PostgREST "order" parameter
+        query.params = query.params.add('order', f'{sort_column}.desc,id.desc')
+        return query.limit(limit + 1)
+
+
+class SupabaseAuthRepository(AuthRepository):
+    def __init__(self, client):
+        self.client = client
+
+    def sign_up(self, email, password):
+        return self.client.auth.sign_up({'email': email, 'password': password})
+
+    def sign_in_with_password(self, email, password):
+        return self.client.auth.sign_in_with_password({'email': email, 'password': password})
+
+    def sign_in_with_id_token(self, provider, token):
+        return self.client.auth.sign_in_with_id_token({'provider': provider, 'token': token})
+
+    def exchange_code_for_session(self, code):
+        return self.client.auth.exchange_code_for_session(code)
+
+    def refresh_session(self, refresh_token):
+        return self.client.auth.refresh_session(refresh_token)
+
+    def sign_out(self, access_token):
+        self.client.auth.admin.sign_out(access_token)
+
+    def get_user(self, access_token):
+        response = self.client.auth.get_user(access_token)
+        return response.user if response else None
+
+
+class LazyClient:
+    """Stands in for the Supabase client and builds it on first use.
+
+    Importing supabase and creating the client is the most expensive part of
+    starting the app, so cold starts only pay for it once a request needs the
+    database (health checks, CORS preflights and rejected requests never do).
+
+    ``pool`` configures the HTTP connections to PostgREST, which carry every
+    table and RPC call: ``max_connections``, ``max_keepalive`` (idle
+    connections kept open), ``keepalive_expiry`` (seconds), ``http2`` (needs
+    ``pip install httpx[http2]``) and ``timeout`` (seconds).
+    """
+
+    def __init__(self, url, key, pool=None):
+        self._url = url
+        self._key = key
+        self._pool = pool
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from supabase import create_client
+
+                    client = create_client(self._url, self._key)
+                    if self._pool:
+                        self._configure_pool(client, **self._pool)
+                    self._client = client
+        return self._client
+
+    def reset(self):
+        # The parent's client and its sockets must not be shared with a forked worker
+        self._client = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _configure_pool(client, max_connections=100, max_keepalive=20, keepalive_expiry=5.0, http2=False, timeout=10.0):
+        import httpx
+
+        postgrest = client.postgrest
+        default = postgrest.session
+        postgrest.session = httpx.Client(
+            base_url=default.base_url,
+            headers=default.headers,
+            timeout=timeout,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+                keepalive_expiry=keepalive_expiry,
+            ),
+        )
+        default.close()
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+class SupabaseStorage(Storage):
+    def __init__(self, url, key, pool=None):
+        if not url or not key:
+            raise ValueError('A Supabase URL and key are required')
+        self.client = LazyClient(url, key, pool)
+        super().__init__(
+            profiles=SupabaseProfileRepository(self.client),
+            questions=SupabaseQuestionRepository(self.client),
+            auth=SupabaseAuthRepository(self.client),
+        )
+
+    def after_fork(self):
+        self.client.reset()
+
+
+def create_storage(backend, supabase_url=None, supabase_key=None, sqlite_path=':memory:', jwt_secret=None, supabase_pool=None):
+    if backend == 'supabase':
+        return SupabaseStorage(supabase_url, supabase_key, supabase_pool)
+    if backend == 'sqlite':
+        from local_storage import SQLiteStorage
+
+        return SQLiteStorage(sqlite_path, jwt_secret=jwt_secret)
+    raise ValueError(f"Unknown storage backend: {backend}")
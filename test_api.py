@@ -1,8 +1,9 @@
 import requests
 import json
+import os
 
 # Base URL for your API
-BASE_URL = "http://localhost:5000"
+BASE_URL = os.getenv("ASKME_BASE_URL", "http://localhost:5000")
 
 def test_health():
     """Test the health endpoint"""
@@ -76,6 +77,28 @@ def test_answer_question(token, question_id):
     print(f"Response: {response.json()}")
     return response.status_code == 200
 
+def test_bulk_questions(token):
+    """Test answering and deleting several questions at once"""
+    headers = {"Authorization": f"Bearer {token}"}
+    question_ids = []
+    for i in range(3):
+        response = requests.post(f"{BASE_URL}/questions", json={"receiver": "testuser", "question": f"Bulk question {i}?"})
+        if response.status_code != 201:
+            return False
+        question_ids.append(response.json()['question']['id'])
+    
+    data = {"answers": [{"id": question_ids[0], "answer": "Bulk answer"}, {"id": 999999999, "answer": "Nope"}]}
+    response = requests.post(f"{BASE_URL}/questions/bulk/answer", json=data, headers=headers)
+    print(f"Bulk Answer: {response.status_code}")
+    print(f"Response: {response.json()}")
+    if response.status_code != 200 or [r['status'] for r in response.json()['results']] != [200, 404]:
+        return False
+    
+    response = requests.post(f"{BASE_URL}/questions/bulk/delete", json={"ids": question_ids[1:]}, headers=headers)
+    print(f"Bulk Delete: {response.status_code}")
+    print(f"Response: {response.json()}")
+    return response.status_code == 200 and response.json()['succeeded'] == 2
+
 def test_user_profile():
     """Test getting user profile"""
     response = requests.get(f"{BASE_URL}/user/testuser")
@@ -83,6 +106,38 @@ def test_user_profile():
     print(f"Response: {response.json()}")
     return response.status_code == 200
 
+def test_user_profile_pagination():
+    """Test paging through a user's answered questions"""
+    response = requests.get(f"{BASE_URL}/user/testuser", params={"limit": 1})
+    print(f"User Profile Page 1: {response.status_code}")
+    print(f"Response: {response.json()}")
+    if response.status_code != 200 or len(response.json()['answered_questions']) > 1:
+        return False
+    
+    next_cursor = response.json()['next_cursor']
+    if next_cursor:
+        response = requests.get(f"{BASE_URL}/user/testuser", params={"limit": 1, "cursor": next_cursor})
+        print(f"User Profile Page 2: {response.status_code}")
+        print(f"Response: {response.json()}")
+    
+    bad_cursor = requests.get(f"{BASE_URL}/user/testuser", params={"cursor": "not-a-cursor"})
+    return response.status_code == 200 and bad_cursor.status_code == 400
+
+def test_questions_delta(token):
+    """Test delta sync of a user's questions"""
+    headers = {"Authorization": f"Bearer {token}"}
+    response = requests.get(f"{BASE_URL}/user/testuser/questions", params={"since": ""}, headers=headers)
+    print(f"Questions Delta: {response.status_code}")
+    print(f"Response: {response.json()}")
+    if response.status_code != 200 or 'watermark' not in response.json():
+        return False
+    
+    response = requests.get(f"{BASE_URL}/user/testuser/questions",
+                            params={"since": response.json()['watermark']}, headers=headers)
+    print(f"Questions Delta (since watermark): {response.status_code}")
+    print(f"Response: {response.json()}")
+    return response.status_code == 200
+
 def test_google_oauth():
     """Test Google OAuth endpoint (mock test)"""
     # This is a mock test since we don't have a real Google ID token
@@ -159,6 +214,13 @@ def run_tests():
         return
     print("✅ Answer question passed!\n")
     
+    # Test 6b: Bulk Answer and Delete
+    print("6b. Testing Bulk Answer and Delete...")
+    if not test_bulk_questions(token):
+        print("❌ Bulk answer and delete failed!")
+        return
+    print("✅ Bulk answer and delete passed!\n")
+    
     # Test 7: User Profile
     print("7. Testing User Profile...")
     if not test_user_profile():
@@ -166,6 +228,20 @@ def run_tests():
         return
     print("✅ User profile passed!\n")
     
+    # Test 7b: User Profile Pagination
+    print("7b. Testing User Profile Pagination...")
+    if not test_user_profile_pagination():
+        print("❌ User profile pagination failed!")
+        return
+    print("✅ User profile pagination passed!\n")
+    
+    # Test 7c: Questions Delta Sync
+    print("7c. Testing Questions Delta Sync...")
+    if not test_questions_delta(token):
+        print("❌ Questions delta sync failed!")
+        return
+    print("✅ Questions delta sync passed!\n")
+    
     # Test 8: Google OAuth
     print("8. Testing Google OAuth...")
     if not test_google_oauth():
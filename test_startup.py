@@ -0,0 +1,85 @@
+import os
+import re
+import subprocess
+import sys
+
+# Cold-start budget for importing api.py in a fresh interpreter, as on a Vercel cold start
+MAX_IMPORT_MS = float(os.getenv("STARTUP_MAX_IMPORT_MS", 600))
+MAX_RSS_MB = float(os.getenv("STARTUP_MAX_RSS_MB", 80))
+RUNS = int(os.getenv("STARTUP_RUNS", 3))
+
+# Modules that must not be loaded until a request needs them
+DEFERRED_MODULES = ("supabase", "jwt", "redis", "local_storage")
+
+MEASURE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import api
+took = time.perf_counter() - started
+print(json.dumps({
+    'import_ms': took * 1000,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'loaded': sorted(name for name in %r if name in sys.modules),
+}))
+""" % (DEFERRED_MODULES,)
+
+def cold_env():
+    env = dict(os.environ)
+    env.update({
+        "VERCEL": "1",
+        "STORAGE_BACKEND": "supabase",
+        "PUBLIC_SUPABASE_URL": env.get("PUBLIC_SUPABASE_URL") or "https://example.supabase.co",
+        "PUBLIC_SUPABASE_ANON_KEY": env.get("PUBLIC_SUPABASE_ANON_KEY") or "anon-key",
+    })
+    env.pop("CACHE_REDIS_URL", None)
+    env.pop("EVENTS_REDIS_URL", None)
+    return env
+
+def run_python(*args):
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=cold_env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+def measure_cold_import():
+    """Import api in fresh interpreters and return the fastest run"""
+    import json
+    runs = [json.loads(run_python("-c", MEASURE).stdout.strip().splitlines()[-1]) for _ in range(RUNS)]
+    return min(runs, key=lambda run: run['import_ms'])
+
+def import_profile(top=15):
+    """Return the slowest imports as (cumulative ms, module), from python -X importtime"""
+    stderr = run_python("-X", "importtime", "-c", "import api").stderr
+    rows = []
+    for line in stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)", line)
+        if match:
+            rows.append((int(match.group(1)) / 1000, len(match.group(2)) // 2, match.group(3)))
+    return sorted(rows, reverse=True)[:top]
+
+def test_cold_import_budget():
+    """Test that a cold import of api stays within the time and memory budget"""
+    result = measure_cold_import()
+    print(f"Cold import: {result['import_ms']:.0f} ms (budget {MAX_IMPORT_MS:.0f} ms), "
+          f"max RSS {result['rss_mb']:.0f} MB (budget {MAX_RSS_MB:.0f} MB)")
+    assert result['import_ms'] <= MAX_IMPORT_MS
+    assert result['rss_mb'] <= MAX_RSS_MB
+
+def test_deferred_imports():
+    """Test that the Supabase client stack and auth libraries load lazily"""
+    result = measure_cold_import()
+    print(f"Deferred modules loaded at import: {result['loaded'] or 'none'}")
+    assert result['loaded'] == []
+
+if __name__ == "__main__":
+    print("🚀 Import-time profile (cumulative ms, depth, module):")
+    for ms, depth, module in import_profile():
+        print(f"  {ms:8.1f}  {'  ' * depth}{module}")
+    print()
+    test_deferred_imports()
+    test_cold_import_budget()
+    print("🎉 Startup budget met!")
@@ -0,0 +1,45 @@
+import itertools
+import os
+import sys
+
+import pytest
+
+# Offline: every test runs against the in-memory SQLite backend
+os.environ.setdefault('STORAGE_BACKEND', 'sqlite')
+os.environ.setdefault('SQLITE_PATH', ':memory:')
+os.environ.setdefault('SUPABASE_JWT_SECRET', 'test-secret')
+# Most tests submit from the test client's one address; test_ratelimit.py tightens the limits itself
+os.environ.setdefault('RATE_LIMIT_SUBMIT_IP', '1000/60')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_addresses = itertools.count(1)
+
+
+@pytest.fixture(scope='session')
+def api():
+    import api
+
+    return api
+
+
+@pytest.fixture
+def client(api):
+    return api.app.test_client()
+
+
+@pytest.fixture
+def new_user(client):
+    """Sign up and log in a fresh user; returns ``(username, auth headers)``."""
+    def create(username):
+        # Each signup comes from its own address, clear of the per-IP signup limit
+        address = next(_addresses)
+        environ = {'REMOTE_ADDR': f'10.255.{address // 250}.{address % 250 + 1}'}
+        credentials = {'email': f'{username}@example.com', 'password': 'password123'}
+        response = client.post('/auth/signup', json=dict(credentials, username=username), environ_base=environ)
+        assert response.status_code == 201, response.json
+        response = client.post('/auth/login', json=credentials, environ_base=environ)
+        assert response.status_code == 200, response.json
+        return username, {'Authorization': f"Bearer {response.json['session']['access_token']}"}
+
+    return create
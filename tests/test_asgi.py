@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from write_behind import BufferFull
+
+
+@pytest.fixture(scope='module')
+def asgi(api):
+    import asgi
+
+    return asgi
+
+
+def request(asgi, method, url, **kwargs):
+    async def send():
+        async with httpx.AsyncClient(app=asgi.app, base_url='http://testserver') as client:
+            return await client.request(method, url, **kwargs)
+
+    return asyncio.run(send())
+
+
+def test_async_views_match_the_flask_views(asgi, client, new_user):
+    username, _ = new_user('asgi_erin')
+    response = request(asgi, 'POST', '/questions', json={'receiver': username, 'question': 'Tea or coffee?'})
+    assert response.status_code == 201
+    assert request(asgi, 'POST', '/questions', json={'receiver': 'asgi_nobody', 'question': 'Hello?'}).status_code == 404
+    assert request(asgi, 'POST', '/questions', json={'receiver': ['asgi_erin'], 'question': 'Hello?'}).status_code == 400
+
+    flask_body = client.get(f'/user/{username}').get_data()
+    assert request(asgi, 'GET', f'/user/{username}').content == flask_body
+
+
+def test_full_submit_queue_does_not_block_the_event_loop(asgi, new_user, monkeypatch):
+    username, _ = new_user('asgi_frank')
+
+    class FullBuffer:
+        def add(self, row):
+            time.sleep(0.2)  # waiting for room, as a full queue does
+            raise BufferFull()
+
+    monkeypatch.setattr(asgi.api, 'submit_buffer', FullBuffer())
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.ensure_future(ticker())
+        async with httpx.AsyncClient(app=asgi.app, base_url='http://testserver') as client:
+            response = await client.post('/questions', json={'receiver': username, 'question': 'Still there?'})
+        task.cancel()
+        return response, ticks
+
+    response, ticks = asyncio.run(scenario())
+    assert response.status_code == 503
+    assert ticks >= 10
+
+
+def test_supabase_async_storage_opens_only_its_pooled_session(monkeypatch):
+    from async_storage import SupabaseAsyncStorage
+
+    sessions = []
+    original = httpx.AsyncClient.__init__
+
+    def record(self, *args, **kwargs):
+        sessions.append(kwargs)
+        original(self, *args, **kwargs)
+
+    monkeypatch.setattr(httpx.AsyncClient, '__init__', record)
+    storage = SupabaseAsyncStorage('https://example.supabase.co', 'key', max_connections=7)
+    assert len(sessions) == 1 and sessions[0]['limits'].max_connections == 7
+    assert str(storage.client.session.base_url) == 'https://example.supabase.co/rest/v1/'
+    asyncio.run(storage.aclose())
@@ -0,0 +1,67 @@
+import time
+
+import jwt
+import pytest
+
+from auth_tokens import TokenVerifier
+
+
+def make_token(secret='secret', expires_in=3600, **claims):
+    claims = dict({'sub': 'user-1', 'aud': 'authenticated', 'exp': int(time.time()) + expires_in}, **claims)
+    return jwt.encode(claims, secret, algorithm='HS256')
+
+
+def test_verified_tokens_are_cached(monkeypatch):
+    verifier = TokenVerifier(None, jwt_secret='secret')
+    decode = verifier._decode
+    calls = []
+    monkeypatch.setattr(verifier, '_decode', lambda token: calls.append(token) or decode(token))
+
+    token = make_token()
+    assert verifier.verify(token).id == 'user-1'
+    assert verifier.verify(token).id == 'user-1'
+    assert len(calls) == 1
+
+    verifier.invalidate(token)
+    verifier.verify(token)
+    assert len(calls) == 2
+
+
+def test_bad_tokens_are_rejected():
+    verifier = TokenVerifier(None, jwt_secret='secret')
+    with pytest.raises(jwt.InvalidTokenError):
+        verifier.verify(make_token(secret='other'))
+    with pytest.raises(jwt.InvalidTokenError):
+        verifier.verify(make_token(expires_in=-10))
+    with pytest.raises(jwt.InvalidTokenError):
+        verifier.verify(make_token(aud='someone-else'))
+
+
+def test_remote_mode_asks_the_auth_server_once_per_token():
+    calls = []
+    verifier = TokenVerifier(None, mode='remote', remote_verify=lambda token: calls.append(token) or {'id': 'user-1'})
+    token = make_token()
+    verifier.verify(token)
+    verifier.verify(token)
+    assert calls == [token]
+
+
+def test_no_key_and_no_fallback_is_rejected():
+    verifier = TokenVerifier(None)
+    with pytest.raises(jwt.InvalidTokenError):
+        verifier.verify(make_token())
+
+
+def test_protected_routes_need_a_valid_token(client):
+    assert client.get('/dashboard').status_code == 401
+    assert client.get('/dashboard', headers={'Authorization': 'Bearer junk'}).status_code == 401
+
+
+def test_logged_out_token_is_rejected_in_remote_mode(api, client, new_user, monkeypatch):
+    verifier = TokenVerifier(None, mode='remote', remote_verify=api.storage.auth.get_user)
+    monkeypatch.setattr(api, 'token_verifier', verifier)
+    _, headers = new_user('auth_quinn')
+
+    assert client.get('/dashboard', headers=headers).status_code == 200
+    assert client.post('/auth/logout', headers=headers).status_code == 200
+    assert client.get('/dashboard', headers=headers).status_code == 401
@@ -0,0 +1,77 @@
+import asyncio
+import threading
+import time
+
+from cache import AsyncSingleFlight, SingleFlight, TTLCache
+
+
+def test_ttl_cache_expires_and_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None and cache.get('a') == 1
+    cache.set('short', 1, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get('short') is None
+
+
+def test_single_flight_shares_one_call():
+    flights = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        release.wait(1)
+        return 'page'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flights.do('key', fetch))) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ['page'] * 10 and len(calls) == 1
+
+
+def test_async_single_flight_shares_one_call():
+    flights = AsyncSingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return 'page'
+
+    async def scenario():
+        return await asyncio.gather(*(flights.do('key', fetch) for _ in range(10)))
+
+    assert asyncio.run(scenario()) == ['page'] * 10 and len(calls) == 1
+
+
+def test_concurrent_profile_misses_make_one_backend_fetch(api, new_user, monkeypatch):
+    username, _ = new_user('cache_olga')
+    render = api.render_profile_page
+    calls = []
+
+    def slow_render(*args):
+        calls.append(args)
+        time.sleep(0.05)
+        return render(*args)
+
+    monkeypatch.setattr(api, 'render_profile_page', slow_render)
+    statuses = []
+
+    def view():
+        statuses.append(api.app.test_client().get(f'/user/{username}').status_code)
+
+    threads = [threading.Thread(target=view) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert statuses == [200] * 10 and len(calls) == 1
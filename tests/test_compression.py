@@ -0,0 +1,51 @@
+import gzip
+import json
+
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request
+
+from compression import Compressor
+
+
+def app_request(accept_encoding):
+    return Request(EnvironBuilder(headers={'Accept-Encoding': accept_encoding}).get_environ())
+
+
+def test_small_bodies_and_unaccepted_encodings_stay_plain():
+    compressor = Compressor(min_size=100)
+    assert compressor.choose_encoding(app_request('gzip'), 50) is None
+    assert compressor.choose_encoding(app_request('identity'), 500) is None
+    assert compressor.choose_encoding(app_request('gzip, deflate'), 500) == 'gzip'
+    # Deterministic output, so cached compressed copies keep one ETag
+    assert compressor.compress(b'x' * 500, 'gzip') == compressor.compress(b'x' * 500, 'gzip')
+
+
+def test_profile_etag_differs_per_encoding(api, client, new_user, monkeypatch):
+    username, _ = new_user('gz_alice')
+    monkeypatch.setattr(api.compressor, 'min_size', 1)
+
+    plain = client.get(f'/user/{username}', headers={'Accept-Encoding': 'identity'})
+    zipped = client.get(f'/user/{username}', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in plain.headers
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in zipped.headers['Vary']
+    assert zipped.headers['ETag'] != plain.headers['ETag']
+    assert json.loads(gzip.decompress(zipped.data)) == plain.json
+
+    # Each variant revalidates against its own ETag
+    revalidated = client.get(f'/user/{username}', headers={'Accept-Encoding': 'gzip', 'If-None-Match': zipped.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert revalidated.headers['ETag'] == zipped.headers['ETag']
+
+
+def test_other_json_responses_are_compressed(api, client, new_user, monkeypatch):
+    username, headers = new_user('gz_bob')
+    monkeypatch.setattr(api.compressor, 'min_size', 1)
+    response = client.get('/dashboard', headers=dict(headers, **{'Accept-Encoding': 'gzip'}))
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(response.data))['user']['username'] == username
+
+
+def test_json_provider_round_trips(api):
+    body = api.app.json.dumps({'id': 1, 'text': 'héllo', 'nested': [None, True]})
+    assert api.app.json.loads(body) == {'id': 1, 'text': 'héllo', 'nested': [None, True]}
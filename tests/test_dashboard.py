@@ -0,0 +1,14 @@
+def ask(client, receiver, question):
+    response = client.post('/questions', json={'receiver': receiver, 'question': question})
+    assert response.status_code == 201, response.json
+    return response.json['question']['id']
+
+
+def test_dashboard_counts(client, new_user):
+    username, headers = new_user('q_mona')
+    answered = ask(client, username, 'Favourite season?')
+    ask(client, username, 'Favourite number?')
+    client.post(f'/questions/{answered}/answer', json={'answer': 'Autumn'}, headers=headers)
+
+    stats = client.get('/dashboard', headers=headers).json['stats']
+    assert stats == {'total_questions': 2, 'unanswered_count': 1, 'answered_count': 1}
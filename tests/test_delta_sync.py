@@ -0,0 +1,68 @@
+import time
+
+import pytest
+
+from storage import QuestionRepository
+
+
+def ask(client, receiver, question):
+    response = client.post('/questions', json={'receiver': receiver, 'question': question})
+    assert response.status_code == 201, response.json
+    return response.json['question']['id']
+
+
+@pytest.fixture
+def settled_now(monkeypatch):
+    # Let watermarks step right up to the database clock
+    monkeypatch.setattr(QuestionRepository, 'CHANGE_SETTLE_SECONDS', 0)
+
+
+def sync(client, username, headers, watermark='', limit=50):
+    response = client.get(f'/user/{username}/questions?since={watermark}&limit={limit}', headers=headers)
+    assert response.status_code == 200, response.json
+    return response.json
+
+
+def test_delta_sync_reports_changes_and_tombstones(client, new_user, settled_now):
+    username, headers = new_user('sync_alice')
+    kept = ask(client, username, 'What did you have for breakfast?')
+    dropped = ask(client, username, 'Is this question going away?')
+
+    first = sync(client, username, headers)
+    assert sorted(q['id'] for q in first['changed']) == [kept, dropped]
+    assert first['deleted'] == [] and not first['has_more']
+
+    time.sleep(0.01)
+    assert client.post(f'/questions/{kept}/answer', json={'answer': 'Porridge'}, headers=headers).status_code == 200
+    assert client.delete(f'/questions/{dropped}', headers=headers).status_code == 200
+    second = sync(client, username, headers, first['watermark'])
+    assert [(q['id'], q['answer']) for q in second['changed']] == [(kept, 'Porridge')]
+    assert second['deleted'] == [dropped]
+
+    # Nothing new: an empty delta, and the watermark does not move back
+    third = sync(client, username, headers, second['watermark'])
+    assert third['changed'] == [] and third['deleted'] == []
+
+
+def test_small_pages_walk_every_change(client, new_user, settled_now):
+    username, headers = new_user('sync_bob')
+    ids = [ask(client, username, f'Quick question number {n}?') for n in range(5)]
+    # One bulk update touches every row within the same millisecond
+    response = client.post('/questions/bulk/answer', json={'answers': [{'id': i, 'answer': 'Yes'} for i in ids]}, headers=headers)
+    assert response.status_code == 200, response.json
+
+    seen, watermark = [], ''
+    for _ in range(10):
+        page = sync(client, username, headers, watermark, limit=2)
+        seen += [q['id'] for q in page['changed']]
+        watermark = page['watermark']
+        if not page['has_more']:
+            break
+    assert sorted(set(seen)) == sorted(ids)
+
+
+def test_watermarks_are_validated(api, client, new_user, monkeypatch):
+    username, headers = new_user('sync_chen')
+    assert client.get(f'/user/{username}/questions?since=garbage', headers=headers).status_code == 400
+    expired = api.encode_cursor(('2000-01-01T00:00:00+00:00', 1))
+    assert client.get(f'/user/{username}/questions?since={expired}', headers=headers).status_code == 410
@@ -0,0 +1,66 @@
+from events import EventBroker
+
+
+def test_resume_from_history():
+    broker = EventBroker(history=10)
+    first = broker.publish('alice', 'question', {'n': 1})
+    broker.publish('alice', 'question', {'n': 2})
+    subscription = broker.subscribe('alice', last_event_id=first.id)
+    assert [event.data for event in subscription.missed] == [{'n': 2}]
+    assert subscription.complete
+    subscription.close()
+    assert broker.subscriber_count() == 0
+
+
+def test_history_is_kept_for_recent_channels_only():
+    broker = EventBroker(history=10, max_channels=3)
+    first = broker.publish('user0', 'question', {})
+    for n in range(1, 100):
+        broker.publish(f'user{n}', 'question', {})
+    assert len(broker._recent) == 3
+
+    # user0's history is gone, so resuming it has to be flagged
+    subscription = broker.subscribe('user0', last_event_id=first.id - 1)
+    assert subscription.missed == [] and not subscription.complete
+
+
+def test_sse_stream_resumes_with_last_event_id(api, client, new_user, monkeypatch):
+    monkeypatch.setattr(api, 'SSE_MAX_SECONDS', 0)
+    username, headers = new_user('evt_dave')
+    before = api.event_broker.publish(username, 'ping', {})
+    assert client.post('/questions', json={'receiver': username, 'question': 'Seen any good films?'}).status_code == 201
+
+    response = client.get('/events', headers=dict(headers, **{'Last-Event-ID': str(before.id)}))
+    body = response.get_data(as_text=True)
+    assert response.mimetype == 'text/event-stream'
+    assert 'event: question' in body and 'Seen any good films?' in body
+    assert 'event: reset' not in body
+
+
+def test_open_streams_are_capped_per_worker(api, client, new_user, monkeypatch):
+    from ratelimit import ConcurrencyLimiter
+
+    monkeypatch.setattr(api, 'event_streams', ConcurrencyLimiter(1))
+    username, headers = new_user('evt_erin')
+    subscribers = api.event_broker.subscriber_count()
+    first = client.get('/events', headers=headers, buffered=False)
+    assert first.status_code == 200
+    second = client.get('/events', headers=headers)
+    assert second.status_code == 503 and second.headers['Retry-After']
+
+    # The server closing the first stream, even unread, frees its slot and its subscription
+    first.close()
+    assert api.event_broker.subscriber_count() == subscribers
+    monkeypatch.setattr(api, 'SSE_MAX_SECONDS', 0)
+    third = client.get('/events', headers=headers)
+    assert third.status_code == 200
+    third.close()
+
+
+def test_streams_need_redis_with_several_workers(api, client, new_user, monkeypatch):
+    username, headers = new_user('evt_finn')
+    monkeypatch.setattr(api, 'worker_processes', 4)
+    assert client.get('/events', headers=headers).status_code == 501
+    monkeypatch.setattr(api, 'worker_processes', 1)
+    monkeypatch.setenv('VERCEL', '1')
+    assert client.get('/events', headers=headers).status_code == 501
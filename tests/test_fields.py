@@ -0,0 +1,39 @@
+def ask(client, receiver, question):
+    response = client.post('/questions', json={'receiver': receiver, 'question': question})
+    assert response.status_code == 201, response.json
+    return response.json['question']['id']
+
+
+def test_fields_narrow_question_lists(client, new_user):
+    username, headers = new_user('fld_alice')
+    question_id = ask(client, username, 'Mountains or the sea?')
+    assert client.post(f'/questions/{question_id}/answer', json={'answer': 'Sea'}, headers=headers).status_code == 200
+
+    profile = client.get(f'/user/{username}?fields=id,answer').json
+    assert profile['answered_questions'] == [{'id': question_id, 'answer': 'Sea'}]
+    inbox = client.get(f'/user/{username}/questions?status=answered&fields=question', headers=headers).json
+    assert inbox['answered_questions'] == [{'question': 'Mountains or the sea?'}]
+
+
+def test_projected_pages_still_carry_a_cursor(client, new_user):
+    username, headers = new_user('fld_bob')
+    ids = [ask(client, username, f'Pick a number, round {n}?') for n in range(3)]
+    first = client.get(f'/user/{username}/questions?status=unanswered&limit=2&fields=id', headers=headers).json
+    cursor = first['unanswered_next_cursor']
+    rest = client.get(f'/user/{username}/questions?status=unanswered&limit=2&fields=id&cursor={cursor}', headers=headers).json
+    assert [q['id'] for q in first['unanswered_questions'] + rest['unanswered_questions']] == sorted(ids, reverse=True)
+
+
+def test_unknown_fields_and_private_columns_are_rejected(client, new_user):
+    username, headers = new_user('fld_chen')
+    assert client.get(f'/user/{username}?fields=id,sender').status_code == 400
+    assert client.get(f'/user/{username}/questions?fields=email', headers=headers).status_code == 400
+
+
+def test_responses_only_carry_schema_fields(client, new_user):
+    username, headers = new_user('fld_dana')
+    question_id = ask(client, username, 'Who sent this?')
+    assert client.post(f'/questions/{question_id}/answer', json={'answer': 'Nobody knows'}, headers=headers).status_code == 200
+    profile = client.get(f'/user/{username}').json
+    assert 'email' not in profile['user']
+    assert 'sender' not in profile['answered_questions'][0]
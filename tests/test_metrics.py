@@ -0,0 +1,38 @@
+import re
+
+import metrics
+
+
+def server_timing(header):
+    return {part.split(';')[0]: float(re.search(r'dur=([\d.]+)', part).group(1)) for part in header.split(', ')}
+
+
+def test_overlapping_calls_count_once():
+    timings = metrics.RequestTimings()
+    timings.add('db', 0.10, started=1.00)
+    timings.add('db', 0.10, started=1.05)  # overlaps the first call
+    timings.add('db', 0.05, started=2.00)
+    assert abs(timings.duration('db') - 0.20) < 1e-9
+    assert timings.counts['db'] == 3
+    assert timings.duration('auth') == 0.0
+
+
+def test_server_timing_header(client, new_user):
+    username, _ = new_user('met_alice')
+    response = client.get(f'/user/{username}')
+    durations = server_timing(response.headers['Server-Timing'])
+    assert {'db', 'total'} <= set(durations)
+    # The profile and its answers are fetched in parallel; their wait cannot exceed the request
+    assert durations['db'] <= durations['total']
+
+
+def test_metrics_endpoint_counts_requests(api, client, monkeypatch):
+    monkeypatch.setattr(api, 'METRICS_TOKEN', '')
+    client.get('/health')
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'askme_http_requests_total{method="GET",route="/health",status="200"}' in body
+    assert 'askme_http_request_duration_seconds_bucket' in body
+
+    monkeypatch.setattr(api, 'METRICS_TOKEN', 'scrape-me')
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer scrape-me'}).status_code == 200
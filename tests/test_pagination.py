@@ -0,0 +1,90 @@
+import base64
+import json
+
+
+def ask(client, receiver, question):
+    response = client.post('/questions', json={'receiver': receiver, 'question': question})
+    assert response.status_code == 201, response.json
+    return response.json['question']['id']
+
+
+def forge(value, row_id):
+    return base64.urlsafe_b64encode(json.dumps([value, row_id]).encode()).decode().rstrip('=')
+
+
+def test_inbox_pages_follow_the_cursor_without_gaps(client, new_user):
+    username, headers = new_user('page_alice')
+    ids = [ask(client, username, f'Question number {n} for you?') for n in range(5)]
+
+    seen, cursor = [], None
+    while True:
+        url = f'/user/{username}/questions?status=unanswered&limit=2' + (f'&cursor={cursor}' if cursor else '')
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200, response.json
+        page = [q['id'] for q in response.json['unanswered_questions']]
+        assert len(page) <= 2
+        seen += page
+        cursor = response.json['unanswered_next_cursor']
+        if not cursor:
+            break
+    assert seen == sorted(ids, reverse=True)
+
+
+def test_profile_pages_follow_the_cursor(client, new_user):
+    username, headers = new_user('page_bob')
+    for n in range(3):
+        question_id = ask(client, username, f'Favourite colour, take {n}?')
+        assert client.post(f'/questions/{question_id}/answer', json={'answer': f'Blue {n}'}, headers=headers).status_code == 200
+
+    first = client.get(f'/user/{username}?limit=2').json
+    assert len(first['answered_questions']) == 2
+    rest = client.get(f"/user/{username}?limit=2&cursor={first['next_cursor']}").json
+    assert len(rest['answered_questions']) == 1 and rest['next_cursor'] is None
+    answers = [q['answer'] for q in first['answered_questions'] + rest['answered_questions']]
+    assert sorted(answers) == ['Blue 0', 'Blue 1', 'Blue 2']
+
+
+def test_forged_cursors_are_rejected(client, new_user):
+    username, headers = new_user('page_chen')
+    forged = [
+        'not-base64!',
+        forge('2030-01-01T00:00:00', 'one'),
+        forge('x",id.gt.0)', 1),
+        forge('2030-01-01T00:00:00"),or(id.gt.0', 1),
+        forge(None, 1),
+    ]
+    for cursor in forged:
+        response = client.get(f'/user/{username}/questions?status=unanswered&cursor={cursor}', headers=headers)
+        assert response.status_code == 400, cursor
+        assert client.get(f'/user/{username}?cursor={cursor}').status_code == 400, cursor
+
+
+def test_status_selects_the_inbox_bucket(client, new_user):
+    username, headers = new_user('page_dana')
+    answered = ask(client, username, 'Tea or coffee?')
+    waiting = ask(client, username, 'Cats or dogs?')
+    assert client.post(f'/questions/{answered}/answer', json={'answer': 'Tea'}, headers=headers).status_code == 200
+
+    both = client.get(f'/user/{username}/questions', headers=headers).json
+    assert [q['id'] for q in both['unanswered_questions']] == [waiting]
+    assert [q['id'] for q in both['answered_questions']] == [answered]
+
+    only = client.get(f'/user/{username}/questions?status=answered', headers=headers).json
+    assert 'unanswered_questions' not in only and [q['id'] for q in only['answered_questions']] == [answered]
+    only = client.get(f'/user/{username}/questions?status=unanswered', headers=headers).json
+    assert 'answered_questions' not in only and [q['id'] for q in only['unanswered_questions']] == [waiting]
+
+
+def test_status_is_validated(client, new_user):
+    username, headers = new_user('page_eve')
+    ask(client, username, 'Summer or winter?')
+    assert client.get(f'/user/{username}/questions?status=pending', headers=headers).status_code == 400
+    cursor = forge('2030-01-01T00:00:00', 1)
+    # One cursor cannot page two buckets at once
+    assert client.get(f'/user/{username}/questions?cursor={cursor}', headers=headers).status_code == 400
+
+
+def test_cursor_values_keep_their_stored_form(api):
+    # SQLite compares the timestamps as text, so re-serializing must not change them
+    for value in ('2030-01-01T10:00:00.123000+00:00', '2030-01-01T10:00:00.123456'):
+        assert api.decode_cursor(api.encode_cursor((value, 7))) == (value, 7)
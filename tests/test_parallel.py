@@ -0,0 +1,71 @@
+import threading
+import time
+
+import pytest
+
+from parallel import ParallelExecutor, QueryTimeout
+
+
+def test_gather_returns_results_in_call_order():
+    executor = ParallelExecutor(max_workers=4, timeout=1)
+    assert executor.gather(lambda: 1, lambda: 2, lambda: 3) == [1, 2, 3]
+
+
+def test_gather_raises_first_failure_and_timeouts():
+    executor = ParallelExecutor(max_workers=4, timeout=0.05)
+
+    def fail():
+        raise KeyError('boom')
+
+    with pytest.raises(KeyError):
+        executor.gather(lambda: 1, fail)
+    release = threading.Event()
+    with pytest.raises(QueryTimeout):
+        executor.gather(lambda: release.wait(1))
+    release.set()
+
+
+def test_background_work_on_its_own_pool_can_gather():
+    queries = ParallelExecutor(max_workers=2, timeout=1)
+    background = ParallelExecutor(max_workers=2)
+    futures = [background.submit(lambda: queries.gather(lambda: 1, lambda: 2)) for _ in range(4)]
+    assert [future.result(timeout=2) for future in futures] == [[1, 2]] * 4
+
+
+def test_stale_profile_page_is_refreshed_while_query_pool_is_small(api, client, new_user, monkeypatch):
+    username, _ = new_user('par_carol')
+    monkeypatch.setattr(api, 'query_executor', ParallelExecutor(max_workers=1, timeout=0.5))
+    assert client.get(f'/user/{username}').status_code == 200
+    key = next(key for key in api.profile_response_cache._data if key[0] == username)
+    stale = api.profile_response_cache.get(key)
+    stale['fresh_until'] = time.monotonic() - 1
+
+    # Served stale while a background request renders it again
+    assert client.get(f'/user/{username}').status_code == 200
+    deadline = time.monotonic() + 2
+    while api.profile_response_cache.get(key) is stale and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert api.profile_response_cache.get(key) is not stale
+
+
+def test_gather_raises_the_earliest_failure_in_call_order():
+    executor = ParallelExecutor(max_workers=4, timeout=1)
+
+    def slow_failure():
+        time.sleep(0.05)
+        raise KeyError('first call')
+
+    def fast_failure():
+        raise ValueError('second call')
+
+    with pytest.raises(KeyError):
+        executor.gather(slow_failure, fast_failure)
+
+
+def test_gather_timeout_covers_all_calls():
+    executor = ParallelExecutor(max_workers=1, timeout=0.15)
+    started = time.monotonic()
+    # One worker runs the calls back to back; each fits the timeout but together they do not
+    with pytest.raises(QueryTimeout):
+        executor.gather(lambda: time.sleep(0.1), lambda: time.sleep(0.1), lambda: time.sleep(0.1))
+    assert time.monotonic() - started < 0.25
@@ -0,0 +1,46 @@
+from cache import TTLCache
+
+
+def ask(client, receiver, question):
+    response = client.post('/questions', json={'receiver': receiver, 'question': question})
+    assert response.status_code == 201, response.json
+    return response.json['question']['id']
+
+
+def test_profile_shows_answers_after_invalidation(client, new_user):
+    username, headers = new_user('prof_alice')
+    first = ask(client, username, 'What is your favourite film?')
+    assert client.post(f'/questions/{first}/answer', json={'answer': 'Alien'}, headers=headers).status_code == 200
+
+    response = client.get(f'/user/{username}')
+    assert [q['answer'] for q in response.json['answered_questions']] == ['Alien']
+    assert client.get(f'/user/{username}', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+    second = ask(client, username, 'Where do you live these days?')
+    assert client.post(f'/questions/{second}/answer', json={'answer': 'Oslo'}, headers=headers).status_code == 200
+    response = client.get(f'/user/{username}')
+    assert sorted(q['answer'] for q in response.json['answered_questions']) == ['Alien', 'Oslo']
+
+
+def test_forged_cursors_cannot_grow_the_cache_past_its_size(api, client, new_user, monkeypatch):
+    username, _ = new_user('prof_bob')
+    monkeypatch.setattr(api, 'profile_response_cache', TTLCache(maxsize=10, ttl=60))
+    for row_id in range(50):
+        cursor = api.encode_cursor(('2030-01-01T00:00:00', row_id))
+        assert client.get(f'/user/{username}?cursor={cursor}').status_code == 200
+    assert len(api.profile_response_cache) == 10
+
+
+def test_unknown_profile(client):
+    assert client.get('/user/prof_nobody').status_code == 404
+
+
+def test_invalidation_from_another_worker_drops_the_cached_page(api, client, new_user):
+    username, _ = new_user('prof_chen')
+    question_id = ask(client, username, 'Early bird or night owl?')
+    assert client.get(f'/user/{username}').json['answered_questions'] == []
+
+    # Another worker answers the question and bumps the shared generation
+    api.storage.questions.update_for_receiver(question_id, username, {'answer': 'Owl', 'answered': True, 'answered_at': '2030-01-01T00:00:00'})
+    api.profile_generations.set(username, 'bumped-elsewhere')
+    assert [q['answer'] for q in client.get(f'/user/{username}').json['answered_questions']] == ['Owl']
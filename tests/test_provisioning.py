@@ -0,0 +1,62 @@
+import types
+
+
+def sign_up(api, name):
+    return api.storage.auth.sign_up(f'{name}@example.com', 'password123').user
+
+
+class CountingProfiles:
+    def __init__(self, profiles):
+        self._profiles = profiles
+        self.calls = 0
+
+    def __getattr__(self, name):
+        method = getattr(self._profiles, name)
+
+        def call(*args, **kwargs):
+            self.calls += 1
+            return method(*args, **kwargs)
+
+        return call
+
+
+def test_first_free_candidate_is_used_once(api, new_user):
+    new_user('prov_taken')
+    user = sign_up(api, 'prov_oauth_1')
+    profile = api.storage.profiles.provision(user.id, user.email, ['prov_taken', 'prov_second', 'prov_third'])
+    assert profile['username'] == 'prov_second'
+
+    # A returning user keeps their profile whatever names are offered
+    again = api.storage.profiles.provision(user.id, user.email, ['prov_fourth'])
+    assert again['username'] == 'prov_second'
+    assert not api.storage.profiles.exists('prov_fourth')
+
+
+def test_every_name_taken_gives_none(api, new_user):
+    new_user('prov_only')
+    user = sign_up(api, 'prov_oauth_2')
+    assert api.storage.profiles.provision(user.id, user.email, ['prov_only']) is None
+
+
+def test_provision_profile_takes_one_storage_call(api, monkeypatch):
+    user = sign_up(api, 'prov_oauth_3')
+    profiles = CountingProfiles(api.storage.profiles)
+    monkeypatch.setattr(api, 'storage', types.SimpleNamespace(profiles=profiles))
+
+    profile = api.provision_profile(user, api.username_candidates('prov_gina', user.id))
+    assert profile['username'] == 'prov_gina' and profiles.calls == 1
+    # Returning users are served from the profile cache
+    assert api.provision_profile(user, ['prov_other']) == profile and profiles.calls == 1
+    assert api.known_receivers.get('prov_gina')
+
+
+def test_last_candidate_is_derived_from_the_user_id(api):
+    candidates = api.username_candidates('prov_hal', '1234abcd-0000-0000-0000-000000000000')
+    assert candidates[0] == 'prov_hal'
+    assert candidates[-1] == 'user_1234abcd000000000000000000000000'
+
+
+def test_signup_with_a_taken_username_conflicts(client, new_user):
+    new_user('prov_ivy')
+    response = client.post('/auth/signup', json={'email': 'other_ivy@example.com', 'password': 'password123', 'username': 'prov_ivy'})
+    assert response.status_code == 409
@@ -0,0 +1,32 @@
+def ask(client, receiver, question):
+    response = client.post('/questions', json={'receiver': receiver, 'question': question})
+    assert response.status_code == 201, response.json
+    return response.json['question']['id']
+
+
+def test_only_the_receiver_can_answer_or_delete(client, new_user):
+    owner, owner_headers = new_user('q_ivan')
+    _, other_headers = new_user('q_judy')
+    question_id = ask(client, owner, 'Which book changed your mind?')
+
+    assert client.post(f'/questions/{question_id}/answer', json={'answer': 'Mine now'}, headers=other_headers).status_code == 403
+    assert client.delete(f'/questions/{question_id}', headers=other_headers).status_code == 403
+    assert client.post('/questions/999999/answer', json={'answer': 'x'}, headers=owner_headers).status_code == 404
+    assert client.delete('/questions/999999', headers=owner_headers).status_code == 404
+
+    response = client.post(f'/questions/{question_id}/answer', json={'answer': 'Dune'}, headers=owner_headers)
+    assert response.status_code == 200 and response.json['question']['answered']
+    assert client.delete(f'/questions/{question_id}', headers=owner_headers).status_code == 200
+
+
+def test_bulk_answer_reports_each_item(client, new_user):
+    owner, owner_headers = new_user('q_kim')
+    other, _ = new_user('q_liam')
+    mine = ask(client, owner, 'Mountains or sea?')
+    theirs = ask(client, other, 'Cats or dogs?')
+
+    response = client.post('/questions/bulk/answer', headers=owner_headers, json={
+        'answers': [{'id': mine, 'answer': 'Sea'}, {'id': theirs, 'answer': 'Cats'}, {'id': 999999, 'answer': 'x'}],
+    })
+    assert response.status_code == 200, response.json
+    assert [result['status'] for result in response.json['results']] == [200, 403, 404]
@@ -0,0 +1,107 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from ratelimit import ConcurrencyLimiter, MemoryBucketStore, RedisBucketStore, TokenBucketLimiter, parse_rate
+
+
+def test_token_bucket_admits_a_burst_then_refills():
+    rate, burst = parse_rate('3/1')
+    limiter = TokenBucketLimiter('test', rate, burst, MemoryBucketStore())
+    assert [limiter.hit('a') for _ in range(3)] == [0, 0, 0]
+    assert 0 < limiter.hit('a') <= 1 / 3
+    assert limiter.hit('b') == 0
+    time.sleep(0.35)
+    assert limiter.hit('a') == 0
+
+
+def test_memory_store_forgets_least_recent_keys():
+    store = MemoryBucketStore(maxsize=2)
+    for key in 'abc':
+        store.take(key, 1, 1)
+    assert list(store._buckets) == ['b', 'c']
+
+
+def test_concurrency_limiter_never_queues():
+    slots = ConcurrencyLimiter(1)
+    assert slots.acquire() and not slots.acquire()
+    slots.release()
+    assert slots.acquire()
+
+
+@pytest.fixture
+def submit_limits(api, monkeypatch):
+    store = MemoryBucketStore()
+    limiters = api.ADMISSION_RULES['submit_question'][1]
+    for limiter, _ in limiters:
+        monkeypatch.setattr(limiter, 'store', store)
+    monkeypatch.setattr(limiters[0][0], 'burst', 2)
+    return store
+
+
+def test_submits_over_the_limit_get_429(client, new_user, submit_limits):
+    username, _ = new_user('rl_grace')
+    environ = {'REMOTE_ADDR': '192.0.2.10'}
+    statuses = [
+        client.post('/questions', json={'receiver': username, 'question': f'Question {word}?'}, environ_base=environ).status_code
+        for word in ('one', 'two', 'three')
+    ]
+    assert statuses == [201, 201, 429]
+    response = client.post('/questions', json={'receiver': username, 'question': 'Other address?'}, environ_base={'REMOTE_ADDR': '192.0.2.11'})
+    assert response.status_code == 201
+
+
+def test_full_concurrency_cap_gets_503_and_slots_are_released(api, client):
+    slots = api.ADMISSION_RULES['login'][0]
+    held = 0
+    while slots.acquire():
+        held += 1
+    try:
+        response = client.post('/auth/login', json={'email': 'nobody@example.com', 'password': 'x'})
+        assert response.status_code == 503 and response.headers['Retry-After'] == '1'
+    finally:
+        for _ in range(held):
+            slots.release()
+    client.post('/auth/login', json={'email': 'nobody@example.com', 'password': 'x'})
+    assert slots.acquire()
+    slots.release()
+
+
+def test_asgi_checks_redis_rate_limits_off_the_event_loop(api, new_user, monkeypatch):
+    import asgi
+
+    username, _ = new_user('rl_heidi')
+
+    class SlowRedisStore(RedisBucketStore):
+        def __init__(self):
+            pass
+
+        def take(self, key, rate, burst, cost=1):
+            time.sleep(0.1)  # a round trip to Redis
+            return 5.0
+
+    store = SlowRedisStore()
+    monkeypatch.setattr(api, 'rate_limit_store', store)
+    for limiter, _ in api.ADMISSION_RULES['submit_question'][1]:
+        monkeypatch.setattr(limiter, 'store', store)
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.ensure_future(ticker())
+        async with httpx.AsyncClient(app=asgi.app, base_url='http://testserver') as client:
+            response = await client.post('/questions', json={'receiver': username, 'question': 'Limited?'})
+        task.cancel()
+        return response, ticks
+
+    response, ticks = asyncio.run(scenario())
+    assert response.status_code == 429 and response.headers['Retry-After'] == '5'
+    assert ticks >= 5
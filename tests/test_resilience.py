@@ -0,0 +1,116 @@
+import asyncio
+import time
+
+import pytest
+
+from resilience import CircuitOpen, ResilientStorage, StorageTimeout, StorageUnavailable
+from storage import Storage
+
+
+class Outage(ConnectionError):
+    pass
+
+
+class FakeProfiles:
+    """Fails while ``down`` is set, and sleeps ``delay`` seconds per call."""
+
+    def __init__(self):
+        self.down = False
+        self.delay = 0.0
+        self.calls = 0
+
+    def exists(self, username):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.down:
+            raise Outage('connection refused')
+        return True
+
+
+class AsyncFakeProfiles(FakeProfiles):
+    async def exists(self, username):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.down:
+            raise Outage('connection refused')
+        return True
+
+
+def guarded(profiles, **options):
+    options = dict({'retries': 0, 'failure_threshold': 2, 'reset_timeout': 0.05}, **options)
+    return ResilientStorage(Storage(profiles=profiles, questions=object(), auth=object()), **options)
+
+
+def test_transient_read_is_retried():
+    profiles = FakeProfiles()
+    storage = guarded(profiles, retries=1, backoff=0)
+    profiles.down = True
+    with pytest.raises(StorageUnavailable):
+        storage.profiles.exists('bob')
+    assert profiles.calls == 2
+
+
+def test_breaker_opens_fails_fast_and_recovers():
+    profiles = FakeProfiles()
+    storage = guarded(profiles)
+    profiles.down = True
+    for _ in range(2):
+        with pytest.raises(StorageUnavailable):
+            storage.profiles.exists('bob')
+    with pytest.raises(CircuitOpen):
+        storage.profiles.exists('bob')
+    assert profiles.calls == 2
+
+    profiles.down = False
+    time.sleep(0.06)
+    assert storage.profiles.exists('bob') is True
+    assert storage.breakers['database'].state == 'closed'
+
+
+def test_deadline():
+    profiles = FakeProfiles()
+    profiles.delay = 0.2
+    storage = guarded(profiles, deadlines={'read': 0.02})
+    with pytest.raises(StorageTimeout):
+        storage.profiles.exists('bob')
+
+
+def test_cancelled_trial_releases_half_open_breaker():
+    profiles = AsyncFakeProfiles()
+    storage = guarded(profiles)
+
+    async def scenario():
+        profiles.down = True
+        for _ in range(2):
+            with pytest.raises(StorageUnavailable):
+                await storage.profiles.exists('bob')
+        await asyncio.sleep(0.06)
+
+        # The half-open trial is cancelled by the caller's own deadline
+        profiles.down, profiles.delay = False, 0.2
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(storage.profiles.exists('bob'), 0.01)
+
+        profiles.delay = 0.0
+        return await storage.profiles.exists('bob')
+
+    assert asyncio.run(scenario()) is True
+    assert storage.breakers['database'].state == 'closed'
+
+
+def test_sync_call_that_cannot_start_releases_trial():
+    profiles = FakeProfiles()
+    storage = guarded(profiles)
+    profiles.down = True
+    for _ in range(2):
+        with pytest.raises(StorageUnavailable):
+            storage.profiles.exists('bob')
+    time.sleep(0.06)
+
+    storage._pool.shutdown()
+    with pytest.raises(RuntimeError):
+        storage.profiles.exists('bob')
+
+    storage.after_fork()  # new pool
+    profiles.down = False
+    assert storage.profiles.exists('bob') is True
@@ -0,0 +1,64 @@
+import pytest
+
+from screening import PhraseMatcher, QuestionRejected, QuestionScreen, normalize, resemblance, sketch
+
+
+def test_phrase_matcher_finds_overlapping_whole_word_phrases():
+    matcher = PhraseMatcher(['he', 'she', 'his', 'hers', 'free money'])
+    assert matcher.search(normalize('Ask her: is she ok?')) == 'she'
+    assert matcher.search(normalize('ushers and shelves')) is None
+    assert matcher.search(normalize('FREE  m0ney​')) == 'free money'
+    assert PhraseMatcher([]).search('anything') is None
+
+
+def test_resemblance_of_sketches():
+    a = sketch(normalize('What is your favourite band?'))
+    assert resemblance(a, sketch(normalize('what is your FAVOURITE band!!'))) == 1.0
+    assert resemblance(a, sketch(normalize('Where did you grow up?'))) == 0.0
+
+
+@pytest.mark.parametrize('text, reason', [
+    ('   ', 'too_short'),
+    ('x' * 1001, 'too_long'),
+    ('bell\x07', 'invalid'),
+    ('http://a http://b http://c', 'links'),
+    ('why' + '?' * 30, 'repetitive'),
+    ('get free money now', 'blocked'),
+])
+def test_rejections(text, reason):
+    screen = QuestionScreen(blocklist=['free money'])
+    with pytest.raises(QuestionRejected) as rejected:
+        screen.check('alice', text)
+    assert rejected.value.reason == reason and rejected.value.status == 400
+    assert screen.rejections[reason] == 1
+
+
+def test_near_duplicates_per_receiver_once_accepted():
+    screen = QuestionScreen()
+    fingerprint = screen.check('alice', 'Do you like jazz music?')
+    screen.check('alice', 'Do you like jazz music?')  # not remembered yet
+    screen.remember('alice', fingerprint)
+    with pytest.raises(QuestionRejected) as rejected:
+        screen.check('alice', 'do you like JAZZ music')
+    assert rejected.value.status == 409
+    screen.check('bob', 'Do you like jazz music?')
+
+
+def test_spam_is_rejected_before_storage(api, client, new_user, monkeypatch):
+    username, _ = new_user('q_nina')
+
+    def no_lookup(name):
+        raise AssertionError('screened questions must not reach storage')
+
+    assert client.post('/questions', json={'receiver': username, 'question': 'x' * 5000}).status_code == 400
+    assert client.post('/questions', json={'receiver': username, 'question': 'What did you have for breakfast today?'}).status_code == 201
+    monkeypatch.setattr(api, 'receiver_exists', no_lookup)
+    response = client.post('/questions', json={'receiver': username, 'question': 'what did you have for BREAKFAST today??'})
+    assert response.status_code == 409
+    assert client.post('/questions', json={'receiver': username, 'question': 'hi\x00'}).status_code == 400
+
+
+def test_receiver_must_be_a_username(client):
+    for receiver in (['alice'], {'name': 'alice'}, 42, True):
+        response = client.post('/questions', json={'receiver': receiver, 'question': 'Is this going anywhere?'})
+        assert response.status_code == 400, receiver
@@ -0,0 +1,40 @@
+import types
+
+import serve
+
+
+def test_worker_count_follows_io_wait():
+    assert serve.worker_count(4, 0.0) == 4
+    assert serve.worker_count(4, 0.75) == 16
+    # Threads share the in-flight requests, and the cap wins
+    assert serve.worker_count(4, 0.75, threads=8) == 2
+    assert serve.worker_count(4, 0.9, max_workers=10) == 10
+    # Out-of-range ratios are clamped instead of dividing by zero
+    assert serve.worker_count(2, 1.0) == 40
+    assert serve.worker_count(2, -1) == 2
+
+
+def test_gunicorn_options(monkeypatch):
+    monkeypatch.setenv('WEB_IO_WAIT', '0.5')
+    monkeypatch.setenv('STORAGE_BACKEND', 'supabase')
+    monkeypatch.setenv('WEB_WORKERS', '3')
+    options, wait = serve.gunicorn_options()
+    assert options['workers'] == 3 and wait == 0.5 and options['preload_app']
+
+    # An in-memory SQLite database only exists in one process
+    monkeypatch.setenv('STORAGE_BACKEND', 'sqlite')
+    monkeypatch.setenv('SQLITE_PATH', ':memory:')
+    assert serve.gunicorn_options()[0]['workers'] == 1
+
+
+def test_observed_io_wait_falls_back_when_unreachable(monkeypatch):
+    monkeypatch.delenv('WEB_IO_WAIT', raising=False)
+    monkeypatch.setenv('WEB_IO_WAIT_FROM', 'http://127.0.0.1:9/metrics')
+    assert serve.io_wait() == serve.DEFAULT_IO_WAIT
+
+
+def test_post_fork_tells_the_worker_the_worker_count(api, monkeypatch):
+    calls = []
+    monkeypatch.setattr(api, 'after_fork', lambda **kwargs: calls.append(kwargs))
+    serve.post_fork(types.SimpleNamespace(cfg=types.SimpleNamespace(workers=6)), None)
+    assert calls == [{'workers': 6}]
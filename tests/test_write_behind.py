@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pytest
+
+from write_behind import BufferClosed, BufferFull, WriteBehindBuffer
+
+
+def test_rows_are_written_in_bounded_batches_and_drained_on_close():
+    batches = []
+    buffer = WriteBehindBuffer(batches.append, max_batch=10, max_delay=1)
+    for n in range(25):
+        buffer.add(n)
+    buffer.close()
+    assert sorted(row for batch in batches for row in batch) == list(range(25))
+    assert max(len(batch) for batch in batches) <= 10
+    with pytest.raises(BufferClosed):
+        buffer.add(99)
+
+
+def test_a_partial_batch_is_flushed_after_max_delay():
+    batches = []
+    buffer = WriteBehindBuffer(batches.append, max_batch=100, max_delay=0.02)
+    buffer.add('row')
+    time.sleep(0.2)
+    assert batches == [['row']]
+    buffer.close()
+
+
+def test_failed_batch_falls_back_to_single_rows():
+    written = []
+
+    def write_many(rows):
+        raise ValueError('one bad row')
+
+    def write_one(row):
+        if row == 'bad':
+            raise ValueError('bad row')
+        written.append(row)
+
+    buffer = WriteBehindBuffer(write_many, write_one, max_delay=0.01)
+    for row in ('a', 'bad', 'b'):
+        buffer.add(row)
+    buffer.close()
+    assert written == ['a', 'b'] and buffer.failed == 1
+
+
+def test_full_queue_sheds_load():
+    release = threading.Event()
+    buffer = WriteBehindBuffer(lambda rows: release.wait(1), max_batch=1, max_delay=0, max_pending=1, put_timeout=0.01)
+    buffer.add(1)  # taken by the writer, which blocks
+    time.sleep(0.05)
+    buffer.add(2)  # fills the queue
+    with pytest.raises(BufferFull):
+        buffer.add(3)
+    release.set()
+    buffer.close()
+
+
+def test_buffered_submit_is_accepted_then_stored(api, client, new_user, monkeypatch):
+    username, headers = new_user('wb_paul')
+    buffer = api.create_submit_buffer()
+    monkeypatch.setattr(api, 'submit_buffer', buffer)
+
+    response = client.post('/questions', json={'receiver': username, 'question': 'Queued or not?'})
+    assert response.status_code == 202
+    buffer.close()
+    inbox = client.get('/dashboard', headers=headers).json['unanswered_questions']
+    assert [question['question'] for question in inbox] == ['Queued or not?']
+
+
+def test_no_accepted_row_is_lost_when_closing_under_load():
+    written, accepted = [], []
+    buffer = WriteBehindBuffer(written.extend, max_delay=0.001)
+
+    def producer(start):
+        for n in range(start, start + 500):
+            try:
+                buffer.add(n)
+            except BufferClosed:
+                return
+            accepted.append(n)
+
+    threads = [threading.Thread(target=producer, args=(n * 1000,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.005)
+    buffer.close()
+    for thread in threads:
+        thread.join()
+    assert sorted(written) == sorted(accepted)
+
+
+def test_close_gives_up_when_the_queue_stays_full():
+    release = threading.Event()
+    buffer = WriteBehindBuffer(lambda rows: release.wait(5), max_batch=1, max_delay=0, max_pending=1, put_timeout=0.01)
+    buffer.add(1)
+    time.sleep(0.05)
+    buffer.add(2)
+    started = time.monotonic()
+    buffer.close(timeout=0.1)
+    assert time.monotonic() - started < 1
+    release.set()
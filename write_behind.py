@@ -0,0 +1,119 @@
+"""Write-behind buffering for question submissions.
+
+``WriteBehindBuffer`` accepts rows into a bounded in-process queue and a
+background thread writes them in batches: a batch is flushed once it holds
+``max_batch`` rows or its oldest row has waited ``max_delay`` seconds. When the
+queue is full ``add`` raises ``BufferFull`` instead of growing without bound,
+and ``close`` drains whatever is still queued (call it on shutdown).
+
+Rows that are accepted but fail to write are only logged, so this trades
+durability of the last few milliseconds of submissions for throughput.
+"""
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class BufferFull(Exception):
+    """The queue is at capacity; the caller should shed load or write synchronously."""
+
+
+class BufferClosed(Exception):
+    pass
+
+
+class WriteBehindBuffer:
+    def __init__(self, write_many, write_one=None, max_batch=100, max_delay=0.05, max_pending=10000, put_timeout=0.05):
+        """``write_many(rows)`` writes a batch. If it fails, ``write_one(row)`` (when given)
+        retries the rows one by one so a single bad row does not lose the whole batch."""
+        self.write_many = write_many
+        self.write_one = write_one
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.put_timeout = put_timeout
+        self.written = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._closed = False
+        # Taken around accepting a row and around closing, so no row lands behind the stop marker
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    @property
+    def accepting(self):
+        return not self._closed and self._thread.is_alive()
+
+    def add(self, row):
+        with self._lock:
+            if not self.accepting:
+                raise BufferClosed()
+            try:
+                self._queue.put(row, timeout=self.put_timeout)
+            except queue.Full:
+                raise BufferFull()
+
+    def close(self, timeout=5.0):
+        """Stop accepting rows and wait up to ``timeout`` seconds for the queued ones to be written."""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            try:
+                # Wakes the writer; it drains everything before this marker
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                logger.warning('Write-behind queue still full after %.1fs, not waiting for %d rows', timeout, self.pending)
+                return
+        self._thread.join(max(0.0, deadline - time.monotonic()))
+
+    def _run(self):
+        while True:
+            row = self._queue.get()
+            if row is None:
+                return
+            batch = [row]
+            deadline = time.monotonic() + self.max_delay
+            stop = False
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    row = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if row is None:
+                    stop = True
+                    break
+                batch.append(row)
+            self._flush(batch)
+            if stop:
+                return
+
+    def _flush(self, batch):
+        try:
+            self.write_many(batch)
+            self.written += len(batch)
+            return
+        except Exception:
+            if self.write_one is None:
+                self.failed += len(batch)
+                logger.exception('Dropped a batch of %d rows', len(batch))
+                return
+            logger.warning('Batch write of %d rows failed, retrying row by row', len(batch), exc_info=True)
+        for row in batch:
+            try:
+                self.write_one(row)
+                self.written += 1
+            except Exception:
+                self.failed += 1
+                logger.exception('Dropped row %r', row)